@@ -0,0 +1,100 @@
+"""
+Agent prompt-prefix size (and optionally prefill latency) per prompt profile.
+
+Compiles ModalLoader.SYSTEM_PROMPT and the registered tools with every
+profile in prompt_builder.PROFILES and prints their token counts. The
+"baseline" row is the prompt and tools exactly as written.
+
+With --measure, each prefix is also sent to the configured model server
+(settings.model.base_url) with a one-token completion; the first request
+per profile is a cold prefill, the median of the rest shows the effect of
+server-side prefix caching.
+
+Usage:
+    python -m benchmarks.prompt_tokens [--measure] [--runs 5]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any, List, Sequence
+
+import httpx
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import tools
+from config import settings
+from services.core.modal_loader import ModalLoader
+from services.core.prompt_builder import PROFILES, build_prefix, prompt_report
+
+_QUESTION = "List my saved memories."
+
+
+def _prefill_ms(
+    client: httpx.Client, system_prompt: str, tool_list: Sequence[Any]
+) -> float:
+    model_cfg = settings.model
+    payload = {
+        "model": model_cfg.foundry_model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": _QUESTION},
+        ],
+        "tools": [convert_to_openai_tool(t) for t in tool_list],
+        "max_tokens": 1,
+        "temperature": 0,
+    }
+    start = time.perf_counter()
+    response = client.post(
+        f"{model_cfg.base_url.rstrip('/')}/chat/completions", json=payload
+    )
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--measure", action="store_true")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    all_tools = tools.get_all_tools()
+    variants = [("baseline", ModalLoader.SYSTEM_PROMPT, list(all_tools))]
+    for profile in PROFILES:
+        system_prompt, tool_list = build_prefix(
+            ModalLoader.SYSTEM_PROMPT,
+            all_tools,
+            profile,
+            compact_tools=profile != "full",
+        )
+        variants.append((profile, system_prompt, tool_list))
+
+    baseline = None
+    client = httpx.Client(
+        headers={"Authorization": "Bearer foundry-local"},
+        timeout=settings.model.request_timeout,
+    )
+    for name, system_prompt, tool_list in variants:
+        report = prompt_report(system_prompt, tool_list)
+        total = report["total_tokens"]
+        baseline = baseline or total
+        line = (
+            f"{name:<9} tokens={total:>5} (system {report['system_tokens']}, "
+            f"tools {total - report['system_tokens']}) "
+            f"saved={1 - total / baseline:.0%}"
+        )
+
+        if args.measure:
+            runs: List[float] = [
+                _prefill_ms(client, system_prompt, tool_list)
+                for _ in range(max(args.runs, 2))
+            ]
+            line += (
+                f" cold={runs[0]:.0f}ms warm_p50={statistics.median(runs[1:]):.0f}ms"
+            )
+        print(line)
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Lookup-latency benchmark for the semantic response cache.
+
+Fills a SemanticCache with N synthetic entries (default 100k) in a temporary
+directory and times lookups against it.
+
+Usage:
+    python -m benchmarks.semantic_cache [--entries 100000] [--lookups 200]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from services.core.semantic_cache import HashingEmbedder, SemanticCache
+
+_WORDS = (
+    "python sql list dict sort join index query async loop class function "
+    "decorator error file read write parse json csv test mock import module "
+    "thread process cache memory string regex format date time api request"
+).split()
+
+
+def _query(rng: random.Random) -> str:
+    return "how do i " + " ".join(rng.choice(_WORDS) for _ in range(6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    embedder = HashingEmbedder(args.dim)
+    scope = "0" * 64
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SemanticCache(tmp, embedder, capacity=args.entries, threshold=0.92)
+
+        # Bulk-load the vectors directly; add() would commit once per entry.
+        start = time.perf_counter()
+        queries = [_query(rng) for _ in range(args.entries)]
+        cache._vectors[:] = np.stack([embedder.embed(q) for q in queries])
+        cache._scopes[:] = int(scope[:15], 16)
+        cache._db.executemany(
+            "INSERT INTO entries (slot, query, answer, created) VALUES (?, ?, ?, ?)",
+            ((i, q, f"answer {i}", time.time()) for i, q in enumerate(queries)),
+        )
+        cache._count = args.entries
+        cache._db.commit()
+        print(f"loaded {args.entries} entries in {time.perf_counter() - start:.1f}s")
+
+        latencies = []
+        hits = 0
+        for i in range(args.lookups):
+            # Half exact repeats, half fresh queries
+            query = queries[rng.randrange(args.entries)] if i % 2 else _query(rng)
+            start = time.perf_counter()
+            hits += cache.lookup(query, scope) is not None
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        latencies.sort()
+        print(
+            f"lookups={args.lookups} hits={hits} "
+            f"p50={statistics.median(latencies):.2f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f}ms "
+            f"max={latencies[-1]:.2f}ms"
+        )
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
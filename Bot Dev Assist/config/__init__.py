@@ -1,5 +1,5 @@
 """
-Centralized configuration loader for model, app, and IRIS settings.
+Centralized configuration loader for model, app, router, cache, and IRIS settings.
 
 All configuration stays in-process but is structured so the model runner
 can be moved out-of-process later without changing callers.
@@ -10,8 +10,10 @@ from dataclasses import dataclass, field
 from typing import Dict
 
 from .app import AppConfig
+from .cache import CacheConfig
 from .iris import IRISConfig
 from .model import ModelConfig
+from .router import RouterConfig
 
 
 @dataclass
@@ -21,6 +23,8 @@ class Settings:
     app: AppConfig = field(default_factory=AppConfig)
     model: ModelConfig = field(default_factory=ModelConfig)
     iris: IRISConfig = field(default_factory=IRISConfig)
+    router: RouterConfig = field(default_factory=RouterConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
 
     def ui_safe_view(self) -> Dict[str, object]:
         """Expose only UI-safe fields; secrets remain masked/omitted."""
@@ -28,6 +32,8 @@ class Settings:
             "app": self.app.ui_view(),
             "model": self.model.ui_view(),
             "iris": self.iris.ui_view(),
+            "router": self.router.ui_view(),
+            "cache": self.cache.ui_view(),
         }
 
     def validate(self) -> tuple[bool, str]:
@@ -47,6 +53,16 @@ class Settings:
         if not self.model.foundry_model:
             return False, "Model name not configured"
 
+        # Validate router config
+        is_valid, msg = self.router.validate()
+        if not is_valid:
+            return False, f"Router validation failed: {msg}"
+
+        # Validate cache config
+        is_valid, msg = self.cache.validate()
+        if not is_valid:
+            return False, f"Cache validation failed: {msg}"
+
         # Validate IRIS if enabled
         is_valid, msg = self.iris.validate()
         if not is_valid:
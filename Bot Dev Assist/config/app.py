@@ -10,8 +10,10 @@ class AppConfig:
     """Application configuration."""
 
     # Execution mode
-    mode: Literal["inprocess", "remote_model"] = "inprocess"
-    remote_model_url: Optional[str] = None
+    # remote_model: send model requests to remote_model_url (comma-separated
+    # for a pool) instead of the local endpoint(s) in ModelConfig
+    mode: Literal["inprocess", "remote_model"] = os.getenv("APP_MODE", "inprocess")
+    remote_model_url: Optional[str] = os.getenv("REMOTE_MODEL_URL") or None
 
     # Logging
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
@@ -23,6 +25,53 @@ class AppConfig:
     # Sessions
     session_store: str = os.getenv("SESSION_STORE", "data/sessions")
 
+    # Agent checkpoints (default path is <session_store>/checkpoints.sqlite).
+    # Writes are buffered and flushed every checkpoint_flush_interval seconds
+    # or checkpoint_flush_every rows; only the newest checkpoint_keep_last
+    # checkpoints of each session are kept.
+    checkpoint_enabled: bool = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+    checkpoint_path: str = os.getenv("CHECKPOINT_PATH", "")
+    checkpoint_keep_last: int = int(os.getenv("CHECKPOINT_KEEP_LAST", "3"))
+    checkpoint_flush_interval: float = float(
+        os.getenv("CHECKPOINT_FLUSH_INTERVAL", "2.0")
+    )
+    checkpoint_flush_every: int = int(os.getenv("CHECKPOINT_FLUSH_EVERY", "64"))
+    checkpoint_retention_days: float = float(
+        os.getenv("CHECKPOINT_RETENTION_DAYS", "30")
+    )
+
+    # Concurrency (shared model server)
+    max_in_flight: int = int(os.getenv("MAX_IN_FLIGHT", "4"))
+
+    # Code execution (tools.code_runner): warm worker processes, recycled
+    # after code_worker_max_jobs jobs; per-job timeout (also the CPU rlimit),
+    # address-space limit and output cap
+    code_workers: int = int(os.getenv("CODE_WORKERS", "2"))
+    code_worker_max_jobs: int = int(os.getenv("CODE_WORKER_MAX_JOBS", "50"))
+    code_timeout: float = float(os.getenv("CODE_TIMEOUT", "10"))
+    code_memory_mb: int = int(os.getenv("CODE_MEMORY_MB", "512"))
+    code_output_limit: int = int(os.getenv("CODE_OUTPUT_LIMIT", "8000"))
+
+    # read_file: token budget of one result (see tools.file_reader)
+    file_read_max_tokens: int = int(os.getenv("FILE_READ_MAX_TOKENS", "1000"))
+
+    # search_code (tools.code_search): one SQLite index per project under
+    # search_index_dir, rescanned for changed files at most every
+    # search_rescan_seconds; larger files than search_max_file_kb are skipped
+    search_index_dir: str = os.getenv("SEARCH_INDEX_DIR", "data/index")
+    search_rescan_seconds: float = float(os.getenv("SEARCH_RESCAN_SECONDS", "30"))
+    search_max_file_kb: int = int(os.getenv("SEARCH_MAX_FILE_KB", "1024"))
+
+    # analyze_code (services.core.code_metrics): results cached by content
+    # hash under analysis_cache_dir; directories are parsed on a process
+    # pool of analysis_workers (0 = one per CPU, minus one)
+    analysis_cache_dir: str = os.getenv("ANALYSIS_CACHE_DIR", "data/analysis")
+    analysis_workers: int = int(os.getenv("ANALYSIS_WORKERS", "0"))
+
+    # review_project: share of the conversation's token budget
+    # (services.core.history.history_budget) its report may use
+    review_context_share: float = float(os.getenv("REVIEW_CONTEXT_SHARE", "0.5"))
+
     # Security
     guardrail_policy: str = os.getenv("GUARDRAIL_POLICY", "allow_all")
 
@@ -56,6 +105,11 @@ class AppConfig:
             "log_level": self.log_level,
             "log_dir": self.log_dir,
             "session_store": self.session_store,
+            "checkpoint_enabled": self.checkpoint_enabled,
+            "checkpoint_keep_last": self.checkpoint_keep_last,
+            "max_in_flight": self.max_in_flight,
+            "code_workers": self.code_workers,
+            "code_timeout": self.code_timeout,
             "guardrail_policy": self.guardrail_policy,
             "tracing_enabled": self.tracing_enabled,
             "ui_config": self.ui_config,
@@ -73,6 +127,18 @@ class AppConfig:
         if self.mode == "remote_model" and not self.remote_model_url:
             return False, "remote_model_url required when mode is remote_model"
 
+        if self.max_in_flight < 1:
+            return False, f"max_in_flight must be >= 1, got {self.max_in_flight}"
+
+        if self.code_workers < 1:
+            return False, f"code_workers must be >= 1, got {self.code_workers}"
+
+        if self.checkpoint_keep_last < 1:
+            return (
+                False,
+                f"checkpoint_keep_last must be >= 1, got {self.checkpoint_keep_last}",
+            )
+
         if self.log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
             return False, f"Invalid log level: {self.log_level}"
 
@@ -0,0 +1,97 @@
+"""Cache configuration."""
+
+import os
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass
+class CacheConfig:
+    """In-process cache configuration."""
+
+    # Routing decisions (shared across sessions)
+    routing_enabled: bool = os.getenv("ROUTING_CACHE_ENABLED", "true").lower() == "true"
+    routing_max_entries: int = int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", "4096"))
+    routing_ttl: float = float(os.getenv("ROUTING_CACHE_TTL", "3600"))
+
+    # Chat-only responses: memory LRU tier + SQLite tier (default path is
+    # <session_store>/response_cache.sqlite)
+    response_enabled: bool = (
+        os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    )
+    response_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    response_ttl: float = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+    response_disk_enabled: bool = (
+        os.getenv("RESPONSE_CACHE_DISK", "true").lower() == "true"
+    )
+    response_disk_path: str = os.getenv("RESPONSE_CACHE_PATH", "")
+    response_disk_max_entries: int = int(
+        os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "10000")
+    )
+    # Semantic tier (needs numpy): embedder is "hashing" or
+    # "sentence-transformers:<model>"; default dir is <session_store>/semantic_cache
+    semantic_enabled: bool = (
+        os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    )
+    semantic_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    semantic_capacity: int = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "20000"))
+    semantic_dim: int = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+    semantic_embedder: str = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashing")
+    semantic_dir: str = os.getenv("SEMANTIC_CACHE_DIR", "")
+
+    # Above this temperature answers vary too much to reuse
+    response_max_temperature: float = float(
+        os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.5")
+    )
+
+    def ui_view(self) -> Dict[str, object]:
+        """Get UI-safe view of configuration."""
+        return {
+            "routing_enabled": self.routing_enabled,
+            "routing_max_entries": self.routing_max_entries,
+            "routing_ttl": self.routing_ttl,
+            "response_enabled": self.response_enabled,
+            "response_max_entries": self.response_max_entries,
+            "response_ttl": self.response_ttl,
+            "response_disk_enabled": self.response_disk_enabled,
+            "response_disk_max_entries": self.response_disk_max_entries,
+            "semantic_enabled": self.semantic_enabled,
+            "semantic_threshold": self.semantic_threshold,
+            "semantic_capacity": self.semantic_capacity,
+            "semantic_embedder": self.semantic_embedder,
+        }
+
+    def validate(self) -> tuple[bool, str]:
+        """Validate cache configuration.
+
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        if self.routing_max_entries < 1:
+            return (
+                False,
+                f"routing_max_entries must be >= 1, got {self.routing_max_entries}",
+            )
+
+        if self.routing_ttl < 0:
+            return False, f"routing_ttl must be >= 0, got {self.routing_ttl}"
+
+        if self.response_max_entries < 1 or self.response_disk_max_entries < 1:
+            return False, "response cache sizes must be >= 1"
+
+        if not 0 < self.semantic_threshold <= 1:
+            return (
+                False,
+                f"semantic_threshold must be in (0, 1], got {self.semantic_threshold}",
+            )
+
+        if self.semantic_capacity < 1:
+            return (
+                False,
+                f"semantic_capacity must be >= 1, got {self.semantic_capacity}",
+            )
+
+        if self.response_ttl < 0:
+            return False, f"response_ttl must be >= 0, got {self.response_ttl}"
+
+        return True, ""
@@ -2,7 +2,7 @@
 
 import os
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 
 @dataclass
@@ -16,6 +16,62 @@ class ModelConfig:
     model_name: str = os.getenv("MODEL_NAME", "Dev Assistant")
     model_key: str = os.getenv("MODEL_KEY", "dev-assistant-v1")
 
+    # Endpoint (OpenAI-compatible, e.g. Foundry Local)
+    base_url: str = os.getenv("MODEL_BASE_URL", "http://127.0.0.1:62670/v1")
+    request_timeout: float = float(os.getenv("MODEL_REQUEST_TIMEOUT", "40"))
+    health_check_timeout: float = float(os.getenv("MODEL_HEALTH_TIMEOUT", "2"))
+
+    # Shared HTTP clients (services.core.http_client): keep-alive pool sizes
+    # and the connect timeout; request_timeout bounds reads/writes
+    connect_timeout: float = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+    http_max_connections: int = int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", "16"))
+    http_max_keepalive: int = int(os.getenv("MODEL_HTTP_MAX_KEEPALIVE", "8"))
+    http_keepalive_expiry: float = float(
+        os.getenv("MODEL_HTTP_KEEPALIVE_EXPIRY", "120")
+    )
+
+    # Model pool: comma-separated endpoints served by several instances of the
+    # same model. Requests go to the backend with the fewest in flight; a
+    # backend that times out is ejected for pool_eject_seconds and the request
+    # is retried on another one.
+    endpoints: List[str] = field(
+        default_factory=lambda: [
+            url.strip()
+            for url in os.getenv("MODEL_ENDPOINTS", "").split(",")
+            if url.strip()
+        ]
+    )
+    pool_eject_seconds: float = float(os.getenv("MODEL_POOL_EJECT_SECONDS", "30"))
+    pool_health_interval: float = float(os.getenv("MODEL_POOL_HEALTH_INTERVAL", "10"))
+
+    # Micro-batching of chat-only requests (services.core.batcher): requests
+    # arriving within batch_max_wait_ms are sent to the server together
+    batching: bool = os.getenv("MODEL_BATCHING", "false").lower() == "true"
+    batch_max_size: int = int(os.getenv("MODEL_BATCH_MAX_SIZE", "8"))
+    batch_max_wait_ms: float = float(os.getenv("MODEL_BATCH_MAX_WAIT_MS", "5"))
+
+    # Request scheduling (services.core.scheduler): model slots handed out by
+    # priority, with a bounded queue and per-user caps; background work may
+    # not take the last background_reserve slots, and router_reserve extra
+    # slots are kept for the (short) router calls
+    scheduler: bool = os.getenv("MODEL_SCHEDULER", "true").lower() == "true"
+    max_concurrent: int = int(os.getenv("MODEL_MAX_CONCURRENT", "2"))
+    max_queue: int = int(os.getenv("MODEL_MAX_QUEUE", "32"))
+    max_per_user: int = int(os.getenv("MODEL_MAX_PER_USER", "2"))
+    background_reserve: int = int(os.getenv("MODEL_BACKGROUND_RESERVE", "1"))
+    router_reserve: int = int(os.getenv("MODEL_ROUTER_RESERVE", "1"))
+    queue_timeout: float = float(os.getenv("MODEL_QUEUE_TIMEOUT", "60"))
+
+    # Agent tool-loop limits per request (services.core.budget)
+    agent_max_steps: int = int(os.getenv("AGENT_MAX_STEPS", "8"))
+    agent_max_seconds: float = float(os.getenv("AGENT_MAX_SECONDS", "120"))
+    agent_max_tokens: int = int(os.getenv("AGENT_MAX_TOKENS", "4000"))
+    agent_max_repeats: int = int(os.getenv("AGENT_MAX_REPEATS", "2"))
+    # Tool calls of one step run concurrently (up to agent_tool_concurrency),
+    # each bounded by agent_tool_timeout seconds (0 disables the timeout)
+    agent_tool_concurrency: int = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+    agent_tool_timeout: float = float(os.getenv("AGENT_TOOL_TIMEOUT", "30"))
+
     # Runtime parameters
     temperature: float = float(os.getenv("MODEL_TEMPERATURE", "0.2"))
     max_tokens: int = int(os.getenv("MODEL_MAX_TOKENS", "2000"))
@@ -24,6 +80,23 @@ class ModelConfig:
     top_k: int = int(os.getenv("MODEL_TOP_K", "50"))
     repetition_penalty: float = float(os.getenv("MODEL_REPETITION_PENALTY", "1.05"))
 
+    # Context window management
+    tokenizer: str = os.getenv("MODEL_TOKENIZER", "Qwen/Qwen2.5-Coder-7B-Instruct")
+    prompt_reserve_tokens: int = int(os.getenv("MODEL_PROMPT_RESERVE_TOKENS", "1024"))
+    history_summarize: bool = (
+        os.getenv("MODEL_HISTORY_SUMMARIZE", "false").lower() == "true"
+    )
+
+    # Prompt prefix caching: send {prompt_cache_field: true} with every
+    # request to servers that keep the KV cache of a repeated prefix
+    prompt_cache: bool = os.getenv("MODEL_PROMPT_CACHE", "false").lower() == "true"
+    prompt_cache_field: str = os.getenv("MODEL_PROMPT_CACHE_FIELD", "cache_prompt")
+
+    # Prompt compaction (see services.core.prompt_builder.compile_prompt):
+    # "full", "compact" or "minimal"
+    prompt_profile: str = os.getenv("MODEL_PROMPT_PROFILE", "compact")
+    compact_tools: bool = os.getenv("MODEL_COMPACT_TOOLS", "true").lower() == "true"
+
     # Features
     streaming: bool = os.getenv("MODEL_STREAMING", "true").lower() == "true"
 
@@ -44,6 +117,8 @@ class ModelConfig:
         return {
             "foundry_model": self.foundry_model,
             "model_name": self.model_name,
+            "base_url": self.base_url,
+            "endpoints": self.endpoints,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "max_context": self.max_context,
@@ -51,6 +126,15 @@ class ModelConfig:
             "top_k": self.top_k,
             "repetition_penalty": self.repetition_penalty,
             "streaming": self.streaming,
+            "prompt_reserve_tokens": self.prompt_reserve_tokens,
+            "history_summarize": self.history_summarize,
+            "prompt_cache": self.prompt_cache,
+            "prompt_profile": self.prompt_profile,
+            "batching": self.batching,
+            "scheduler": self.scheduler,
+            "max_concurrent": self.max_concurrent,
+            "agent_max_steps": self.agent_max_steps,
+            "agent_max_seconds": self.agent_max_seconds,
         }
 
     def validate(self) -> tuple[bool, str]:
@@ -65,6 +149,21 @@ class ModelConfig:
         if not 0 <= self.temperature <= 2:
             return False, f"temperature must be 0-2, got {self.temperature}"
 
+        if self.http_max_connections < 1:
+            return (
+                False,
+                f"http_max_connections must be >= 1, got {self.http_max_connections}",
+            )
+
+        if self.batch_max_size < 1:
+            return False, f"batch_max_size must be >= 1, got {self.batch_max_size}"
+
+        if self.max_concurrent < 1:
+            return False, f"max_concurrent must be >= 1, got {self.max_concurrent}"
+
+        if self.agent_max_steps < 1:
+            return False, f"agent_max_steps must be >= 1, got {self.agent_max_steps}"
+
         if self.max_tokens < 1:
             return False, f"max_tokens must be >= 1, got {self.max_tokens}"
 
@@ -74,4 +173,14 @@ class ModelConfig:
                 f"max_context ({self.max_context}) must be >= max_tokens ({self.max_tokens})",
             )
 
+        if self.max_context - self.max_tokens - self.prompt_reserve_tokens < 1:
+            return (
+                False,
+                "max_context leaves no room for history after max_tokens "
+                f"and prompt_reserve_tokens ({self.prompt_reserve_tokens})",
+            )
+
+        if self.prompt_profile not in ("full", "compact", "minimal"):
+            return False, f"Invalid prompt_profile: {self.prompt_profile}"
+
         return True, ""
@@ -0,0 +1,151 @@
+"""Router configuration."""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Positive weights push toward AGENT, negative toward CHAT.
+DEFAULT_KEYWORD_TRIGGERS: Dict[str, float] = {
+    "run": 1.0,
+    "runs": 1.0,
+    "running": 1.0,
+    "execute": 1.5,
+    "exec": 1.0,
+    "fetch": 1.0,
+    "scan": 1.0,
+    "analyze": 1.5,
+    "analyse": 1.5,
+    "list": 0.5,
+    "list files": 1.0,
+    "tool": 0.5,
+    "call": 0.5,
+    "save to": 1.5,
+    "write to": 1.0,
+    "read file": 1.5,
+    "read the file": 1.5,
+    "search the code": 1.5,
+    "search code": 1.5,
+    "where is": 0.5,
+    "defined": 0.5,
+    "usages": 1.0,
+    "memory": 1.0,
+    "memories": 1.0,
+    "remember": 1.0,
+    "recall": 1.0,
+    "how do": -1.0,
+    "how to": -1.0,
+    "what is": -1.0,
+    "what does": -1.0,
+    "explain": -1.0,
+    "example": -0.5,
+    "why": -0.5,
+}
+
+
+@dataclass
+class RouterConfig:
+    """Routing (AGENT vs CHAT) configuration."""
+
+    # Let the LLM decide inputs the local classifier is unsure about
+    use_llm: bool = os.getenv("ROUTER_USE_LLM", "false").lower() == "true"
+
+    # Classifier margin (0-1) above which the LLM is never consulted
+    confidence_threshold: float = float(os.getenv("ROUTER_CONFIDENCE", "0.35"))
+
+    # Constrained LLM fallback: only the first token(s) of the mode are needed
+    llm_max_tokens: int = int(os.getenv("ROUTER_LLM_MAX_TOKENS", "2"))
+
+    # LLM decisions are logged here and replayed to train the classifier
+    decision_log: str = os.getenv(
+        "ROUTER_DECISION_LOG", "data/cache/router_decisions.jsonl"
+    )
+    decision_log_replay: int = int(os.getenv("ROUTER_DECISION_LOG_REPLAY", "5000"))
+
+    # Keyword tier: weighted triggers, optionally extended from a JSON file
+    # of {"trigger phrase": weight}
+    keyword_triggers: Dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_KEYWORD_TRIGGERS)
+    )
+    triggers_file: str = os.getenv("ROUTER_TRIGGERS_FILE", "")
+    keyword_threshold: float = float(os.getenv("ROUTER_KEYWORD_THRESHOLD", "1.0"))
+
+    # Speculative routing: while the LLM router decides, the CHAT answer is
+    # already being generated (and discarded if the route is AGENT). Inputs
+    # with a keyword score >= speculative_agent_score skip the LLM and go
+    # straight to the agent.
+    speculative: bool = os.getenv("ROUTER_SPECULATIVE", "false").lower() == "true"
+    speculative_agent_score: float = float(
+        os.getenv("ROUTER_SPECULATIVE_AGENT_SCORE", "2.5")
+    )
+
+    # Per-request tool subsetting (services.core.tool_selector): bind only the
+    # best-matching tools; agents are compiled once per subset and cached
+    tool_selection: bool = os.getenv("TOOL_SELECTION", "true").lower() == "true"
+    tool_selection_mode: str = os.getenv("TOOL_SELECTION_MODE", "keyword")
+    tool_selection_max_tools: int = int(os.getenv("TOOL_SELECTION_MAX_TOOLS", "3"))
+    # Empty: the selector's per-mode default
+    tool_selection_min_score: Optional[float] = (
+        float(os.environ["TOOL_SELECTION_MIN_SCORE"])
+        if os.getenv("TOOL_SELECTION_MIN_SCORE")
+        else None
+    )
+    tool_selection_max_agents: int = int(os.getenv("TOOL_SELECTION_MAX_AGENTS", "16"))
+
+    def __post_init__(self):
+        """Merge triggers from triggers_file over the defaults."""
+        if self.triggers_file and os.path.exists(self.triggers_file):
+            try:
+                with open(self.triggers_file, "r", encoding="utf-8") as f:
+                    extra = {str(k).lower(): float(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError, AttributeError, TypeError) as e:
+                # A broken file must not stop the app from starting
+                logger.warning(
+                    f"Ignoring router triggers file {self.triggers_file}: {e}"
+                )
+                return
+            self.keyword_triggers.update(extra)
+
+    def ui_view(self) -> Dict[str, object]:
+        """Get UI-safe view of configuration."""
+        return {
+            "use_llm": self.use_llm,
+            "confidence_threshold": self.confidence_threshold,
+            "llm_max_tokens": self.llm_max_tokens,
+            "keyword_triggers": len(self.keyword_triggers),
+            "keyword_threshold": self.keyword_threshold,
+            "speculative": self.speculative,
+            "tool_selection": self.tool_selection,
+            "tool_selection_mode": self.tool_selection_mode,
+            "tool_selection_max_tools": self.tool_selection_max_tools,
+        }
+
+    def validate(self) -> tuple[bool, str]:
+        """Validate router configuration.
+
+        Returns:
+            Tuple of (is_valid, error_message)
+        """
+        if not 0 <= self.confidence_threshold <= 1:
+            return (
+                False,
+                f"confidence_threshold must be 0-1, got {self.confidence_threshold}",
+            )
+
+        if self.llm_max_tokens < 1:
+            return False, f"llm_max_tokens must be >= 1, got {self.llm_max_tokens}"
+
+        if self.tool_selection_mode not in ("keyword", "embedding"):
+            return False, f"Invalid tool_selection_mode: {self.tool_selection_mode}"
+
+        if self.tool_selection_max_tools < 1:
+            return (
+                False,
+                "tool_selection_max_tools must be >= 1, "
+                f"got {self.tool_selection_max_tools}",
+            )
+
+        return True, ""
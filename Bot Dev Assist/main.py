@@ -1,60 +1,89 @@
-import argparse
-import uuid
-
-from services.agent_runtime import AgentRuntime
-from services.core.modal_loader import modal_loader
-from services.core.router import route_message
-from services.integrations.iris_connector import IRISConnector
-
-
-def main():
-    parser = argparse.ArgumentParser(
-        description="Dev Assistant (LangChain + Foundry Local)"
-    )
-    parser.add_argument("--user", "-u", default="Guest", help="User ID")
-    parser.add_argument(
-        "--router-llm",
-        action="store_true",
-        help="Use LLM-based routing (otherwise keyword routing).",
-    )
-    args = parser.parse_args()
-
-    session_id = str(uuid.uuid4())
-
-    # Initialize model + agent once
-    llm = modal_loader.get_llm()
-    agent = modal_loader.get_agent()
-
-    runtime = AgentRuntime(user=args.user, agent=agent, llm=llm, session_id=session_id)
-
-    print("Dev Assistant ready. Type 'exit' to quit.")
-    while True:
-        try:
-            user_input = input("> ").strip()
-            if user_input.lower() in {"exit", "quit"}:
-                break
-            if not user_input:
-                continue
-
-            # Decide routing strategy
-            routing_llm = llm if args.router_llm else None
-            mode = route_message(
-                llm=routing_llm, user_input=user_input, session_id=session_id
-            )
-
-            # Execute the selected mode explicitly (avoid double-routing inside runtime.run)
-            if mode == "AGENT":
-                output = runtime._run_agent(user_input)
-            else:
-                output = runtime._run_llm_only(user_input)
-
-            print(output)
-
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print(f"[ERROR] {e}")
-
-
-if __name__ == "__main__":
-    main()
+import argparse
+import time
+import uuid
+
+from config import settings
+from services.agent_runtime import AgentRuntime
+from services.core.modal_loader import modal_loader
+from services.integrations.iris_connector import IRISConnector
+
+
+def main():
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(
+        description="Dev Assistant (LangChain + Foundry Local)"
+    )
+    parser.add_argument("--user", "-u", default="Guest", help="User ID")
+    parser.add_argument(
+        "--router-llm",
+        action="store_true",
+        help="Let the LLM decide routes the local classifier is unsure about.",
+    )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="With --router-llm: start the chat answer while the router decides.",
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Print each answer only after generation completes.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the chat response cache.",
+    )
+    parser.add_argument(
+        "--session",
+        "-s",
+        default=None,
+        help="Resume a saved session by id (a new one is started otherwise).",
+    )
+    args = parser.parse_args()
+
+    session_id = args.session or str(uuid.uuid4())
+    streaming = settings.model.streaming and not args.no_stream
+
+    # Constructing the LLM client is cheap; the health probe and agent
+    # compilation run in the background so the prompt appears immediately.
+    llm = modal_loader.get_llm()
+    modal_loader.warm_up()
+
+    runtime = AgentRuntime(
+        user=args.user,
+        llm=llm,
+        session_id=session_id,
+        use_llm_router=args.router_llm or None,
+        speculative=args.speculative or None,
+        use_response_cache=not args.no_cache,
+    )
+
+    ready_ms = (time.perf_counter() - start) * 1000
+    print(f"Dev Assistant ready in {ready_ms:.0f} ms. Type 'exit' to quit.")
+    print(f"Session: {session_id}")
+    while True:
+        try:
+            user_input = input("> ").strip()
+            if user_input.lower() in {"exit", "quit"}:
+                break
+            if not user_input:
+                continue
+
+            # The runtime routes exactly once per turn
+            if streaming:
+                for chunk in runtime.stream(user_input):
+                    print(chunk, end="", flush=True)
+                print()
+                continue
+
+            print(runtime.run(user_input))
+
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+
+if __name__ == "__main__":
+    main()
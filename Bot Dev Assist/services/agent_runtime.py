@@ -1,109 +1,828 @@
-"""Agent runtime execution."""
-
-from __future__ import annotations
-
-import uuid
-from typing import Any, Optional
-
-from config import settings
-from config.logging_config import setup_logging, with_context
-from services.core.guardrails import check_input, strip_control_tokens
-from services.core.router import route_message
-
-
-class AgentRuntime:
-    """Main entry point for chat/agent execution."""
-
-    def __init__(
-        self,
-        user: str = "Guest",
-        agent: Any = None,
-        llm: Any = None,
-        session_id: Optional[str] = None,
-    ):
-        base_logger = setup_logging(settings.app)
-        self.user = user
-        self.session_id = session_id or str(uuid.uuid4())
-        self.logger = with_context(
-            base_logger,
-            component="AgentRuntime",
-            user=self.user,
-            session_id=self.session_id,
-        )
-
-        # agent: create_agent(...) return (compiled agent runtime)
-        # llm: ChatOpenAI instance (chat-only mode)
-        self.agent = agent
-        self.llm = llm
-
-        # Some LangChain components accept a second "config" arg; keep thread_id for traceability.
-        self.config = {"configurable": {"thread_id": self.session_id}}
-
-    def run(self, user_input: str) -> str:
-        allowed, message = check_input(user_input)
-        if not allowed:
-            return f"Request rejected: {message}"
-
-        try:
-            mode = route_message(
-                llm=self.llm, user_input=user_input, session_id=self.session_id
-            )
-            self.logger.info("Routing decision", extra={"mode": mode})
-
-            if mode == "AGENT":
-                return self._run_agent(user_input)
-            return self._run_llm_only(user_input)
-
-        except Exception as e:
-            self.logger.error("Runtime error", extra={"error": str(e)})
-            return f"I encountered an error: {str(e)}"
-
-    def _run_agent(self, user_input: str) -> str:
-        """
-        Run agent with tools.
-
-        Official LangChain usage:
-        agent.invoke({"messages": [{"role": "user", "content": "..."}]})
-        The agent runtime executes tools internally and returns updated state.
-        """
-        if self.agent is None:
-            return "Agent is not initialized. Check modal_loader.get_agent()."
-
-        try:
-            # Pass messages in state, as documented.
-            result = self.agent.invoke(
-                {"messages": [{"role": "user", "content": user_input}]},
-                self.config,
-            )
-
-            # result is an updated state dict; docs show messages being present in state.
-            messages = result.get("messages") if isinstance(result, dict) else None
-            if not messages:
-                return "Agent returned no messages."
-
-            last_msg = messages[-1]
-            content = getattr(last_msg, "content", None)
-            if content is None:
-                content = str(last_msg)
-
-            return strip_control_tokens(content)
-
-        except Exception as e:
-            self.logger.error("Agent execution failed", extra={"error": str(e)})
-            return f"Agent execution failed: {str(e)}"
-
-    def _run_llm_only(self, user_input: str) -> str:
-        """Run chat-only path (no tools)."""
-        if self.llm is None:
-            return "LLM is not initialized. Check modal_loader.get_llm()."
-
-        try:
-            result = self.llm.invoke(user_input)
-            content = getattr(result, "content", None)
-            if content is None:
-                content = str(result)
-            return strip_control_tokens(content)
-
-        except Exception as e:
-            self.logger.error("LLM execution failed", extra={"error": str(e)})
-            return f"LLM execution failed: {str(e)}"
+"""Agent runtime execution."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.messages import RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from config import settings
+from config.logging_config import setup_logging, with_context
+from services.core.batcher import get_batcher
+from services.core.budget import AgentBudget
+from services.core.checkpointer import get_checkpointer
+from services.core.guardrails import (
+    check_input,
+    control_token_stream,
+    strip_control_tokens,
+)
+from services.core.history import ConversationHistory
+from services.core.response_cache import cache_scope, get_response_cache
+from services.core.scheduler import Priority, aschedule, schedule
+from services.core.semantic_cache import get_semantic_cache
+from services.core.router import aroute_message, local_route, route_message
+from services.core.speculation import AsyncSpeculativeStream, SpeculativeStream
+from services.core.tool_selector import select_tools
+
+
+class AgentRuntime:
+    """Main entry point for chat/agent execution."""
+
+    def __init__(
+        self,
+        user: str = "Guest",
+        agent: Any = None,
+        llm: Any = None,
+        session_id: Optional[str] = None,
+        use_llm_router: Optional[bool] = None,
+        use_response_cache: bool = True,
+        speculative: Optional[bool] = None,
+        background: bool = False,
+    ):
+        base_logger = setup_logging(settings.app)
+        self.user = user
+        self.session_id = session_id or str(uuid.uuid4())
+        self.logger = with_context(
+            base_logger,
+            component="AgentRuntime",
+            user=self.user,
+            session_id=self.session_id,
+        )
+
+        # agent: create_agent(...) return (compiled agent runtime); if omitted it
+        #        is fetched from modal_loader on the first AGENT-routed request
+        # llm: ChatOpenAI instance (chat-only mode)
+        self._agent = agent
+        self.llm = llm
+
+        # Chat-only requests from all sessions sharing this llm are batched
+        self._batcher = get_batcher(llm)
+
+        # The router only consults the LLM for inputs the local classifier is unsure of.
+        if use_llm_router is None:
+            use_llm_router = settings.router.use_llm
+        self.router_llm = llm if use_llm_router else None
+
+        # Start the CHAT answer while the LLM router decides (LLM router only)
+        if speculative is None:
+            speculative = settings.router.speculative
+        self.speculative = bool(speculative and self.router_llm is not None)
+
+        # Scheduling class of this session's model calls; background sessions
+        # (batch jobs) yield to interactive ones
+        self.priority = Priority.BATCH if background else Priority.INTERACTIVE
+        self._step_priority = Priority.BATCH if background else Priority.AGENT
+
+        # Bypass flag for the chat-only response cache
+        self.use_response_cache = use_response_cache
+
+        # Multi-turn context, trimmed to the model window on every request
+        summarize = settings.model.history_summarize
+        self.history = ConversationHistory(
+            summarizer=self._summarize if summarize else None,
+            asummarizer=self._asummarize if summarize else None,
+        )
+
+        # thread_id keys the session's checkpoints (see services.core.checkpointer)
+        # user/priority schedule the agent's steps (see services.core.scheduler)
+        self.config = {
+            "configurable": {
+                "thread_id": self.session_id,
+                "user": self.user,
+                "priority": int(self._step_priority),
+            }
+        }
+        if session_id:
+            self._restore_history()
+
+    @property
+    def agent(self) -> Any:
+        """
+        The agent passed in, else the shared all-tools agent from
+        modal_loader (compiled on the first request that needs it).
+        """
+        if self._agent is not None:
+            return self._agent
+        return self._loaded_agent()
+
+    @agent.setter
+    def agent(self, value: Any) -> None:
+        self._agent = value
+
+    def _loaded_agent(self, tool_names: Optional[Set[str]] = None) -> Any:
+        from services.core.modal_loader import modal_loader
+
+        try:
+            return modal_loader.get_agent(tool_names)
+        except Exception as e:
+            self.logger.error("Agent initialization failed", extra={"error": str(e)})
+            return None
+
+    def _agent_for(self, user_input: str) -> Any:
+        """Agent bound only to the tools relevant to this input."""
+        if self._agent is not None:
+            return self._agent
+        return self._loaded_agent(select_tools(user_input))
+
+    def run(self, user_input: str) -> str:
+        allowed, message = check_input(user_input)
+        if not allowed:
+            return f"Request rejected: {message}"
+
+        try:
+            if self.speculative:
+                decision = local_route(user_input)
+                if decision is None:
+                    return "".join(self._stream_speculative(user_input))
+                mode = decision.mode
+            else:
+                mode = route_message(
+                    llm=self.router_llm,
+                    user_input=user_input,
+                    session_id=self.session_id,
+                )
+            self.logger.info("Routing decision", extra={"mode": mode})
+
+            if mode == "AGENT":
+                return self._run_agent(user_input)
+            return self._run_llm_only(user_input)
+
+        except Exception as e:
+            self.logger.error("Runtime error", extra={"error": str(e)})
+            return f"I encountered an error: {str(e)}"
+
+    def stream(self, user_input: str) -> Iterator[str]:
+        """Streaming variant of run(): yields cleaned text as it is generated."""
+        allowed, message = check_input(user_input)
+        if not allowed:
+            yield f"Request rejected: {message}"
+            return
+
+        try:
+            decision = local_route(user_input) if self.speculative else None
+            if self.speculative and decision is None:
+                chunks = self._stream_speculative(user_input)
+            else:
+                mode = (
+                    decision.mode
+                    if decision is not None
+                    else route_message(
+                        llm=self.router_llm,
+                        user_input=user_input,
+                        session_id=self.session_id,
+                    )
+                )
+                self.logger.info("Routing decision", extra={"mode": mode})
+                chunks = (
+                    self._stream_agent(user_input)
+                    if mode == "AGENT"
+                    else self._stream_llm_only(user_input)
+                )
+        except Exception as e:
+            self.logger.error("Runtime error", extra={"error": str(e)})
+            yield f"I encountered an error: {str(e)}"
+            return
+
+        yield from chunks
+
+    async def arun(self, user_input: str) -> str:
+        """Async variant of run(); uses ainvoke so many sessions share one event loop."""
+        allowed, message = check_input(user_input)
+        if not allowed:
+            return f"Request rejected: {message}"
+
+        try:
+            if self.speculative:
+                decision = local_route(user_input)
+                if decision is None:
+                    return "".join(
+                        [c async for c in self._astream_speculative(user_input)]
+                    )
+                mode = decision.mode
+            else:
+                mode = await aroute_message(
+                    llm=self.router_llm,
+                    user_input=user_input,
+                    session_id=self.session_id,
+                )
+            self.logger.info("Routing decision", extra={"mode": mode})
+
+            if mode == "AGENT":
+                return await self._arun_agent(user_input)
+            return await self._arun_llm_only(user_input)
+
+        except Exception as e:
+            self.logger.error("Runtime error", extra={"error": str(e)})
+            return f"I encountered an error: {str(e)}"
+
+    async def astream(self, user_input: str) -> AsyncIterator[str]:
+        """Async variant of stream()."""
+        allowed, message = check_input(user_input)
+        if not allowed:
+            yield f"Request rejected: {message}"
+            return
+
+        try:
+            decision = local_route(user_input) if self.speculative else None
+            if self.speculative and decision is None:
+                chunks = self._astream_speculative(user_input)
+            else:
+                mode = (
+                    decision.mode
+                    if decision is not None
+                    else await aroute_message(
+                        llm=self.router_llm,
+                        user_input=user_input,
+                        session_id=self.session_id,
+                    )
+                )
+                self.logger.info("Routing decision", extra={"mode": mode})
+                chunks = (
+                    self._astream_agent(user_input)
+                    if mode == "AGENT"
+                    else self._astream_llm_only(user_input)
+                )
+        except Exception as e:
+            self.logger.error("Runtime error", extra={"error": str(e)})
+            yield f"I encountered an error: {str(e)}"
+            return
+
+        async for chunk in chunks:
+            yield chunk
+
+    def _run_agent(self, user_input: str) -> str:
+        """
+        Run agent with tools.
+
+        Official LangChain usage:
+        agent.invoke({"messages": [{"role": "user", "content": "..."}]})
+        The agent runtime executes tools internally and returns updated state.
+        """
+        agent = self._agent_for(user_input)
+        if agent is None:
+            return "Agent is not initialized. Check modal_loader.get_agent()."
+
+        try:
+            # Pass messages in state, as documented (replacing the checkpointed ones).
+            result = agent.invoke(
+                self._agent_input(user_input),
+                self._agent_config(),
+            )
+
+            # result is an updated state dict; docs show messages being present in state.
+            messages = result.get("messages") if isinstance(result, dict) else None
+            if not messages:
+                return "Agent returned no messages."
+
+            last_msg = messages[-1]
+            content = getattr(last_msg, "content", None)
+            if content is None:
+                content = str(last_msg)
+
+            content = strip_control_tokens(content)
+            self.history.add_turn(user_input, content)
+            return content
+
+        except Exception as e:
+            self.logger.error("Agent execution failed", extra={"error": str(e)})
+            return f"Agent execution failed: {str(e)}"
+
+    def _run_llm_only(self, user_input: str) -> str:
+        """Run chat-only path (no tools)."""
+        if self.llm is None:
+            return "LLM is not initialized. Check modal_loader.get_llm()."
+
+        messages = self.history.window(user_input)
+        cached = self._cache_lookup(user_input)
+        if cached is not None:
+            self.history.add_turn(user_input, cached)
+            self._checkpoint_history()
+            return cached
+
+        try:
+            with schedule(self.priority, self.user):
+                result = (
+                    self._batcher.invoke(messages)
+                    if self._batcher is not None
+                    else self.llm.invoke(messages)
+                )
+            content = getattr(result, "content", None)
+            if content is None:
+                content = str(result)
+            content = strip_control_tokens(content)
+            self._cache_store(user_input, content)
+            self.history.add_turn(user_input, content)
+            self._checkpoint_history()
+            return content
+
+        except Exception as e:
+            self.logger.error("LLM execution failed", extra={"error": str(e)})
+            return f"LLM execution failed: {str(e)}"
+
+    def _stream_agent(self, user_input: str) -> Iterator[str]:
+        """
+        Stream the agent's model tokens as they are produced.
+
+        stream_mode="messages" yields (message_chunk, metadata) tuples for every
+        LLM token inside the tool loop; tool results arrive as ToolMessage and
+        are not echoed to the user.
+        """
+        agent = self._agent_for(user_input)
+        if agent is None:
+            yield "Agent is not initialized. Check modal_loader.get_agent()."
+            return
+
+        config = self._agent_config()
+        stripper = control_token_stream()
+        parts = []
+        try:
+            for chunk, _metadata in agent.stream(
+                self._agent_input(user_input),
+                config,
+                stream_mode="messages",
+            ):
+                if type(chunk).__name__ != "AIMessageChunk":
+                    continue
+                if getattr(chunk, "tool_call_chunks", None):
+                    # A tool-calling step: its text is not part of the answer
+                    parts = []
+                cleaned = stripper.feed(_chunk_text(chunk))
+                if cleaned:
+                    parts.append(cleaned)
+                    yield cleaned
+
+            tail = stripper.flush()
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            # An early stop's answer is returned by the middleware, not streamed
+            budget = config["configurable"]["budget"]
+            if budget.stop_reason:
+                yield ("\n\n" if parts else "") + budget.partial
+                parts = [budget.partial]
+
+            self.history.add_turn(user_input, strip_control_tokens("".join(parts)))
+
+        except Exception as e:
+            self.logger.error("Agent execution failed", extra={"error": str(e)})
+            yield f"Agent execution failed: {str(e)}"
+
+    def _stream_llm_only(self, user_input: str) -> Iterator[str]:
+        """Stream chat-only path (no tools)."""
+        if self.llm is None:
+            yield "LLM is not initialized. Check modal_loader.get_llm()."
+            return
+
+        messages = self.history.window(user_input)
+        cached = self._cache_lookup(user_input)
+        if cached is not None:
+            self.history.add_turn(user_input, cached)
+            self._checkpoint_history()
+            yield cached
+            return
+
+        yield from self._emit_chat(user_input, self._chat_chunks(messages))
+
+    def _stream_speculative(self, user_input: str) -> Iterator[str]:
+        """
+        Chat-only generation started before the LLM router has decided; it is
+        committed if the route is CHAT and cancelled if it is AGENT.
+        """
+        if self.llm is None:
+            yield "LLM is not initialized. Check modal_loader.get_llm()."
+            return
+
+        messages = self.history.window(user_input)
+        cached = self._cache_lookup(user_input)
+        speculation = None
+        if cached is None:
+            speculation = SpeculativeStream(lambda: self._chat_chunks(messages))
+
+        start = time.perf_counter()
+        try:
+            mode = route_message(
+                llm=self.router_llm, user_input=user_input, session_id=self.session_id
+            )
+        except Exception:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+        routing_ms = (time.perf_counter() - start) * 1000
+        self.logger.info("Routing decision", extra={"mode": mode, "speculative": True})
+
+        if mode == "AGENT":
+            if speculation is not None:
+                speculation.cancel()
+            yield from self._stream_agent(user_input)
+        elif cached is not None:
+            self.history.add_turn(user_input, cached)
+            self._checkpoint_history()
+            yield cached
+        else:
+            yield from self._emit_chat(user_input, speculation.commit(routing_ms))
+
+    def _chat_chunks(self, messages: List[Any]) -> Iterator[str]:
+        """Streamed chat text; a model slot is held while it is generated."""
+        with schedule(self.priority, self.user):
+            yield from _text_chunks(self.llm.stream(messages))
+
+    def _emit_chat(self, user_input: str, texts: Iterator[str]) -> Iterator[str]:
+        """Clean streamed chat text, then cache and record the answer."""
+        stripper = control_token_stream()
+        parts = []
+        try:
+            for text in texts:
+                cleaned = stripper.feed(text)
+                if cleaned:
+                    parts.append(cleaned)
+                    yield cleaned
+
+            tail = stripper.flush()
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            content = strip_control_tokens("".join(parts))
+            self._cache_store(user_input, content)
+            self.history.add_turn(user_input, content)
+            self._checkpoint_history()
+
+        except Exception as e:
+            self.logger.error("LLM execution failed", extra={"error": str(e)})
+            yield f"LLM execution failed: {str(e)}"
+        finally:
+            # A consumer that stops early stops the generation (and frees its slot)
+            close = getattr(texts, "close", None)
+            if close is not None:
+                close()
+
+    async def _arun_agent(self, user_input: str) -> str:
+        """Async variant of _run_agent()."""
+        agent = self._agent_for(user_input)
+        if agent is None:
+            return "Agent is not initialized. Check modal_loader.get_agent()."
+
+        try:
+            result = await agent.ainvoke(
+                await self._aagent_input(user_input),
+                self._agent_config(),
+            )
+
+            messages = result.get("messages") if isinstance(result, dict) else None
+            if not messages:
+                return "Agent returned no messages."
+
+            last_msg = messages[-1]
+            content = getattr(last_msg, "content", None)
+            if content is None:
+                content = str(last_msg)
+
+            content = strip_control_tokens(content)
+            self.history.add_turn(user_input, content)
+            return content
+
+        except Exception as e:
+            self.logger.error("Agent execution failed", extra={"error": str(e)})
+            return f"Agent execution failed: {str(e)}"
+
+    async def _arun_llm_only(self, user_input: str) -> str:
+        """Async variant of _run_llm_only()."""
+        if self.llm is None:
+            return "LLM is not initialized. Check modal_loader.get_llm()."
+
+        messages = await self.history.awindow(user_input)
+        cached = await asyncio.to_thread(self._cache_lookup, user_input)
+        if cached is not None:
+            self.history.add_turn(user_input, cached)
+            await self._acheckpoint_history()
+            return cached
+
+        try:
+            async with aschedule(self.priority, self.user):
+                result = (
+                    await self._batcher.ainvoke(messages)
+                    if self._batcher is not None
+                    else await self.llm.ainvoke(messages)
+                )
+            content = getattr(result, "content", None)
+            if content is None:
+                content = str(result)
+            content = strip_control_tokens(content)
+            await asyncio.to_thread(self._cache_store, user_input, content)
+            self.history.add_turn(user_input, content)
+            await self._acheckpoint_history()
+            return content
+
+        except Exception as e:
+            self.logger.error("LLM execution failed", extra={"error": str(e)})
+            return f"LLM execution failed: {str(e)}"
+
+    async def _astream_agent(self, user_input: str) -> AsyncIterator[str]:
+        """Async variant of _stream_agent()."""
+        agent = self._agent_for(user_input)
+        if agent is None:
+            yield "Agent is not initialized. Check modal_loader.get_agent()."
+            return
+
+        config = self._agent_config()
+        stripper = control_token_stream()
+        parts = []
+        try:
+            async for chunk, _metadata in agent.astream(
+                await self._aagent_input(user_input),
+                config,
+                stream_mode="messages",
+            ):
+                if type(chunk).__name__ != "AIMessageChunk":
+                    continue
+                if getattr(chunk, "tool_call_chunks", None):
+                    # A tool-calling step: its text is not part of the answer
+                    parts = []
+                cleaned = stripper.feed(_chunk_text(chunk))
+                if cleaned:
+                    parts.append(cleaned)
+                    yield cleaned
+
+            tail = stripper.flush()
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            # An early stop's answer is returned by the middleware, not streamed
+            budget = config["configurable"]["budget"]
+            if budget.stop_reason:
+                yield ("\n\n" if parts else "") + budget.partial
+                parts = [budget.partial]
+
+            self.history.add_turn(user_input, strip_control_tokens("".join(parts)))
+
+        except Exception as e:
+            self.logger.error("Agent execution failed", extra={"error": str(e)})
+            yield f"Agent execution failed: {str(e)}"
+
+    async def _astream_llm_only(self, user_input: str) -> AsyncIterator[str]:
+        """Async variant of _stream_llm_only()."""
+        if self.llm is None:
+            yield "LLM is not initialized. Check modal_loader.get_llm()."
+            return
+
+        messages = await self.history.awindow(user_input)
+        cached = await asyncio.to_thread(self._cache_lookup, user_input)
+        if cached is not None:
+            self.history.add_turn(user_input, cached)
+            await self._acheckpoint_history()
+            yield cached
+            return
+
+        async for chunk in self._aemit_chat(user_input, self._achat_chunks(messages)):
+            yield chunk
+
+    async def _astream_speculative(self, user_input: str) -> AsyncIterator[str]:
+        """Async variant of _stream_speculative()."""
+        if self.llm is None:
+            yield "LLM is not initialized. Check modal_loader.get_llm()."
+            return
+
+        messages = await self.history.awindow(user_input)
+        cached = await asyncio.to_thread(self._cache_lookup, user_input)
+        speculation = None
+        if cached is None:
+            speculation = AsyncSpeculativeStream(lambda: self._achat_chunks(messages))
+
+        start = time.perf_counter()
+        try:
+            mode = await aroute_message(
+                llm=self.router_llm, user_input=user_input, session_id=self.session_id
+            )
+        except Exception:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+        routing_ms = (time.perf_counter() - start) * 1000
+        self.logger.info("Routing decision", extra={"mode": mode, "speculative": True})
+
+        if mode == "AGENT":
+            if speculation is not None:
+                speculation.cancel()
+            chunks = self._astream_agent(user_input)
+        elif cached is not None:
+            self.history.add_turn(user_input, cached)
+            await self._acheckpoint_history()
+            yield cached
+            return
+        else:
+            chunks = self._aemit_chat(user_input, speculation.commit(routing_ms))
+        async for chunk in chunks:
+            yield chunk
+
+    async def _achat_chunks(self, messages: List[Any]) -> AsyncIterator[str]:
+        """Async variant of _chat_chunks()."""
+        async with aschedule(self.priority, self.user):
+            async for text in _atext_chunks(self.llm.astream(messages)):
+                yield text
+
+    async def _aemit_chat(
+        self, user_input: str, texts: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """Async variant of _emit_chat()."""
+        stripper = control_token_stream()
+        parts = []
+        try:
+            async for text in texts:
+                cleaned = stripper.feed(text)
+                if cleaned:
+                    parts.append(cleaned)
+                    yield cleaned
+
+            tail = stripper.flush()
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            content = strip_control_tokens("".join(parts))
+            await asyncio.to_thread(self._cache_store, user_input, content)
+            self.history.add_turn(user_input, content)
+            await self._acheckpoint_history()
+
+        except Exception as e:
+            self.logger.error("LLM execution failed", extra={"error": str(e)})
+            yield f"LLM execution failed: {str(e)}"
+        finally:
+            aclose = getattr(texts, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _agent_input(self, user_input: str) -> dict:
+        """
+        Agent state for a new turn. The checkpointed messages are replaced by
+        the token-budgeted history window, so a session's saved state never
+        grows past one window.
+        """
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *self.history.window(user_input),
+            ]
+        }
+
+    async def _aagent_input(self, user_input: str) -> dict:
+        """Async variant of _agent_input()."""
+        return {
+            "messages": [
+                RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                *await self.history.awindow(user_input),
+            ]
+        }
+
+    def _agent_config(self) -> dict:
+        """Run config for one agent request: the session plus a fresh budget."""
+        budget = AgentBudget.from_settings()
+        return {
+            "configurable": {**self.config["configurable"], "budget": budget},
+            "recursion_limit": budget.recursion_limit,
+            # Independent tool calls of a step run concurrently
+            "max_concurrency": settings.model.agent_tool_concurrency,
+        }
+
+    def _checkpoint_history(self) -> None:
+        """Save a chat-only turn into the session checkpoint as well.
+
+        Written through the checkpointer directly: going through
+        self.agent would compile the full agent on the first plain chat.
+        """
+        checkpointer = get_checkpointer()
+        if checkpointer is None:
+            return
+        try:
+            checkpointer.save_messages(self.config, self.history.context_messages())
+        except Exception as e:
+            self.logger.warning("Checkpoint update failed", extra={"error": str(e)})
+
+    async def _acheckpoint_history(self) -> None:
+        """Async variant of _checkpoint_history()."""
+        checkpointer = get_checkpointer()
+        if checkpointer is None:
+            return
+        try:
+            await checkpointer.asave_messages(
+                self.config, self.history.context_messages()
+            )
+        except Exception as e:
+            self.logger.warning("Checkpoint update failed", extra={"error": str(e)})
+
+    def _restore_history(self) -> None:
+        """Reload a resumed session's history from its latest checkpoint."""
+        checkpointer = get_checkpointer()
+        if checkpointer is None:
+            return
+        try:
+            saved = checkpointer.get_tuple(self.config)
+        except Exception as e:
+            self.logger.warning("Checkpoint load failed", extra={"error": str(e)})
+            return
+        if saved is None:
+            return
+
+        messages = saved.checkpoint.get("channel_values", {}).get("messages") or []
+        self.history.load(messages)
+        self.logger.info("Session restored", extra={"turns": len(self.history)})
+
+    def _cache_lookup(self, user_input: str) -> Optional[str]:
+        """Cached chat answer: exact match first, then semantic similarity."""
+        if not self.use_response_cache:
+            return None
+
+        # Answers depend on the conversation so far, not just the input
+        context = self.history.digest()
+
+        cache = get_response_cache()
+        if cache is not None:
+            cached = cache.get(cache.make_key(user_input, context=context))
+            if cached is not None:
+                return cached
+
+        semantic = get_semantic_cache()
+        if semantic is not None:
+            cached = semantic.lookup(user_input, cache_scope(context=context))
+            if cached is not None:
+                if cache is not None:
+                    cache.put(cache.make_key(user_input, context=context), cached)
+                return cached
+
+        return None
+
+    def _cache_store(self, user_input: str, answer: str) -> None:
+        if not self.use_response_cache:
+            return
+
+        context = self.history.digest()
+
+        cache = get_response_cache()
+        if cache is not None:
+            cache.put(cache.make_key(user_input, context=context), answer)
+
+        semantic = get_semantic_cache()
+        if semantic is not None:
+            semantic.add(user_input, answer, cache_scope(context=context))
+
+    def _summarize(self, turns: List[Tuple[str, str]], previous: str) -> str:
+        """Fold evicted turns into the rolling history summary."""
+        with schedule(self.priority, self.user):
+            result = self.llm.invoke(_summary_prompt(turns, previous))
+        return strip_control_tokens(getattr(result, "content", None) or str(result))
+
+    async def _asummarize(self, turns: List[Tuple[str, str]], previous: str) -> str:
+        """Async variant of _summarize()."""
+        async with aschedule(self.priority, self.user):
+            result = await self.llm.ainvoke(_summary_prompt(turns, previous))
+        return strip_control_tokens(getattr(result, "content", None) or str(result))
+
+
+def _summary_prompt(turns: List[Tuple[str, str]], previous: str) -> str:
+    transcript = "\n".join(f"User: {u}\nAssistant: {a}" for u, a in turns)
+    return (
+        "Update the summary of this conversation. Keep facts, names, file "
+        "paths and decisions; at most 120 words.\n\n"
+        f"Current summary:\n{previous or '(none)'}\n\n"
+        f"New turns:\n{transcript}\n\nUpdated summary:"
+    )
+
+
+def _text_chunks(stream: Iterator[Any]) -> Iterator[str]:
+    """Text of each streamed chunk; closing this closes the model stream."""
+    try:
+        for chunk in stream:
+            yield _chunk_text(chunk)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+async def _atext_chunks(stream: AsyncIterator[Any]) -> AsyncIterator[str]:
+    try:
+        async for chunk in stream:
+            yield _chunk_text(chunk)
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Extract plain text from a streamed message chunk."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        # Content blocks: keep only the text parts
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return ""
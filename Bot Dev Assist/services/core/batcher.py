@@ -0,0 +1,214 @@
+"""
+Micro-batching front-end for chat-only completions.
+
+Concurrent sessions that each send one chat request keep the local model
+server busy with a strictly serial stream of single prompts. MicroBatcher
+collects the requests that arrive within max_wait_ms of each other (up to
+max_batch_size) and dispatches them together with llm.batch(), so a server
+that batches concurrent prompts (Foundry Local, llama.cpp with parallel
+slots, vLLM) can process them in one pass.
+
+Callers get a per-request Future: invoke() blocks on it and ainvoke() awaits
+it, so sync and async sessions share the same batches. Each collected batch
+runs on an executor, so several batches can be in flight (their callers
+hold scheduler slots, which bound how many), and each request's future
+resolves as soon as its own answer is done (llm.batch_as_completed): a
+short reply never waits for the longest one in its batch, and new requests
+never wait for the previous batch to finish.
+
+stats() reports batch sizes, queue wait, request latency and throughput.
+"""
+
+import asyncio
+import logging
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """One queued request and the future its caller waits on."""
+
+    __slots__ = ("messages", "future", "enqueued")
+
+    def __init__(self, messages: Any):
+        self.messages = messages
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Groups concurrent llm.invoke() calls into llm.batch() calls."""
+
+    def __init__(self, llm: Any, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.llm = llm
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # In-flight batches never outnumber in-flight requests, which the
+        # scheduler caps at (at least) max_batch_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_batch_size, thread_name_prefix="llm-batch"
+        )
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._batches = 0
+        self._requests = 0
+        self._first_start: Optional[float] = None
+        self._last_done = 0.0
+        self._sizes: Deque[int] = deque(maxlen=512)
+        self._waits: Deque[float] = deque(maxlen=512)
+        self._latencies: Deque[float] = deque(maxlen=512)
+
+    def submit(self, messages: Any) -> Future:
+        """Queue a request; the future resolves to the model's message."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        pending = _Pending(messages)
+        self._ensure_thread()
+        self._queue.put(pending)
+        return pending.future
+
+    def invoke(self, messages: Any) -> Any:
+        return self.submit(messages).result()
+
+    async def ainvoke(self, messages: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(messages))
+
+    def close(self) -> None:
+        """Stop the dispatcher once the queued requests are served."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = list(self._sizes)
+            waits = list(self._waits)
+            latencies = sorted(self._latencies)
+            batches, requests = self._batches, self._requests
+            busy = self._last_done - (self._first_start or self._last_done)
+
+        if not batches:
+            return {"batches": 0, "requests": 0}
+        return {
+            "batches": batches,
+            "requests": requests,
+            "avg_batch_size": round(statistics.mean(sizes), 2),
+            "max_batch_size": max(sizes),
+            "queue_wait_ms_p50": round(statistics.median(waits) * 1000, 1),
+            "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+            "latency_ms_p95": round(
+                latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1
+            ),
+            "throughput_rps": round(requests / busy, 2) if busy else 0.0,
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="llm-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self, first: _Pending) -> List[_Pending]:
+        """The first request plus whatever arrives before its wait expires."""
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._executor.submit(self._dispatch, self._collect(first))
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            if self._first_start is None:
+                self._first_start = start
+            self._batches += 1
+            self._sizes.append(len(batch))
+            for pending in batch:
+                self._waits.append(start - pending.enqueued)
+
+        try:
+            for index, result in self.llm.batch_as_completed(
+                [p.messages for p in batch],
+                config={"max_concurrency": len(batch)},
+                return_exceptions=True,
+            ):
+                self._resolve(batch[index], result)
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    self._resolve(pending, e)
+        logger.debug(
+            f"Dispatched batch of {len(batch)} in "
+            f"{(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+    def _resolve(self, pending: _Pending, result: Any) -> None:
+        if isinstance(result, BaseException):
+            pending.future.set_exception(result)
+        else:
+            pending.future.set_result(result)
+        done = time.perf_counter()
+        with self._lock:
+            self._requests += 1
+            self._last_done = max(self._last_done, done)
+            self._latencies.append(done - pending.enqueued)
+
+
+_batchers: Dict[int, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(llm: Any) -> Optional[MicroBatcher]:
+    """Shared batcher for this LLM instance, or None when batching is off."""
+    model_cfg = settings.model
+    if not model_cfg.batching or llm is None:
+        return None
+
+    with _batchers_lock:
+        batcher = _batchers.get(id(llm))
+        if batcher is None or batcher.llm is not llm:
+            batcher = MicroBatcher(
+                llm,
+                max_batch_size=model_cfg.batch_max_size,
+                max_wait_ms=model_cfg.batch_max_wait_ms,
+            )
+            _batchers[id(llm)] = batcher
+    return batcher
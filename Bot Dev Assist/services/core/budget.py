@@ -0,0 +1,308 @@
+"""
+Per-request limits for the agent's tool loop.
+
+create_agent loops model -> tools -> model until the model stops calling
+tools; a confused small model can keep going for many multi-second steps.
+AgentRuntime gives every agent request a fresh AgentBudget (passed in the
+run config) and BudgetMiddleware enforces it around each step:
+
+- max_steps:   model calls per request;
+- max_seconds: wall time since the request started;
+- max_tokens:  tokens generated across all steps;
+- max_repeats: identical tool calls (same name and arguments) allowed
+               before the loop is short-circuited.
+
+When a limit is hit the model is not called again (and pending tools are
+skipped); the step returns a final answer built from what the loop has
+produced so far, so the caller still gets a partial result. The run
+config's recursion_limit is derived from max_steps as a hard backstop.
+
+The tool calls of one step already run concurrently (the agent's tool node
+maps them over a thread pool, or gathers them when async, up to the run
+config's max_concurrency) and come back in call order. Each call is also
+bounded by settings.model.agent_tool_timeout: a call that overruns is
+answered with a timeout ToolMessage so the step takes at most that long.
+Sync calls run on a watchdog pool; an overrun call that has not started is
+cancelled, and one that is still running retires the pool (its thread
+finishes in the background) so hung tools never use up the capacity later
+calls need.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, List, Optional, Sequence
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.config import get_config
+
+from config import settings
+from services.core.history import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Characters of each tool result quoted in a partial answer
+_PARTIAL_TOOL_CHARS = 500
+
+
+class AgentBudget:
+    """Limits and usage of one agent request."""
+
+    def __init__(
+        self,
+        max_steps: int = 8,
+        max_seconds: float = 120.0,
+        max_tokens: int = 4000,
+        max_repeats: int = 2,
+    ):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_repeats = max_repeats
+
+        self.steps = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.stop_reason: Optional[str] = None
+        self.partial = ""
+        self._calls: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls) -> "AgentBudget":
+        model_cfg = settings.model
+        return cls(
+            max_steps=model_cfg.agent_max_steps,
+            max_seconds=model_cfg.agent_max_seconds,
+            max_tokens=model_cfg.agent_max_tokens,
+            max_repeats=model_cfg.agent_max_repeats,
+        )
+
+    @property
+    def recursion_limit(self) -> int:
+        """Graph steps for max_steps model calls plus their tool steps."""
+        return 2 * self.max_steps + 3
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def exhausted(self) -> Optional[str]:
+        """Why no further step may run, or None."""
+        if self.stop_reason:
+            return self.stop_reason
+        if self.steps >= self.max_steps:
+            return f"step limit ({self.max_steps}) reached"
+        if self.elapsed >= self.max_seconds:
+            return f"time limit ({self.max_seconds:.0f}s) reached"
+        if self.tokens >= self.max_tokens:
+            return f"token limit ({self.max_tokens}) reached"
+        return None
+
+    def record(self, message: AIMessage) -> None:
+        """Count a completed model step."""
+        self.steps += 1
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens = usage.get("output_tokens")
+        if tokens is None:
+            tokens = count_tokens(_text(message))
+            tokens += sum(count_tokens(_call_key(c)) for c in message.tool_calls)
+        self.tokens += tokens
+
+    def repeated(self, tool_calls: Sequence[dict]) -> Optional[str]:
+        """Reason to stop if a tool call repeats more than max_repeats times."""
+        for call in tool_calls:
+            self._calls[_call_key(call)] += 1
+            if self._calls[_call_key(call)] > self.max_repeats:
+                return f"repeated call to {call.get('name')} with the same arguments"
+        return None
+
+    def stop(
+        self,
+        reason: str,
+        messages: Sequence[Any],
+        last: Optional[AIMessage] = None,
+    ) -> AIMessage:
+        """Final answer from the work done so far."""
+        self.stop_reason = reason
+        logger.info(
+            f"Agent stopped early: {reason} "
+            f"(steps={self.steps}, tokens={self.tokens}, {self.elapsed:.1f}s)"
+        )
+        self.partial = partial_answer(reason, messages, last)
+        return AIMessage(content=self.partial)
+
+
+def _call_key(call: dict) -> str:
+    args = json.dumps(call.get("args", {}), sort_keys=True, default=str)
+    return f"{call.get('name')}({args})"
+
+
+def _text(message: Any) -> str:
+    content = getattr(message, "content", "")
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return str(content or "")
+
+
+def partial_answer(
+    reason: str, messages: Sequence[Any], last: Optional[AIMessage] = None
+) -> str:
+    """The model's latest text plus the tool results of the current request."""
+    turn: List[Any] = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        turn.append(message)
+    turn.reverse()
+
+    lines = [f"(Stopped early: {reason}.)"]
+    texts = [_text(m).strip() for m in [*turn, last] if isinstance(m, AIMessage)]
+    texts = [t for t in texts if t]
+    if texts:
+        lines.append(texts[-1])
+
+    results = [m for m in turn if isinstance(m, ToolMessage)]
+    if results:
+        lines.append("Partial results:")
+        for result in results:
+            text = _text(result).strip()
+            if len(text) > _PARTIAL_TOOL_CHARS:
+                text = text[:_PARTIAL_TOOL_CHARS] + " ..."
+            lines.append(f"- {result.name or 'tool'}: {text}")
+    return "\n".join(lines)
+
+
+_watchdog: Optional[ThreadPoolExecutor] = None
+_watchdog_lock = threading.Lock()
+
+
+def _watchdog_pool() -> ThreadPoolExecutor:
+    global _watchdog
+    if _watchdog is None:
+        with _watchdog_lock:
+            if _watchdog is None:
+                _watchdog = ThreadPoolExecutor(
+                    max_workers=max(4, 2 * settings.model.agent_tool_concurrency),
+                    thread_name_prefix="agent-tool",
+                )
+    return _watchdog
+
+
+def _abandon(future) -> None:
+    """Give up on a watchdog call without letting it hold a pool worker."""
+    global _watchdog
+    if future.cancel():
+        return
+    with _watchdog_lock:
+        pool, _watchdog = _watchdog, None
+    if pool is not None:
+        # Calls already on the old pool still finish; new ones get a fresh pool
+        pool.shutdown(wait=False)
+
+
+def _tool_timed_out(request, timeout: float) -> ToolMessage:
+    name = request.tool_call.get("name")
+    logger.warning(f"Tool {name} timed out after {timeout:g}s")
+    return ToolMessage(
+        content=f"Error: {name} timed out after {timeout:g}s.",
+        tool_call_id=request.tool_call["id"],
+        name=name,
+        status="error",
+    )
+
+
+def current_budget() -> Optional[AgentBudget]:
+    """Budget of the agent run in progress (from its run config)."""
+    try:
+        budget = get_config().get("configurable", {}).get("budget")
+    except RuntimeError:
+        return None
+    return budget if isinstance(budget, AgentBudget) else None
+
+
+class BudgetMiddleware(AgentMiddleware):
+    """Enforces the request's AgentBudget around each model and tool call."""
+
+    def wrap_model_call(self, request, handler):
+        budget = current_budget()
+        if budget is None:
+            return handler(request)
+        reason = budget.exhausted()
+        if reason:
+            return budget.stop(reason, request.messages)
+        return self._checked(budget, request, handler(request))
+
+    async def awrap_model_call(self, request, handler):
+        budget = current_budget()
+        if budget is None:
+            return await handler(request)
+        reason = budget.exhausted()
+        if reason:
+            return budget.stop(reason, request.messages)
+        return self._checked(budget, request, await handler(request))
+
+    def wrap_tool_call(self, request, handler):
+        skipped = self._skip_tool(request)
+        if skipped is not None:
+            return skipped
+        timeout = settings.model.agent_tool_timeout
+        if not timeout:
+            return handler(request)
+
+        # Run on a watchdog thread (with this run's context) so an overrunning
+        # tool can be abandoned
+        context = contextvars.copy_context()
+        future = _watchdog_pool().submit(context.run, handler, request)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            _abandon(future)
+            return _tool_timed_out(request, timeout)
+
+    async def awrap_tool_call(self, request, handler):
+        skipped = self._skip_tool(request)
+        if skipped is not None:
+            return skipped
+        timeout = settings.model.agent_tool_timeout
+        if not timeout:
+            return await handler(request)
+        try:
+            return await asyncio.wait_for(handler(request), timeout)
+        except asyncio.TimeoutError:
+            return _tool_timed_out(request, timeout)
+
+    @staticmethod
+    def _checked(budget: AgentBudget, request, response):
+        message = next(
+            (m for m in reversed(response.result) if isinstance(m, AIMessage)), None
+        )
+        if message is None:
+            return response
+        budget.record(message)
+        reason = budget.repeated(message.tool_calls) if message.tool_calls else None
+        if reason:
+            return budget.stop(reason, request.messages, message)
+        return response
+
+    @staticmethod
+    def _skip_tool(request) -> Optional[ToolMessage]:
+        budget = current_budget()
+        reason = budget.exhausted() if budget is not None else None
+        if reason is None or reason.startswith("step limit"):
+            # The step that used the last model call may still run its tools
+            return None
+        return ToolMessage(
+            content=f"Skipped: {reason}.",
+            tool_call_id=request.tool_call["id"],
+            name=request.tool_call.get("name"),
+        )
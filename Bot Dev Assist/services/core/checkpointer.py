@@ -0,0 +1,542 @@
+"""
+Disk-backed LangGraph checkpointer for agent sessions.
+
+Checkpoints live in one SQLite file under settings.app.session_store, keyed
+by thread_id (the AgentRuntime session id), so a session can be resumed
+after a restart.
+
+- Write-behind: put()/put_writes() only buffer rows in memory. A background
+  thread flushes them in one transaction every checkpoint_flush_interval
+  seconds (or as soon as checkpoint_flush_every rows are pending), and
+  reads flush first so they always see the latest state. The database runs
+  in WAL mode with synchronous=NORMAL: no fsync per agent step.
+- Compaction: each flush keeps only the newest checkpoint_keep_last
+  checkpoints (and their writes) of every thread it touched, and threads
+  idle for longer than checkpoint_retention_days are dropped on startup.
+
+Per-session size stays bounded because AgentRuntime replaces the message
+state with its token-budgeted history window on every turn.
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import convert_to_messages
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    empty_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.base.id import uuid6
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    created REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints(created);
+"""
+
+_CHECKPOINT_COLUMNS = (
+    "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+    "type, checkpoint, metadata"
+)
+
+# (thread_id, checkpoint_ns, checkpoint_id[, task_id, idx])
+_Key = Tuple[str, ...]
+
+
+class SessionCheckpointer(BaseCheckpointSaver):
+    """SQLite checkpoint saver with write-behind batching and compaction."""
+
+    def __init__(
+        self,
+        path: str,
+        keep_last: int = 3,
+        flush_interval: float = 2.0,
+        flush_every: int = 64,
+        retention_days: float = 0.0,
+    ):
+        super().__init__()
+        self.path = path
+        self.keep_last = keep_last
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.flushes = 0
+
+        self._lock = threading.RLock()
+        self._pending_checkpoints: Dict[_Key, tuple] = {}
+        self._pending_writes: Dict[_Key, tuple] = {}
+        self._closed = threading.Event()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum only takes effect on a new database
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        if retention_days:
+            self.prune_idle(retention_days * 86400)
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="checkpoint-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    # -- reads ----------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            self.flush()
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(str(configurable["thread_id"]))
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        query = f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(query, params).fetchall()
+            tuples = [self._to_tuple(row) for row in rows]
+
+        yielded = 0
+        for item in tuples:
+            if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield item
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+    # -- writes ---------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        meta = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        row = (
+            *key,
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            blob,
+            meta,
+            time.time(),
+        )
+        with self._lock:
+            self._pending_checkpoints[key] = row
+            self._maybe_flush()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        base = (
+            str(configurable["thread_id"]),
+            str(configurable.get("checkpoint_ns", "")),
+            str(configurable["checkpoint_id"]),
+        )
+        # Special channels (errors, interrupts) overwrite; regular writes are
+        # first-wins, matching the SQLite saver's INSERT OR IGNORE
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (*base, task_id, str(idx))
+                if not replace and (
+                    key in self._pending_writes or self._write_exists(key)
+                ):
+                    continue
+                self._pending_writes[key] = (
+                    *base,
+                    task_id,
+                    task_path,
+                    idx,
+                    channel,
+                    *self.serde.dumps_typed(value),
+                )
+            self._maybe_flush()
+
+    def save_messages(self, config: RunnableConfig, messages: Sequence[Any]) -> None:
+        """Replace the thread's message state without running a graph.
+
+        Used for chat-only turns, which have no compiled agent to call
+        update_state() on: the new checkpoint is the latest one with only
+        its "messages" channel replaced (and versioned), as update_state
+        would leave it.
+        """
+        configurable = config["configurable"]
+        base = {
+            "configurable": {
+                "thread_id": str(configurable["thread_id"]),
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            }
+        }
+        latest = self.get_tuple(base)
+        if latest is not None:
+            checkpoint = copy_checkpoint(latest.checkpoint)
+            parent = latest.config
+            step = (latest.metadata or {}).get("step", -1) + 1
+        else:
+            checkpoint = empty_checkpoint()
+            parent = base
+            step = -1
+
+        values = convert_to_messages(messages)
+        for message in values:
+            if message.id is None:
+                message.id = str(uuid.uuid4())
+        version = self.get_next_version(
+            checkpoint["channel_versions"].get("messages"), None
+        )
+        checkpoint["id"] = str(uuid6(clock_seq=step))
+        checkpoint["ts"] = datetime.now(timezone.utc).isoformat()
+        checkpoint["channel_values"]["messages"] = values
+        checkpoint["channel_versions"]["messages"] = version
+        checkpoint["updated_channels"] = ["messages"]
+        self.put(
+            parent,
+            checkpoint,
+            {"source": "update", "step": step, "parents": {}},
+            {"messages": version},
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        thread_id = str(thread_id)
+        with self._lock:
+            self.flush()
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- async (writes are in-memory appends; reads flush and query SQLite,
+    # so they run on a worker thread) -----------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def asave_messages(
+        self, config: RunnableConfig, messages: Sequence[Any]
+    ) -> None:
+        await asyncio.to_thread(self.save_messages, config, messages)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # -- flushing and compaction ----------------------------------------
+
+    def flush(self) -> None:
+        """Write all buffered rows in one transaction, then compact."""
+        with self._lock:
+            if not self._pending_checkpoints and not self._pending_writes:
+                return
+            checkpoints = list(self._pending_checkpoints.values())
+            writes = list(self._pending_writes.values())
+            self._pending_checkpoints.clear()
+            self._pending_writes.clear()
+
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoints "
+                    f"({_CHECKPOINT_COLUMNS}, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    checkpoints,
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, "
+                    "checkpoint_id, task_id, task_path, idx, channel, type, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    writes,
+                )
+                threads = {row[:2] for row in checkpoints}
+                for thread_id, checkpoint_ns in threads:
+                    self._compact(thread_id, checkpoint_ns)
+                self._conn.commit()
+                self.flushes += 1
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                logger.error(f"Checkpoint flush failed: {e}")
+
+    def prune_idle(self, max_idle: float) -> int:
+        """Drop threads whose newest checkpoint is older than max_idle seconds."""
+        cutoff = time.time() - max_idle
+        with self._lock:
+            self.flush()
+            stale = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id "
+                    "HAVING MAX(created) < ?",
+                    (cutoff,),
+                )
+            ]
+            for thread_id in stale:
+                self._conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                )
+                self._conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ?", (thread_id,)
+                )
+            self._conn.commit()
+            if stale:
+                self._conn.execute("PRAGMA incremental_vacuum")
+                logger.info(f"Pruned {len(stale)} idle session checkpoint(s)")
+        return len(stale)
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        self._conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id NOT IN (SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last),
+        )
+        self._conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id NOT IN (SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+        )
+
+    def _maybe_flush(self) -> None:
+        pending = len(self._pending_checkpoints) + len(self._pending_writes)
+        if pending >= self.flush_every:
+            self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Background checkpoint flush failed")
+
+    def _write_exists(self, key: _Key) -> bool:
+        thread_id, checkpoint_ns, checkpoint_id, task_id, idx = key
+        row = self._conn.execute(
+            "SELECT 1 FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? AND task_id = ? AND idx = ?",
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, int(idx)),
+        ).fetchone()
+        return row is not None
+
+    def _to_tuple(self, row: tuple) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_checkpoint_id,
+            type_,
+            blob,
+            meta,
+        ) = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+        def ref(cid: str) -> RunnableConfig:
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": cid,
+                }
+            }
+
+        return CheckpointTuple(
+            config=ref(checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=json.loads(meta) if meta is not None else {},
+            parent_config=ref(parent_checkpoint_id) if parent_checkpoint_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+
+_checkpointer: Optional[SessionCheckpointer] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> Optional[SessionCheckpointer]:
+    """Shared session checkpointer, or None when checkpointing is disabled."""
+    app_cfg = settings.app
+    if not app_cfg.checkpoint_enabled:
+        return None
+
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                try:
+                    _checkpointer = SessionCheckpointer(
+                        path=app_cfg.checkpoint_path
+                        or os.path.join(app_cfg.session_store, "checkpoints.sqlite"),
+                        keep_last=app_cfg.checkpoint_keep_last,
+                        flush_interval=app_cfg.checkpoint_flush_interval,
+                        flush_every=app_cfg.checkpoint_flush_every,
+                        retention_days=app_cfg.checkpoint_retention_days,
+                    )
+                except sqlite3.Error as e:
+                    logger.warning(f"Session checkpoints unavailable: {e}")
+                    app_cfg.checkpoint_enabled = False
+                    return None
+                atexit.register(_checkpointer.flush)
+    return _checkpointer
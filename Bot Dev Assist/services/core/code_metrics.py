@@ -0,0 +1,501 @@
+"""
+AST metrics for Python files, cached by content hash.
+
+analyze_source() parses one file and returns a JSON-serialisable dict:
+
+- lines / code_lines, class count and imported modules;
+- per function (nested ones as Outer.inner): start line, length, McCabe
+  complexity, argument count and block nesting depth;
+- TODO/FIXME/XXX/HACK comments;
+- smells: bare except, mutable default arguments, eval/exec, star and
+  unused imports, and functions over the size/complexity/nesting/argument
+  thresholds below.
+
+Results are stored under settings.app.analysis_cache_dir keyed by a hash of
+the file's bytes (and ANALYZER_VERSION), and file stats are memoised in
+process, so re-analysing an unchanged tree neither parses nor re-reads it.
+
+analyze_tree() streams the results for every .py file under a directory;
+cache misses are parsed on a shared process pool (analysis_workers), with a
+bounded number of files in flight. The pool starts its workers with the
+"forkserver" method ("spawn" where that is unavailable, e.g. Windows) rather
+than fork: forking the agent process would copy its threads' locks, loaded
+model and open handles into every worker. This module only needs the
+standard library and config, so workers import it without loading the
+agent's dependencies.
+"""
+
+import ast
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import tokenize
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the result format or the checks change (invalidates the cache)
+ANALYZER_VERSION = "1"
+
+# Smell thresholds
+MAX_FUNCTION_LINES = 60
+MAX_COMPLEXITY = 10
+MAX_NESTING = 4
+MAX_ARGS = 6
+
+# Below this many cache misses, parsing inline beats starting the pool
+_POOL_MIN_FILES = 8
+
+# Files larger than this are skipped (generated code, data dumps)
+_MAX_FILE_BYTES = 2 << 20
+
+_TODO_RE = re.compile(r"\b(TODO|FIXME|XXX|HACK)\b[:\s]*(.*)")
+
+_BRANCHES = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.IfExp,
+    ast.ExceptHandler,
+    ast.Assert,
+    ast.comprehension,
+)
+_BLOCKS = (
+    ast.If,
+    ast.For,
+    ast.AsyncFor,
+    ast.While,
+    ast.With,
+    ast.AsyncWith,
+    ast.Try,
+)
+if hasattr(ast, "match_case"):  # Python 3.10+
+    _BRANCHES += (ast.match_case,)
+    _BLOCKS += (ast.Match,)
+if hasattr(ast, "TryStar"):  # Python 3.11+
+    _BLOCKS += (ast.TryStar,)
+
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _complexity(node: ast.AST) -> int:
+    """McCabe complexity of a function body (nested functions excluded)."""
+    score = 1
+    for child in _walk_local(node):
+        if isinstance(child, _BRANCHES):
+            score += 1
+            if isinstance(child, ast.comprehension):
+                score += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            score += len(child.values) - 1
+    return score
+
+
+def _walk_local(node: ast.AST) -> Iterator[ast.AST]:
+    """ast.walk that does not descend into nested functions or classes."""
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        yield child
+        if not isinstance(child, (*_FUNCTIONS, ast.ClassDef, ast.Lambda)):
+            stack.extend(ast.iter_child_nodes(child))
+
+
+def _nesting(node: ast.AST, depth: int = 0) -> int:
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (*_FUNCTIONS, ast.ClassDef)):
+            continue
+        inner = depth + 1 if isinstance(child, _BLOCKS) else depth
+        deepest = max(deepest, _nesting(child, inner))
+    return deepest
+
+
+def _is_mutable(default: ast.AST) -> bool:
+    if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+        return True
+    return (
+        isinstance(default, ast.Call)
+        and isinstance(default.func, ast.Name)
+        and default.func.id in ("list", "dict", "set")
+    )
+
+
+class _Visitor(ast.NodeVisitor):
+    def __init__(self):
+        self.functions: List[dict] = []
+        self.classes = 0
+        self.imports: List[str] = []
+        self.smells: List[list] = []
+        self.imported: Dict[str, int] = {}  # module-level alias -> line
+        self.used: set = set()
+        self.exported: set = set()
+        self._scope: List[str] = []
+
+    def _smell(self, line: int, kind: str, detail: str) -> None:
+        self.smells.append([line, kind, detail])
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.classes += 1
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node) -> None:
+        name = ".".join([*self._scope, node.name])
+        args = node.args
+        positional = [*args.posonlyargs, *args.args]
+        if self._scope and positional and positional[0].arg in ("self", "cls"):
+            positional = positional[1:]
+        arg_count = len(positional) + len(args.kwonlyargs)
+        length = (getattr(node, "end_lineno", None) or node.lineno) - node.lineno + 1
+        info = {
+            "name": name,
+            "line": node.lineno,
+            "length": length,
+            "complexity": _complexity(node),
+            "args": arg_count,
+            "depth": _nesting(node),
+        }
+        self.functions.append(info)
+
+        if length > MAX_FUNCTION_LINES:
+            self._smell(node.lineno, "long-function", f"{name} ({length} lines)")
+        if info["complexity"] > MAX_COMPLEXITY:
+            self._smell(
+                node.lineno,
+                "complex-function",
+                f"{name} (complexity {info['complexity']})",
+            )
+        if info["depth"] > MAX_NESTING:
+            self._smell(node.lineno, "deep-nesting", f"{name} (depth {info['depth']})")
+        if arg_count > MAX_ARGS:
+            self._smell(node.lineno, "too-many-args", f"{name} ({arg_count} args)")
+        for default in [*args.defaults, *args.kw_defaults]:
+            if default is not None and _is_mutable(default):
+                self._smell(default.lineno, "mutable-default", name)
+
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.imports.append(alias.name)
+            if not self._scope:
+                bound = alias.asname or alias.name.split(".")[0]
+                self.imported[bound] = node.lineno
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = "." * node.level + (node.module or "")
+        self.imports.append(module)
+        for alias in node.names:
+            if alias.name == "*":
+                self._smell(node.lineno, "star-import", module)
+            elif not self._scope and node.module != "__future__":
+                self.imported[alias.asname or alias.name] = node.lineno
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.type is None:
+            self._smell(node.lineno, "bare-except", "except:")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name) and node.func.id in ("eval", "exec"):
+            self._smell(node.lineno, "eval-exec", f"{node.func.id}()")
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        self.used.add(node.id)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        # Names listed in __all__ count as used
+        if any(isinstance(t, ast.Name) and t.id == "__all__" for t in node.targets):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                self.exported.update(
+                    e.value
+                    for e in node.value.elts
+                    if isinstance(e, ast.Constant) and isinstance(e.value, str)
+                )
+        self.generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant) -> None:
+        # Names in string annotations ("queue.Queue[int]")
+        if isinstance(node.value, str) and len(node.value) < 200:
+            self.used.update(re.findall(r"[A-Za-z_]\w*", node.value))
+
+
+def _todos(text: str) -> List[list]:
+    if not _TODO_RE.search(text):
+        return []
+    todos = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if token.type == tokenize.COMMENT:
+                match = _TODO_RE.search(token.string)
+                if match:
+                    todos.append([token.start[0], match.group(0).strip()[:120]])
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return todos
+
+
+def analyze_source(text: str, is_package: bool = False) -> dict:
+    """Metrics of one Python source file."""
+    lines = text.splitlines()
+    code_lines = sum(
+        1 for line in lines if line.strip() and not line.lstrip().startswith("#")
+    )
+    result = {"lines": len(lines), "code_lines": code_lines}
+    try:
+        tree = ast.parse(text)
+        visitor = _Visitor()
+        visitor.visit(tree)
+    except (SyntaxError, ValueError) as e:
+        line = getattr(e, "lineno", "?")
+        result["error"] = f"{type(e).__name__}: {getattr(e, 'msg', e)} (line {line})"
+        return result
+    except (RecursionError, MemoryError) as e:
+        # Pathologically nested expressions (generated code)
+        result["error"] = f"{type(e).__name__}: too deeply nested to analyze"
+        return result
+    # Re-exports from a package __init__ are its API, not unused imports
+    if not is_package:
+        for name, line in visitor.imported.items():
+            if name not in visitor.used and name not in visitor.exported:
+                visitor._smell(line, "unused-import", name)
+
+    visitor.smells.sort()
+    result.update(
+        functions=visitor.functions,
+        classes=visitor.classes,
+        imports=sorted(set(visitor.imports)),
+        todos=_todos(text),
+        smells=visitor.smells,
+    )
+    return result
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(ANALYZER_VERSION.encode() + b"\0" + data).hexdigest()
+
+
+class AnalysisCache:
+    """analyze_source() results on disk, one JSON file per content hash."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # abs path -> (mtime_ns, size, digest): skips re-reading unchanged files
+        self._stats: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, digest: str) -> Optional[dict]:
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, digest: str, result: dict) -> None:
+        path = self._path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.debug(f"Could not cache analysis {digest}: {e}")
+
+    def known_digest(self, path: str, st: os.stat_result) -> Optional[str]:
+        with self._lock:
+            entry = self._stats.get(path)
+        if entry and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[2]
+        return None
+
+    def remember(self, path: str, st: os.stat_result, digest: str) -> None:
+        with self._lock:
+            self._stats[path] = (st.st_mtime_ns, st.st_size, digest)
+
+
+def _analyze_job(text: str, is_package: bool) -> dict:
+    """Pool entry point."""
+    return analyze_source(text, is_package)
+
+
+_cache: Optional[AnalysisCache] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = AnalysisCache(settings.app.analysis_cache_dir)
+    return _cache
+
+
+def _workers() -> int:
+    return settings.app.analysis_workers or max(1, (os.cpu_count() or 2) - 1)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=_workers(), mp_context=_mp_context()
+                )
+    return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Pending:
+    """A file whose cached result was missing or stale."""
+
+    __slots__ = ("path", "text", "digest", "st", "is_package")
+
+    def __init__(self, path, text, digest, st, is_package):
+        self.path = path
+        self.text = text
+        self.digest = digest
+        self.st = st
+        self.is_package = is_package
+
+
+def _load(
+    cache: AnalysisCache, abs_path: str, rel_path: str
+) -> Tuple[Optional[dict], Optional[_Pending]]:
+    """Cached result for the file, or what is needed to analyse it."""
+    try:
+        st = os.stat(abs_path)
+    except OSError as e:
+        return {"path": rel_path, "error": f"unreadable: {e}"}, None
+    if st.st_size > _MAX_FILE_BYTES:
+        return {"path": rel_path, "error": f"skipped: {st.st_size} bytes"}, None
+
+    digest = cache.known_digest(abs_path, st)
+    result = cache.get(digest) if digest else None
+    if result is None:
+        try:
+            with open(abs_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            return {"path": rel_path, "error": f"unreadable: {e}"}, None
+        digest = _digest(data)
+        result = cache.get(digest)
+        if result is None:
+            is_package = os.path.basename(abs_path) == "__init__.py"
+            text = data.decode("utf-8", errors="replace")
+            return None, _Pending(rel_path, text, digest, st, is_package)
+        cache.remember(abs_path, st, digest)
+    result["path"] = rel_path
+    return result, None
+
+
+def _finish(cache: AnalysisCache, root: str, item: _Pending, result: dict) -> dict:
+    cache.put(item.digest, result)
+    cache.remember(os.path.join(root, item.path), item.st, item.digest)
+    result["path"] = item.path
+    return result
+
+
+def analyze_files(root: str, rel_paths: Iterable[str]) -> Iterator[dict]:
+    """Results for the given files under root, as they become available.
+
+    Cached results are yielded straight away; misses are parsed inline
+    until _POOL_MIN_FILES of them have been seen, then on the process pool
+    with at most 4 files per worker in flight.
+    """
+    cache = get_analysis_cache()
+    inline_left = _POOL_MIN_FILES
+    pool = None
+    in_flight: Dict = {}
+    limit = 4 * _workers()
+
+    def drain(block_until: int) -> Iterator[dict]:
+        while len(in_flight) > block_until:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    _reset_pool()
+                    result = analyze_source(item.text, item.is_package)
+                except Exception as e:
+                    # One file's failure must not end the scan (not cached)
+                    logger.warning(f"Analysis of {item.path} failed: {e}")
+                    yield {
+                        "path": item.path,
+                        "lines": len(item.text.splitlines()),
+                        "error": f"analysis failed: {type(e).__name__}: {e}",
+                    }
+                    continue
+                yield _finish(cache, root, item, result)
+
+    for rel_path in rel_paths:
+        result, item = _load(cache, os.path.join(root, rel_path), rel_path)
+        if result is not None:
+            yield result
+            continue
+        if inline_left > 0:
+            inline_left -= 1
+            yield _finish(cache, root, item, analyze_source(item.text, item.is_package))
+            continue
+        if pool is None:
+            pool = _get_pool()
+        try:
+            future = pool.submit(_analyze_job, item.text, item.is_package)
+        except (BrokenProcessPool, RuntimeError):
+            _reset_pool()
+            pool = _get_pool()
+            future = pool.submit(_analyze_job, item.text, item.is_package)
+        in_flight[future] = item
+        yield from drain(limit)
+    yield from drain(0)
+
+
+def analyze_tree(root: str) -> Iterator[dict]:
+    """Results for every .py file under root (skipping .gitignore'd paths)."""
+    from tools.code_search import iter_files
+
+    paths = (
+        rel_path
+        for rel_path, _, _ in iter_files(root, _MAX_FILE_BYTES)
+        if rel_path.endswith(".py")
+    )
+    return analyze_files(root, paths)
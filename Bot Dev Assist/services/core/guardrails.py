@@ -92,6 +92,43 @@ class GuardSystem:
         return True, ""
 
 
+class ControlTokenStream:
+    """Incremental control-token stripper for streamed model output.
+
+    Control tokens can be split across chunks (e.g. "<|im_" + "end|>"), so a
+    trailing fragment that could still become a token is held back until the
+    next chunk arrives or the stream is flushed.
+    """
+
+    def __init__(self, guard: GuardSystem):
+        self._pattern = re.compile("|".join(guard._control_token_patterns))
+        self._tokens = [p.replace("\\", "") for p in guard._control_token_patterns]
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return the text that is safe to emit."""
+        if not chunk:
+            return ""
+
+        self._buffer = self._pattern.sub("", self._buffer + chunk)
+
+        # Hold back a possible partial token ("<", "<|", "<|im_e", ...)
+        start = self._buffer.rfind("<")
+        if start != -1:
+            tail = self._buffer[start:]
+            if any(token.startswith(tail) for token in self._tokens):
+                ready, self._buffer = self._buffer[:start], tail
+                return ready
+
+        ready, self._buffer = self._buffer, ""
+        return ready
+
+    def flush(self) -> str:
+        """Return any held-back text at end of stream."""
+        ready, self._buffer = self._pattern.sub("", self._buffer), ""
+        return ready
+
+
 # Singleton instance
 guard_system = GuardSystem()
 
@@ -107,6 +144,11 @@ def strip_control_tokens(text: str) -> str:
     return guard_system.strip_control_tokens(text)
 
 
+def control_token_stream() -> ControlTokenStream:
+    """Create an incremental control-token stripper for one stream."""
+    return ControlTokenStream(guard_system)
+
+
 def check_output(output: str) -> Tuple[bool, str, str]:
     """Check output using guard system."""
     return guard_system.check_output(output)
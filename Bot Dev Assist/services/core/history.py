@@ -0,0 +1,328 @@
+"""
+Per-session conversation history trimmed to a token budget.
+
+The budget is the model window minus the space reserved for the answer and
+for the system prompt/tool schemas:
+
+    max_context - max_tokens - prompt_reserve_tokens
+
+Whole turns are evicted oldest-first until the window fits. Optionally the
+evicted turns are folded into a rolling summary (one extra generation per
+eviction) that is sent ahead of the remaining turns; async callers use
+awindow(), which awaits the async summarizer (or runs the sync one on a
+worker thread) instead of blocking the event loop. A new input that alone
+exceeds the budget is cut down (its start and end kept) so the request
+still fits the model window.
+
+Token counts use the model's own tokenizer when transformers and the
+tokenizer files are available, then tiktoken, then a chars/4 estimate.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# <|im_start|>role\n ... <|im_end|>\n
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+TRUNCATION_MARKER = "\n[... input truncated to fit the context window ...]\n"
+
+
+class TokenCounter:
+    """Best-available tokenizer, resolved once."""
+
+    def __init__(self, tokenizer_name: str = ""):
+        self.backend = "estimate"
+        self._encode: Optional[Callable[[str], list]] = None
+
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                self._encode = lambda text: tokenizer.encode(
+                    text, add_special_tokens=False
+                )
+                self.backend = f"transformers:{tokenizer_name}"
+                return
+            except Exception as e:
+                logger.debug(f"Tokenizer {tokenizer_name} unavailable: {e}")
+
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding("cl100k_base")
+            self._encode = encoding.encode
+            self.backend = "tiktoken:cl100k_base"
+        except Exception as e:
+            logger.debug(f"tiktoken unavailable, estimating token counts: {e}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encode is not None:
+            return len(self._encode(text))
+        return max(1, len(text) // 4)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return sum(
+            self.count(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages
+        )
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Shared token counter (tokenizer loaded on first use)."""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = TokenCounter(settings.model.tokenizer)
+    return _counter
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter().count(text)
+
+
+def history_budget() -> int:
+    """Tokens available for summary + past turns + the new user message."""
+    model_cfg = settings.model
+    return (
+        model_cfg.max_context - model_cfg.max_tokens - model_cfg.prompt_reserve_tokens
+    )
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Text cut to max_tokens, keeping its start and end around a marker."""
+    counter = get_token_counter()
+    if counter.count(text) <= max_tokens:
+        return text
+    # Longest head/tail that fits (binary search on characters per side)
+    low, high = 0, len(text) // 2
+    while low < high:
+        keep = (low + high + 1) // 2
+        if counter.count(text[:keep] + TRUNCATION_MARKER + text[-keep:]) <= max_tokens:
+            low = keep
+        else:
+            high = keep - 1
+    if not low:
+        return TRUNCATION_MARKER.strip()
+    return text[:low] + TRUNCATION_MARKER + text[-low:]
+
+
+# (evicted turns, previous summary) -> new summary
+Summarizer = Callable[[List[Tuple[str, str]], str], str]
+AsyncSummarizer = Callable[[List[Tuple[str, str]], str], Awaitable[str]]
+
+
+class ConversationHistory:
+    """Completed (user, assistant) turns for one session."""
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+        asummarizer: Optional[AsyncSummarizer] = None,
+    ):
+        self.budget = budget if budget is not None else history_budget()
+        self.summarizer = summarizer
+        self.asummarizer = asummarizer
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        # Turns dropped to make room for the summary; folded in next time
+        self._unsummarized: List[Tuple[str, str]] = []
+        self._counter = get_token_counter()
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def add_turn(self, user_input: str, answer: str) -> None:
+        self.turns.append((user_input, answer))
+
+    def clear(self) -> None:
+        self.turns = []
+        self.summary = ""
+        self._unsummarized = []
+
+    def load(self, messages: List[Any]) -> None:
+        """
+        Rebuild turns from a saved agent message state (dicts or LangChain
+        messages): each user message paired with the last plain assistant
+        reply after it. Tool calls and tool results are skipped.
+        """
+        self.clear()
+        user_input: Optional[str] = None
+        answer = ""
+        for message in messages:
+            role, content = _role_and_content(message)
+            if role == "system" and content.startswith(SUMMARY_PREFIX):
+                self.summary = content[len(SUMMARY_PREFIX) :]
+            elif role == "user":
+                if user_input is not None and answer:
+                    self.turns.append((user_input, answer))
+                user_input, answer = content, ""
+            elif role == "assistant" and content and not _tool_calls(message):
+                answer = content
+        if user_input is not None and answer:
+            self.turns.append((user_input, answer))
+
+    def digest(self) -> Optional[str]:
+        """Stable fingerprint of the context (None when there is none)."""
+        if not self.turns and not self.summary:
+            return None
+        h = hashlib.sha256(self.summary.encode("utf-8"))
+        for user_input, answer in self.turns:
+            h.update(b"\0" + user_input.encode("utf-8"))
+            h.update(b"\0" + answer.encode("utf-8"))
+        return h.hexdigest()
+
+    def window(self, user_input: str) -> List[Dict[str, str]]:
+        """
+        Messages to send for a new user input: optional summary, the most
+        recent turns that fit the budget, then the input itself. Turns that no
+        longer fit are evicted (and summarized if a summarizer is set).
+        """
+        new_message, available, evicted = self._trim(user_input)
+        if evicted:
+            self._evict(evicted, available)
+        return self.context_messages() + [new_message]
+
+    async def awindow(self, user_input: str) -> List[Dict[str, str]]:
+        """Async variant of window(); summarizing never blocks the loop."""
+        new_message, available, evicted = self._trim(user_input)
+        if evicted:
+            await self._aevict(evicted, available)
+        return self.context_messages() + [new_message]
+
+    def context_messages(self) -> List[Dict[str, str]]:
+        """Summary (if any) followed by the retained turns."""
+        return self._summary_messages() + self.messages()
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The retained turns as chat messages."""
+        result = []
+        for user_input, answer in self.turns:
+            result.append({"role": "user", "content": user_input})
+            result.append({"role": "assistant", "content": answer})
+        return result
+
+    def _trim(
+        self, user_input: str
+    ) -> Tuple[Dict[str, str], int, List[Tuple[str, str]]]:
+        """The input message, the tokens left for context and the evictions."""
+        limit = self.budget - self._summary_tokens() - MESSAGE_OVERHEAD_TOKENS
+        content = truncate_tokens(user_input, max(1, limit))
+        if content != user_input:
+            logger.warning(
+                f"User input of {self._counter.count(user_input)} tokens "
+                f"truncated to fit the history budget ({self.budget})"
+            )
+        new_message = {"role": "user", "content": content}
+        available = self.budget - self._counter.count_messages([new_message])
+
+        kept = 0
+        used = self._summary_tokens()
+        for user_turn, answer in reversed(self.turns):
+            cost = self._turn_tokens(user_turn, answer)
+            if used + cost > available:
+                break
+            used += cost
+            kept += 1
+
+        evicted = self.turns[: len(self.turns) - kept]
+        if evicted:
+            logger.debug(f"Evicting {len(evicted)} turn(s) from history")
+            self.turns = self.turns[len(evicted) :]
+        return new_message, available, evicted
+
+    def _evict(self, evicted: List[Tuple[str, str]], available: int) -> None:
+        if self.summarizer is None:
+            return
+        try:
+            summary = self.summarizer(self._unsummarized + evicted, self.summary)
+        except Exception as e:
+            logger.warning(f"History summarization failed: {e}")
+            # Keep the turns for the next attempt instead of losing them
+            self._unsummarized.extend(evicted)
+            return
+        self._fold(summary, available)
+
+    async def _aevict(self, evicted: List[Tuple[str, str]], available: int) -> None:
+        if self.asummarizer is None and self.summarizer is None:
+            return
+        turns = self._unsummarized + evicted
+        try:
+            if self.asummarizer is not None:
+                summary = await self.asummarizer(turns, self.summary)
+            else:
+                summary = await asyncio.to_thread(self.summarizer, turns, self.summary)
+        except Exception as e:
+            logger.warning(f"History summarization failed: {e}")
+            # Keep the turns for the next attempt instead of losing them
+            self._unsummarized.extend(evicted)
+            return
+        self._fold(summary, available)
+
+    def _fold(self, summary: str, available: int) -> None:
+        self.summary = summary
+        self._unsummarized = []
+        # Keep summary + retained turns within the budget
+        while self.turns and (
+            self._summary_tokens() + self._turns_tokens() > available
+        ):
+            self._unsummarized.append(self.turns.pop(0))
+
+    def _summary_messages(self) -> List[Dict[str, str]]:
+        if not self.summary:
+            return []
+        return [
+            {
+                "role": "system",
+                "content": SUMMARY_PREFIX + self.summary,
+            }
+        ]
+
+    def _summary_tokens(self) -> int:
+        return self._counter.count_messages(self._summary_messages())
+
+    def _turn_tokens(self, user_input: str, answer: str) -> int:
+        return (
+            self._counter.count(user_input)
+            + self._counter.count(answer)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+
+    def _turns_tokens(self) -> int:
+        return sum(self._turn_tokens(u, a) for u, a in self.turns)
+
+
+_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def _role_and_content(message: Any) -> Tuple[str, str]:
+    if isinstance(message, dict):
+        role, content = message.get("role", ""), message.get("content", "")
+    else:
+        role = getattr(message, "type", "")
+        content = getattr(message, "content", "")
+    if not isinstance(content, str):
+        content = ""
+    return _ROLES.get(role, role), content
+
+
+def _tool_calls(message: Any) -> list:
+    if isinstance(message, dict):
+        return message.get("tool_calls") or []
+    return getattr(message, "tool_calls", None) or []
@@ -0,0 +1,239 @@
+"""
+Shared, tuned HTTP clients for the model server and outbound tools.
+
+One httpx.Client and one httpx.AsyncClient are created on first use and
+shared by every ChatOpenAI instance (LLM, router, model pool backends) and by
+tools that call out, so consecutive requests reuse kept-alive connections
+instead of opening a new one per turn. Pool limits, keep-alive expiry and the
+connect/read timeouts come from settings.model.
+
+httpx's async connection pool is bound to the event loop that opened it, so
+the shared async client keeps one real client per running loop (dropped
+with the loop) and sends each request through the current loop's. Separate
+asyncio.run() calls, or loops on different threads, each get their own.
+
+Every request is timed through httpcore's trace hook:
+
+- connect_ms: TCP (and TLS) connect; 0 when a pooled connection was reused
+- ttfb_ms:    request sent until the response headers arrived
+- total_ms:   until the body was fully read (end of a stream)
+
+The most recent timings are kept in memory (recent_timings(), timing_stats())
+and each one is logged at DEBUG.
+"""
+
+import asyncio
+import logging
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_TIMINGS: Deque[Dict[str, Any]] = deque(maxlen=512)
+
+
+def _limits() -> httpx.Limits:
+    model_cfg = settings.model
+    return httpx.Limits(
+        max_connections=model_cfg.http_max_connections,
+        max_keepalive_connections=model_cfg.http_max_keepalive,
+        keepalive_expiry=model_cfg.http_keepalive_expiry,
+    )
+
+
+def request_timeout() -> httpx.Timeout:
+    """Connect timeout from connect_timeout, everything else request_timeout."""
+    model_cfg = settings.model
+    return httpx.Timeout(model_cfg.request_timeout, connect=model_cfg.connect_timeout)
+
+
+class _Timing:
+    """Collects the phases of one request (shared by sync and async hooks)."""
+
+    def __init__(self, request: httpx.Request):
+        self.record: Dict[str, Any] = {
+            "method": request.method,
+            "url": f"{request.url.host}:{request.url.port}{request.url.path}",
+            "connect_ms": 0.0,
+            "ttfb_ms": None,
+            "total_ms": None,
+        }
+        self._start = time.perf_counter()
+        self._connect_start: Optional[float] = None
+        self._sent: Optional[float] = None
+
+    def trace(self, event: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+            self._connect_start = self._connect_start or now
+        elif event in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self.record["connect_ms"] = (now - self._connect_start) * 1000
+        elif event.endswith("send_request_headers.started"):
+            self._sent = now
+        elif event.endswith("receive_response_headers.complete"):
+            self.record["ttfb_ms"] = (now - (self._sent or self._start)) * 1000
+
+    def finish(self, status: int) -> None:
+        self.record["total_ms"] = (time.perf_counter() - self._start) * 1000
+        self.record["status"] = status
+        _TIMINGS.append(self.record)
+        logger.debug(
+            f"HTTP {self.record['method']} {self.record['url']} {status}: "
+            f"connect={self.record['connect_ms']:.1f}ms "
+            f"ttfb={self.record['ttfb_ms'] or 0:.1f}ms "
+            f"total={self.record['total_ms']:.1f}ms"
+        )
+
+
+def _on_request(request: httpx.Request) -> None:
+    timing = _Timing(request)
+    request.extensions["trace"] = timing.trace
+    request.extensions["timing"] = timing
+
+
+def _on_response(response: httpx.Response) -> None:
+    timing = response.request.extensions.get("timing")
+    if timing is None:
+        return
+    # Headers are in; the total is taken once the body has been consumed
+    stream = response.stream
+
+    class _TimedStream(httpx.SyncByteStream):
+        def __iter__(self):
+            yield from stream
+
+        def close(self) -> None:
+            stream.close()
+            timing.finish(response.status_code)
+
+    response.stream = _TimedStream()
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    timing = _Timing(request)
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        timing.trace(event, info)
+
+    request.extensions["trace"] = trace
+    request.extensions["timing"] = timing
+
+
+async def _aon_response(response: httpx.Response) -> None:
+    timing = response.request.extensions.get("timing")
+    if timing is None:
+        return
+    stream = response.stream
+
+    class _TimedStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            async for chunk in stream:
+                yield chunk
+
+        async def aclose(self) -> None:
+            await stream.aclose()
+            timing.finish(response.status_code)
+
+    response.stream = _TimedStream()
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=_limits(),
+        timeout=request_timeout(),
+        event_hooks={"request": [_aon_request], "response": [_aon_response]},
+    )
+
+
+class _PerLoopAsyncClient(httpx.AsyncClient):
+    """AsyncClient that sends through a separate client per event loop."""
+
+    def __init__(self):
+        # Only builds requests (timeouts, headers); never opens connections
+        super().__init__(limits=_limits(), timeout=request_timeout())
+        self._clients: "weakref.WeakKeyDictionary[Any, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def for_running_loop(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = _new_async_client()
+        return client
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await self.for_running_loop().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the running loop's client (others close with their loops)."""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_client: Optional[httpx.Client] = None
+_async_client: Optional[_PerLoopAsyncClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """Shared keep-alive client for synchronous calls."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    limits=_limits(),
+                    timeout=request_timeout(),
+                    event_hooks={"request": [_on_request], "response": [_on_response]},
+                )
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for async calls (a pool per event loop)."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = _PerLoopAsyncClient()
+    return _async_client
+
+
+def recent_timings() -> List[Dict[str, Any]]:
+    """Timings of the most recent requests, oldest first."""
+    return list(_TIMINGS)
+
+
+def timing_stats() -> Dict[str, Any]:
+    """Median connect/TTFB/total over the recent requests."""
+    records = list(_TIMINGS)
+    if not records:
+        return {"requests": 0}
+
+    def median(key: str) -> float:
+        values = [r[key] for r in records if r.get(key) is not None]
+        return round(statistics.median(values), 1) if values else 0.0
+
+    return {
+        "requests": len(records),
+        "new_connections": sum(1 for r in records if r["connect_ms"]),
+        "connect_ms_p50": median("connect_ms"),
+        "ttfb_ms_p50": median("ttfb_ms"),
+        "total_ms_p50": median("total_ms"),
+    }
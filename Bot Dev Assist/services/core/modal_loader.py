@@ -1,133 +1,597 @@
-"""
-LLM and Agent initialization (LangChain v1).
-
-- LLM: ChatOpenAI configured for an OpenAI-compatible endpoint (e.g., Foundry Local).
-- Agent: create_agent(...) is the standard LangChain v1 agent builder and runs a tool loop internally.
-"""
-
-from __future__ import annotations
-
-import logging
-from typing import Optional
-
-from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
-
-import tools
-from config import settings
-
-logger = logging.getLogger(__name__)
-
-
-class ModalLoader:
-    """Singleton loader for LLM and Agent instances."""
-
-    _llm_instance: Optional[ChatOpenAI] = None
-    _agent_instance = None  # Compiled agent runtime returned by create_agent(...)
-
-    SYSTEM_PROMPT = """You are Dev Assistant, a helpful expert (Python + SQL) developer assistant.
-
-        PRIMARY ROLE:
-        - Expert Programming Developer in Python
-        - Help with development, debugging, testing, and code reviewing
-        - Execute code analysis, generate reports, and fetch metrics
-        - Maintain code quality and security standards
-
-        AVAILABLE TOOLS:
-        You have access to the following tools:
-        - read_and_generate_code(requirement: str, output_file: str): Generate Python code based on requirement and save to file
-        - analyze_code(file_path: str): Analyze code file and return insights
-        - save_memory(key: str, content: str): Save information to memory
-        - recall_memory(key: str): Retrieve saved memory
-        - list_memories(): List all saved memories
-
-        CRITICAL INSTRUCTIONS:
-        1. ONLY use read_and_generate_code when user EXPLICITLY asks to:
-        - "generate code and save to [file]"
-        - "create a file with [code]"
-        - "write [code] to [filename]"
-
-        2. DO NOT use the tool for:
-        - "show me code for..."
-        - "how to..."
-        - "example of..."
-        - "write code for..." (without save to file)
-
-        3. For questions without file saving, just answer directly in chat
-
-        4. NEVER just describe what the tool does - if you use it, CALL it
-        5. Extract the requirement and output file path clearly
-        6. NEVER invent or hallucinate tool outputs
-
-        OUTPUT REQUIREMENTS:
-        1. Be concise - summarize results clearly
-        2. Include relevant details
-        3. For code examples, show complete working code
-        4. Suggest next steps when applicable
-
-        ERROR HANDLING:
-        - If a tool fails, explain why
-        - Ask for clarification if needed"""
-
-    @classmethod
-    def get_llm(cls) -> ChatOpenAI:
-        """Get or initialize the LLM instance."""
-        if cls._llm_instance is None:
-            cls._llm_instance = cls._initialize_llm()
-        return cls._llm_instance
-
-    @classmethod
-    def get_agent(cls):
-        """
-        Get or initialize the agent runtime.
-
-        LangChain v1: create_agent(model, tools=..., system_prompt=...) is the standard approach.
-        The returned object is invokable via agent.invoke({"messages": [...]})
-        and it executes tool calls internally.
-        """
-        if cls._agent_instance is not None:
-            return cls._agent_instance
-
-        llm = cls.get_llm()
-        tool_list = tools.get_all_tools()
-        print([(type(t).__name__, t.name) for t in tool_list])
-
-        cls._agent_instance = create_agent(
-            model=llm,
-            tools=tool_list,
-            system_prompt=cls.SYSTEM_PROMPT,
-        )
-        return cls._agent_instance
-
-    @classmethod
-    def _initialize_llm(cls) -> ChatOpenAI:
-        """Initialize ChatOpenAI for Foundry Local (OpenAI-compatible)."""
-        model_cfg = settings.model
-
-        # NOTE: You said you'll manage base_url. Keep it as-is in your environment/config.
-        llm = ChatOpenAI(
-            model=model_cfg.foundry_model,
-            base_url="http://127.0.0.1:62670/v1",
-            api_key="foundry-local",
-            temperature=model_cfg.temperature,
-            timeout=40,
-            max_retries=1,
-        )
-
-        # Optional sanity check; remove if you don't want a startup call.
-        try:
-            llm.invoke("test")
-        except Exception as e:
-            logger.exception("LLM startup test failed.")
-            raise
-
-        return llm
-
-    @classmethod
-    def reset(cls) -> None:
-        """Reset cached instances (useful for testing)."""
-        cls._llm_instance = None
-        cls._agent_instance = None
-
-
-modal_loader = ModalLoader()
+"""
+LLM and Agent initialization (LangChain v1).
+
+- LLM: ChatOpenAI configured for an OpenAI-compatible endpoint (e.g., Foundry Local),
+  or a PooledChatModel balancing several endpoints (settings.model.endpoints).
+- Agent: create_agent(...) is the standard LangChain v1 agent builder and runs a tool loop internally.
+
+Startup is cheap: constructing ChatOpenAI makes no request, the server is
+probed with GET /models instead of a generation, and the agent is compiled
+lazily (or ahead of time by warm_up() on a background thread).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+import httpx
+import openai
+from langchain.agents import create_agent
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from pydantic import ConfigDict
+
+import tools
+from config import settings
+from services.core.budget import BudgetMiddleware
+from services.core.cache import TTLCache
+from services.core.checkpointer import get_checkpointer
+from services.core.http_client import (
+    get_async_http_client,
+    get_http_client,
+    request_timeout,
+)
+from services.core.prompt_builder import (
+    build_prefix,
+    format_report,
+    prefix_cache_kwargs,
+    prompt_report,
+)
+from services.core.scheduler import SchedulerMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+# Errors after which a request is retried on another backend
+_FAILOVER_ERRORS = (
+    httpx.TimeoutException,
+    httpx.TransportError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.InternalServerError,
+)
+
+
+class Backend:
+    """One OpenAI-compatible endpoint in a ModelPool."""
+
+    def __init__(self, url: str, llm: ChatOpenAI):
+        self.url = url
+        self.llm = llm
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+
+class ModelPool:
+    """
+    Least-outstanding-requests balancing over several model servers.
+
+    A backend that fails with a timeout, connection error or 5xx is ejected
+    for eject_seconds; a background thread probes ejected backends with
+    GET /models every health_interval seconds and re-admits them as soon as
+    they answer. If every backend is ejected, the one due back first is used
+    anyway rather than failing the request outright.
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        eject_seconds: float = 30.0,
+        health_interval: float = 10.0,
+        probe_timeout: float = 2.0,
+    ):
+        if not backends:
+            raise ValueError("ModelPool needs at least one backend")
+        self.backends = backends
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health_thread: Optional[threading.Thread] = None
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[Backend]:
+        """Reserve the least busy healthy backend not in exclude."""
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [b for b in self.backends if b.url not in exclude]
+            if not candidates:
+                return None
+            healthy = [b for b in candidates if b.healthy]
+            if healthy:
+                # Rotate the start so ties are spread round-robin
+                self._next = (self._next + 1) % len(self.backends)
+                start = self._next
+                backend = min(
+                    healthy,
+                    key=lambda b: (
+                        b.outstanding,
+                        (self.backends.index(b) - start) % len(self.backends),
+                    ),
+                )
+            else:
+                backend = min(candidates, key=lambda b: b.ejected_until)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend: Backend, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                return
+            backend.failures += 1
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+        logger.warning(f"Ejecting model backend {backend.url}: {error}")
+        self._ensure_health_thread()
+
+    def probe(self, backend: Backend) -> bool:
+        """GET /models on one backend; re-admits it on success."""
+        try:
+            response = get_http_client().get(
+                f"{backend.url.rstrip('/')}/models",
+                headers={"Authorization": "Bearer foundry-local"},
+                timeout=self.probe_timeout,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.debug(f"Model backend {backend.url} probe failed: {e}")
+            with self._lock:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+            return False
+        with self._lock:
+            backend.ejected_until = 0.0
+        return True
+
+    def check_all(self) -> bool:
+        """Probe every backend; True if at least one is up."""
+        results = [self.probe(backend) for backend in self.backends]
+        if not all(results):
+            self._ensure_health_thread()
+        return any(results)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "url": b.url,
+                    "healthy": b.healthy,
+                    "outstanding": b.outstanding,
+                    "requests": b.requests,
+                    "failures": b.failures,
+                }
+                for b in self.backends
+            ]
+
+    def _ensure_health_thread(self) -> None:
+        with self._lock:
+            if self._health_thread is not None and self._health_thread.is_alive():
+                return
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="model-pool-health", daemon=True
+            )
+            self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        # Runs while some backend is ejected, then exits
+        while True:
+            time.sleep(self.health_interval)
+            ejected = [b for b in self.backends if b.ejected_until]
+            if not ejected:
+                return
+            for backend in ejected:
+                if self.probe(backend):
+                    logger.info(f"Model backend {backend.url} is back")
+
+
+class PooledChatModel(BaseChatModel):
+    """
+    Chat model that spreads calls over a ModelPool.
+
+    Each backend is a ChatOpenAI instance; generate/stream calls (sync and
+    async) go to the least busy backend and are retried on the next one
+    after a failover error. A stream is only retried if it failed before its
+    first chunk.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    pool: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-pool"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"endpoints": [b.url for b in self.pool.backends]}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Reuse ChatOpenAI's tool formatting, then bind the result to the pool
+        template = self.pool.backends[0].llm.bind_tools(tools, **kwargs)
+        return self.bind(**template.kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: List[str] = []
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            try:
+                result = backend.llm._generate(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except _FAILOVER_ERRORS as e:
+                self.pool.release(backend, e)
+                tried.append(backend.url)
+                if len(tried) == len(self.pool.backends):
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(backend)
+                raise
+            self.pool.release(backend)
+            return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tried: List[str] = []
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            try:
+                result = await backend.llm._agenerate(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except _FAILOVER_ERRORS as e:
+                self.pool.release(backend, e)
+                tried.append(backend.url)
+                if len(tried) == len(self.pool.backends):
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(backend)
+                raise
+            self.pool.release(backend)
+            return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tried: List[str] = []
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            started = False
+            try:
+                for chunk in backend.llm._stream(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                ):
+                    started = True
+                    yield chunk
+            except _FAILOVER_ERRORS as e:
+                self.pool.release(backend, e)
+                tried.append(backend.url)
+                if started or len(tried) == len(self.pool.backends):
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(backend)
+                raise
+            self.pool.release(backend)
+            return
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tried: List[str] = []
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            started = False
+            try:
+                async for chunk in backend.llm._astream(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                ):
+                    started = True
+                    yield chunk
+            except _FAILOVER_ERRORS as e:
+                self.pool.release(backend, e)
+                tried.append(backend.url)
+                if started or len(tried) == len(self.pool.backends):
+                    raise
+                continue
+            except BaseException:
+                self.pool.release(backend)
+                raise
+            self.pool.release(backend)
+            return
+
+
+class ModalLoader:
+    """Singleton loader for LLM and Agent instances."""
+
+    _llm_instance: Optional[BaseChatModel] = None
+    _pool: Optional[ModelPool] = None
+    _agent_instance = None  # Compiled agent runtime returned by create_agent(...)
+    _lock = threading.RLock()
+    _warmup_thread: Optional[threading.Thread] = None
+
+    # Cold-start breakdown in milliseconds (llm_init, health_check, agent_compile)
+    timings: Dict[str, float] = {}
+
+    # Token counts of the full agent's prompt prefix (see prompt_builder.prompt_report)
+    prompt_stats: Dict[str, Any] = {}
+
+    # Agents compiled for a tool subset, keyed by frozenset of tool names
+    _subset_agents = TTLCache(max_entries=settings.router.tool_selection_max_agents)
+
+    SYSTEM_PROMPT = """You are Dev Assistant, a helpful expert (Python + SQL) developer assistant.
+
+        PRIMARY ROLE:
+        - Expert Programming Developer in Python
+        - Help with development, debugging, testing, and code reviewing
+        - Execute code analysis, generate reports, and fetch metrics
+        - Maintain code quality and security standards
+
+        AVAILABLE TOOLS:
+        You have access to the following tools:
+        - read_and_generate_code(requirement: str, output_file: str): Generate Python code based on requirement and save to file
+        - analyze_code(file_path: str): Analyze code file and return insights
+        - review_project(directory: str, top_n: int): Review a whole project (per-module metrics and hot spots) in one call
+        - search_code(query: str, directory: str, max_results: int): Find where a symbol is defined or a text occurs in a project (indexed; use instead of listing and reading files)
+        - save_memory(key: str, content: str): Save information to memory
+        - recall_memory(key: str): Retrieve saved memory
+        - list_memories(): List all saved memories
+
+        CRITICAL INSTRUCTIONS:
+        1. ONLY use read_and_generate_code when user EXPLICITLY asks to:
+        - "generate code and save to [file]"
+        - "create a file with [code]"
+        - "write [code] to [filename]"
+
+        2. DO NOT use the tool for:
+        - "show me code for..."
+        - "how to..."
+        - "example of..."
+        - "write code for..." (without save to file)
+
+        3. For questions without file saving, just answer directly in chat
+
+        4. NEVER just describe what the tool does - if you use it, CALL it
+        5. Extract the requirement and output file path clearly
+        6. NEVER invent or hallucinate tool outputs
+
+        OUTPUT REQUIREMENTS:
+        1. Be concise - summarize results clearly
+        2. Include relevant details
+        3. For code examples, show complete working code
+        4. Suggest next steps when applicable
+
+        ERROR HANDLING:
+        - If a tool fails, explain why
+        - Ask for clarification if needed"""
+
+    @classmethod
+    def get_llm(cls) -> BaseChatModel:
+        """Get or initialize the LLM instance."""
+        if cls._llm_instance is None:
+            with cls._lock:
+                if cls._llm_instance is None:
+                    start = time.perf_counter()
+                    cls._llm_instance = cls._initialize_llm()
+                    cls._record_timing("llm_init", start)
+        return cls._llm_instance
+
+    @classmethod
+    def get_agent(cls, tool_names: Optional[Iterable[str]] = None):
+        """
+        Get or initialize the agent runtime.
+
+        LangChain v1: create_agent(model, tools=..., system_prompt=...) is the standard approach.
+        The returned object is invokable via agent.invoke({"messages": [...]})
+        and it executes tool calls internally.
+
+        tool_names restricts the agent to a subset of the registry (see
+        services.core.tool_selector); one agent is compiled per subset and
+        kept in a small LRU.
+        """
+        if tool_names is not None:
+            return cls._get_subset_agent(frozenset(tool_names))
+
+        if cls._agent_instance is not None:
+            return cls._agent_instance
+
+        with cls._lock:
+            if cls._agent_instance is not None:
+                return cls._agent_instance
+
+            start = time.perf_counter()
+            cls._agent_instance, cls.prompt_stats = cls._compile_agent(
+                tools.get_all_tools(), "all tools"
+            )
+            cls._record_timing("agent_compile", start)
+        return cls._agent_instance
+
+    @classmethod
+    def _get_subset_agent(cls, names: FrozenSet[str]):
+        agent = cls._subset_agents.get(names)
+        if agent is not None:
+            return agent
+
+        with cls._lock:
+            agent = cls._subset_agents.get(names)
+            if agent is None:
+                tool_list = [t for t in tools.get_all_tools() if t.name in names]
+                agent, _ = cls._compile_agent(tool_list, ", ".join(sorted(names)))
+                cls._subset_agents.put(names, agent)
+        return agent
+
+    @classmethod
+    def _compile_agent(cls, tool_list: list, label: str):
+        # A small, byte-stable prefix (system prompt + tool schemas) keeps
+        # prefill short and lets the server reuse its KV cache
+        system_prompt, tool_list = build_prefix(cls.SYSTEM_PROMPT, tool_list)
+        logger.debug(f"Agent tools: {[(type(t).__name__, t.name) for t in tool_list]}")
+        report = prompt_report(system_prompt, tool_list)
+        logger.info(f"Agent prompt prefix ({label}): {format_report(report)}")
+
+        # Sessions are checkpointed per thread_id under settings.app.session_store
+        agent = create_agent(
+            model=cls.get_llm(),
+            tools=tool_list,
+            system_prompt=system_prompt,
+            checkpointer=get_checkpointer(),
+            middleware=cls._middleware(),
+        )
+        return agent, report
+
+    @classmethod
+    def _middleware(cls) -> list:
+        # The budget is checked first so an exhausted request never queues;
+        # each model call then waits for a scheduler slot, not the whole loop
+        middleware = [BudgetMiddleware()]
+        if settings.model.scheduler:
+            middleware.append(SchedulerMiddleware())
+        return middleware
+
+    @classmethod
+    def health_check(cls) -> bool:
+        """Cheap liveness probe: list models instead of running a generation."""
+        start = time.perf_counter()
+        try:
+            if cls._pool is not None:
+                return cls._pool.check_all()
+            response = get_http_client().get(
+                f"{cls.endpoint_urls()[0].rstrip('/')}/models",
+                headers={"Authorization": "Bearer foundry-local"},
+                timeout=settings.model.health_check_timeout,
+            )
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Model server health check failed: {e}")
+            return False
+        finally:
+            cls._record_timing("health_check", start)
+
+    @classmethod
+    def warm_up(cls) -> threading.Thread:
+        """Probe the server and compile the agent on a background thread."""
+        with cls._lock:
+            if cls._warmup_thread is None:
+                cls._warmup_thread = threading.Thread(
+                    target=cls._warm_up, name="modal-loader-warmup", daemon=True
+                )
+                cls._warmup_thread.start()
+        return cls._warmup_thread
+
+    @classmethod
+    def _warm_up(cls) -> None:
+        try:
+            cls.health_check()
+            cls.get_agent()
+            logger.info(f"Model warm-up complete: {cls.startup_report()}")
+        except Exception:
+            logger.exception("Model warm-up failed.")
+
+    @classmethod
+    def startup_report(cls) -> str:
+        """Human-readable cold-start timing breakdown."""
+        return ", ".join(f"{k}={v:.1f}ms" for k, v in cls.timings.items())
+
+    @classmethod
+    def _record_timing(cls, name: str, start: float) -> None:
+        cls.timings[name] = (time.perf_counter() - start) * 1000
+
+    @classmethod
+    def endpoint_urls(cls) -> List[str]:
+        """Model endpoints: remote_model_url in remote mode, else the model config."""
+        app_cfg, model_cfg = settings.app, settings.model
+        if app_cfg.mode == "remote_model" and app_cfg.remote_model_url:
+            return [u.strip() for u in app_cfg.remote_model_url.split(",") if u.strip()]
+        return list(model_cfg.endpoints) or [model_cfg.base_url]
+
+    @classmethod
+    def _initialize_llm(cls) -> BaseChatModel:
+        """Initialize ChatOpenAI for Foundry Local (OpenAI-compatible)."""
+        model_cfg = settings.model
+        urls = cls.endpoint_urls()
+        if len(urls) == 1:
+            return cls._chat_model(urls[0], max_retries=1)
+
+        # Failover replaces client-side retries on the same backend
+        cls._pool = ModelPool(
+            [Backend(url, cls._chat_model(url, max_retries=0)) for url in urls],
+            eject_seconds=model_cfg.pool_eject_seconds,
+            health_interval=model_cfg.pool_health_interval,
+            probe_timeout=model_cfg.health_check_timeout,
+        )
+        logger.info(f"Model pool: {', '.join(urls)}")
+        return PooledChatModel(pool=cls._pool)
+
+    @classmethod
+    def _chat_model(cls, base_url: str, max_retries: int) -> ChatOpenAI:
+        model_cfg = settings.model
+
+        # No startup generation: use health_check() for a cheap liveness probe.
+        # All instances share the keep-alive clients from http_client.
+        return ChatOpenAI(
+            model=model_cfg.foundry_model,
+            base_url=base_url,
+            api_key="foundry-local",
+            temperature=model_cfg.temperature,
+            timeout=request_timeout(),
+            max_retries=max_retries,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **prefix_cache_kwargs(),
+        )
+
+    @classmethod
+    def reset(cls) -> None:
+        """Reset cached instances (useful for testing)."""
+        cls._llm_instance = None
+        cls._pool = None
+        cls._agent_instance = None
+        cls._subset_agents.clear()
+        cls._warmup_thread = None
+        cls.timings = {}
+        cls.prompt_stats = {}
+
+
+modal_loader = ModalLoader()
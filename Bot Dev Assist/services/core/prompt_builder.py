@@ -0,0 +1,203 @@
+"""
+Prompt assembly for a byte-stable agent prefix.
+
+Local OpenAI-compatible servers (llama.cpp, vLLM, ...) can reuse the KV cache
+of a prompt prefix they have already processed, but only if the prefix is
+byte-identical from one request to the next. The agent prefix is the system
+prompt followed by the tool schemas, so both are normalized here:
+
+- the system prompt is dedented, trailing whitespace and runs of blank lines
+  are removed;
+- tools are ordered by name and their schemas serialized with sorted keys.
+
+compile_prompt() additionally shrinks the prefix per profile (the
+settings.model.prompt_profile knob):
+
+- "full":    normalization only;
+- "compact": drops prompt sections that restate the tool schemas (the
+             AVAILABLE TOOLS list) and repeated lines;
+- "minimal": the opening paragraph and the CRITICAL INSTRUCTIONS only.
+
+compact_tool() cuts a tool description down to its summary plus the
+documented arguments that actually appear in the schema.
+
+prefix_fingerprint() hashes the result so a change in the prefix shows up in
+the logs, and prompt_report() counts its tokens with the history tokenizer.
+"""
+
+import hashlib
+import inspect
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from config import settings
+from services.core.history import count_tokens
+
+
+def normalize_prompt(text: str) -> str:
+    """Dedent, strip trailing whitespace and collapse blank-line runs."""
+    text = inspect.cleandoc(text)
+    lines = [line.rstrip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+PROFILES = ("full", "compact", "minimal")
+
+# Sections that only describe the tools; the schemas already carry this
+_TOOL_SECTIONS = {"AVAILABLE TOOLS"}
+_MINIMAL_SECTIONS = {"CRITICAL INSTRUCTIONS"}
+
+_SECTION_HEADER = re.compile(r"^([A-Z][A-Z ]+):$")
+
+
+def _sections(text: str) -> List[tuple]:
+    """Split a normalized prompt into (header, lines) pairs; intro has header ""."""
+    sections = [("", [])]
+    for line in text.splitlines():
+        match = _SECTION_HEADER.match(line.strip())
+        if match:
+            sections.append((match.group(1), []))
+        else:
+            sections[-1][1].append(line)
+    return sections
+
+
+def compile_prompt(text: str, profile: str = "compact") -> str:
+    """Normalized system prompt, reduced according to profile."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown prompt profile: {profile}")
+    text = normalize_prompt(text)
+    if profile == "full":
+        return text
+
+    seen = set()
+    blocks = []
+    for header, lines in _sections(text):
+        if header in _TOOL_SECTIONS:
+            continue
+        if profile == "minimal" and header and header not in _MINIMAL_SECTIONS:
+            continue
+
+        kept = []
+        for line in lines:
+            key = re.sub(r"^\s*(?:[-*]|\d+\.)\s*", "", line).strip().lower()
+            if key and key in seen:
+                continue
+            seen.add(key)
+            kept.append(line)
+        body = "\n".join(kept).strip()
+        if body:
+            blocks.append(f"{header}:\n{body}" if header else body)
+    return "\n\n".join(blocks)
+
+
+_DOC_SECTION = re.compile(r"^(Args|Arguments|Returns|Raises|Examples?|Yields):\s*$")
+
+
+def compact_description(description: str, arg_names: Sequence[str]) -> str:
+    """Summary paragraph plus the Args entries for parameters in the schema."""
+    doc = inspect.cleandoc(description or "")
+    summary = doc.split("\n\n", 1)[0].strip()
+    summary = " ".join(summary.split())
+
+    args = []
+    section = None
+    for line in doc.splitlines():
+        match = _DOC_SECTION.match(line.strip())
+        if match:
+            section = match.group(1)
+            continue
+        if section in ("Args", "Arguments"):
+            name, sep, text = line.strip().partition(":")
+            name = name.split(" ", 1)[0]
+            if sep and name in arg_names and text.strip():
+                args.append(f"{name}: {text.strip()}")
+
+    if args:
+        return f"{summary} Args: " + "; ".join(args)
+    return summary
+
+
+def compact_tool(tool_obj: Any) -> Any:
+    """Copy of a BaseTool whose description is compacted (others unchanged)."""
+    description = getattr(tool_obj, "description", None)
+    if not description or not hasattr(tool_obj, "model_copy"):
+        return tool_obj
+    compact = compact_description(description, list(getattr(tool_obj, "args", {})))
+    return tool_obj.model_copy(update={"description": compact})
+
+
+def sorted_tools(tool_list: Sequence[Any]) -> List[Any]:
+    """Tools in a deterministic (name) order."""
+    return sorted(tool_list, key=lambda t: getattr(t, "name", str(t)))
+
+
+def build_prefix(
+    system_prompt: str,
+    tool_list: Sequence[Any],
+    profile: Optional[str] = None,
+    compact_tools: Optional[bool] = None,
+) -> Tuple[str, List[Any]]:
+    """System prompt and tool list to compile the agent with."""
+    model_cfg = settings.model
+    if profile is None:
+        profile = model_cfg.prompt_profile
+    if compact_tools is None:
+        compact_tools = model_cfg.compact_tools
+    if compact_tools:
+        tool_list = [compact_tool(t) for t in tool_list]
+    return compile_prompt(system_prompt, profile), sorted_tools(tool_list)
+
+
+def tool_schema(tool_obj: Any) -> str:
+    """Canonical JSON of a tool's OpenAI function schema."""
+    return json.dumps(
+        convert_to_openai_tool(tool_obj), sort_keys=True, separators=(",", ":")
+    )
+
+
+def prefix_fingerprint(system_prompt: str, tool_list: Sequence[Any]) -> str:
+    """Short hash of the system prompt plus tool schemas."""
+    h = hashlib.sha256(system_prompt.encode("utf-8"))
+    for tool_obj in tool_list:
+        h.update(b"\0" + tool_schema(tool_obj).encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def prompt_report(system_prompt: str, tool_list: Sequence[Any]) -> Dict[str, Any]:
+    """Token counts for the prefix sent ahead of every agent request."""
+    tool_tokens = {
+        getattr(t, "name", str(t)): count_tokens(tool_schema(t)) for t in tool_list
+    }
+    system_tokens = count_tokens(system_prompt)
+    return {
+        "system_tokens": system_tokens,
+        "tool_tokens": tool_tokens,
+        "total_tokens": system_tokens + sum(tool_tokens.values()),
+        "system_chars": len(system_prompt),
+        "fingerprint": prefix_fingerprint(system_prompt, tool_list),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    tools = ", ".join(f"{k}={v}" for k, v in report["tool_tokens"].items())
+    return (
+        f"{report['total_tokens']} tokens (system {report['system_tokens']}; "
+        f"tools: {tools or 'none'}) prefix={report['fingerprint']}"
+    )
+
+
+def prefix_cache_kwargs() -> Dict[str, Any]:
+    """
+    Extra ChatOpenAI kwargs asking the server to keep the prompt's KV cache,
+    e.g. {"extra_body": {"cache_prompt": True}} for llama.cpp. Empty unless
+    settings.model.prompt_cache is on; servers that cache prefixes on their
+    own (vLLM with prefix caching) only need the stable prefix.
+    """
+    model_cfg = settings.model
+    if not model_cfg.prompt_cache or not model_cfg.prompt_cache_field:
+        return {}
+    return {"extra_body": {model_cfg.prompt_cache_field: True}}
@@ -0,0 +1,258 @@
+"""
+Response cache for chat-only completions.
+
+Two tiers are consulted in order: an in-memory LRU (TTLCache) and an on-disk
+SQLite table under settings.app.session_store. A disk hit is promoted into
+memory. Keys hash the model, the sampling parameters, the system prompt and
+the normalized user input, so changing any of them never serves a stale
+answer.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Protocol
+
+from config import settings
+from services.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    """A cache tier: string keys to string values."""
+
+    name: str
+
+    def get(self, key: str) -> Optional[str]: ...
+
+    def put(self, key: str, value: str) -> None: ...
+
+
+class MemoryBackend:
+    """In-process LRU tier."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def put(self, key: str, value: str) -> None:
+        self._cache.put(key, value)
+
+
+class SQLiteBackend:
+    """On-disk tier; survives restarts and is shared by every session."""
+
+    name = "disk"
+
+    # Trim to max_entries every this many writes rather than on each one
+    _EVICT_EVERY = 64
+    # Refresh a hit's last-access time (for LRU trimming) only when it is at
+    # least this old, so most hits are a read with no write or commit
+    _TOUCH_AFTER = 300.0
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, accessed FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created, accessed = row
+            if self.ttl and created + self.ttl < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            if now - accessed >= self._TOUCH_AFTER:
+                self._conn.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes += 1
+            if self._writes % self._EVICT_EVERY == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+            )
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+def _normalize_input(user_input: str) -> str:
+    return re.sub(r"\s+", " ", user_input).strip().lower()
+
+
+def _digest(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def cache_scope(
+    system_prompt: Optional[str] = None, context: Optional[str] = None
+) -> str:
+    """Digest of everything besides the input that shapes an answer."""
+    model_cfg = settings.model
+    payload = {
+        "model": model_cfg.foundry_model,
+        "temperature": model_cfg.temperature,
+        "top_p": model_cfg.top_p,
+        "max_tokens": model_cfg.max_tokens,
+        "system": _digest(system_prompt),
+        "context": _digest(context),
+    }
+    return _digest(json.dumps(payload, sort_keys=True))
+
+
+class ResponseCache:
+    """Tiered response cache with hit/miss accounting."""
+
+    def __init__(self, tiers: List[CacheBackend]):
+        self.tiers = tiers
+        self.hits: Dict[str, int] = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+
+    def make_key(
+        self,
+        user_input: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+    ) -> str:
+        """Key from model, sampling params, system prompt and normalized input."""
+        payload = {
+            "scope": cache_scope(system_prompt, context),
+            "input": _normalize_input(user_input),
+        }
+        return _digest(json.dumps(payload, sort_keys=True))
+
+    def get(self, key: str) -> Optional[str]:
+        for i, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} read failed: {e}")
+                continue
+            if value is not None:
+                self.hits[tier.name] += 1
+                for upper in self.tiers[:i]:
+                    upper.put(key, value)
+                self._log("hit", tier.name)
+                return value
+
+        self.misses += 1
+        self._log("miss")
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            try:
+                tier.put(key, value)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} write failed: {e}")
+
+    @property
+    def hit_rate(self) -> float:
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+    def _log(self, outcome: str, tier: str = "") -> None:
+        where = f" ({tier})" if tier else ""
+        logger.info(
+            f"Response cache {outcome}{where}; hit rate {self.hit_rate:.1%} "
+            f"over {sum(self.hits.values()) + self.misses} lookups"
+        )
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Shared response cache, or None when disabled or sampling is too random."""
+    cache_cfg = settings.cache
+    if not cache_cfg.response_enabled:
+        return None
+    if settings.model.temperature > cache_cfg.response_max_temperature:
+        return None
+
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                tiers: List[CacheBackend] = [
+                    MemoryBackend(
+                        cache_cfg.response_max_entries, cache_cfg.response_ttl
+                    )
+                ]
+                if cache_cfg.response_disk_enabled:
+                    path = cache_cfg.response_disk_path or os.path.join(
+                        settings.app.session_store, "response_cache.sqlite"
+                    )
+                    try:
+                        tiers.append(
+                            SQLiteBackend(
+                                path,
+                                cache_cfg.response_disk_max_entries,
+                                cache_cfg.response_ttl,
+                            )
+                        )
+                    except sqlite3.Error as e:
+                        logger.warning(f"Disk response cache unavailable: {e}")
+                _response_cache = ResponseCache(tiers)
+    return _response_cache
@@ -1,8 +1,42 @@
-from typing import Literal
+"""
+AGENT/CHAT routing.
+
+Routing runs in three tiers so that the common case costs microseconds:
+
+1. A local nearest-centroid classifier over hashed word/bigram features.
+   If its confidence clears settings.router.confidence_threshold we are done.
+2. For ambiguous inputs (and only when an LLM is supplied) a constrained
+   completion: temperature 0, a couple of output tokens, stop on newline.
+   Its decision is appended to the decision log and fed back to the
+   classifier, so the same kind of input is decided locally next time.
+   The call runs at the scheduler's ROUTER priority; if it is rejected
+   under load the keyword tier decides instead.
+3. Weighted keyword scoring as the last resort.
+
+Decisions are memoized in a process-wide LRU/TTL cache keyed by a
+normalized form of the input, so "analyze foo.py" and "analyze bar.py"
+share one entry and repeat patterns never reach the LLM.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Literal, Optional, Tuple
 
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel
 
+from config import settings
+from services.core.cache import TTLCache
+from services.core.scheduler import Priority, aschedule, schedule
+
+logger = logging.getLogger(__name__)
+
 
 class RouterDecision(BaseModel):
     mode: Literal["AGENT", "CHAT"]
@@ -17,29 +51,384 @@ router_prompt = ChatPromptTemplate.from_template(
 )
 
 
+# Seed examples; the decision log extends these at runtime.
+_SEED_EXAMPLES: Dict[str, List[str]] = {
+    "AGENT": [
+        "analyze main.py",
+        "analyze the code in services/router.py",
+        "run the tests",
+        "execute this script",
+        "scan the project for todo comments",
+        "fetch the latest metrics",
+        "list my saved memories",
+        "save this to memory as project_path",
+        "remember that my name is sam",
+        "recall what i saved about the database",
+        "generate code and save to output/app.py",
+        "create a file with a flask hello world",
+        "write a csv parser to utils.py",
+        "read the file config.json",
+        "call the analyze tool on this file",
+        "where is get_agent defined in this repo",
+        "find usages of SessionManager in the codebase",
+        "search the code for the retry logic",
+        "review this project",
+    ],
+    "CHAT": [
+        "how do i reverse a list in python",
+        "what is a decorator",
+        "explain the difference between inner and outer join",
+        "show me code for binary search",
+        "example of a context manager",
+        "why does my function return none",
+        "write code for fibonacci",
+        "what does this error mean",
+        "hello",
+        "thanks that helped",
+        "can you explain async await",
+        "how to write a sql query with group by",
+        "what is the best way to structure a python project",
+        "review this snippet for bugs",
+    ],
+}
+
+_TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]*|\.[a-z0-9]+")
+_FEATURE_DIM = 1 << 14
+
+
+def _features(text: str) -> Dict[int, float]:
+    """Hashed unigram + bigram counts (crc32 keeps hashes stable across runs)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vec: Dict[int, float] = {}
+    for gram in grams:
+        idx = zlib.crc32(gram.encode("utf-8")) % _FEATURE_DIM
+        vec[idx] = vec.get(idx, 0.0) + 1.0
+    return vec
+
+
+def _normalize(vec: Dict[int, float]) -> Dict[int, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vec.items()}
+
+
+class RouteClassifier:
+    """Nearest-centroid AGENT/CHAT classifier over sparse hashed features."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sums: Dict[str, Dict[int, float]] = {"AGENT": {}, "CHAT": {}}
+        self._centroids: Dict[str, Dict[int, float]] = {"AGENT": {}, "CHAT": {}}
+
+        for mode, examples in _SEED_EXAMPLES.items():
+            for text in examples:
+                self._add(mode, text)
+        self._load_decision_log()
+        self._refresh()
+
+    def predict(self, user_input: str) -> Tuple[str, float]:
+        """Return (mode, confidence); confidence is the 0-1 margin between classes."""
+        vec = _normalize(_features(user_input))
+        scores = {
+            mode: sum(w * centroid.get(k, 0.0) for k, w in vec.items())
+            for mode, centroid in self._centroids.items()
+        }
+        agent, chat = scores["AGENT"], scores["CHAT"]
+        if agent + chat <= 0:
+            return "CHAT", 0.0
+
+        mode = "AGENT" if agent > chat else "CHAT"
+        return mode, abs(agent - chat) / (agent + chat)
+
+    def learn(self, user_input: str, mode: str) -> None:
+        """Fold a resolved decision into the centroids."""
+        with self._lock:
+            self._add(mode, user_input)
+            self._refresh()
+
+    def _add(self, mode: str, text: str) -> None:
+        target = self._sums[mode]
+        for k, v in _normalize(_features(text)).items():
+            target[k] = target.get(k, 0.0) + v
+
+    def _refresh(self) -> None:
+        self._centroids = {mode: _normalize(s) for mode, s in self._sums.items()}
+
+    def _load_decision_log(self) -> None:
+        path = settings.router.decision_log
+        if not path or not os.path.exists(path):
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.readlines()[-settings.router.decision_log_replay :]
+            for line in lines:
+                entry = json.loads(line)
+                if entry.get("mode") in self._sums:
+                    self._add(entry["mode"], entry.get("text", ""))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not replay router decision log: {e}")
+
+
+_classifier: Optional[RouteClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> RouteClassifier:
+    """Get the shared classifier (built on first use)."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = RouteClassifier()
+    return _classifier
+
+
+# Normalization: template out the parts of a request that do not affect routing.
+_NORMALIZERS = [
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"`[^`]*`"), "<code>"),
+    # Quotes must sit on word boundaries: apostrophes ("what's", "don't")
+    # are not string delimiters
+    (re.compile(r"\"[^\"]*\"|(?<!\w)'[^'\n]*'(?!\w)"), "<str>"),
+    (re.compile(r"\S*[/\\]\S*"), "<path>"),
+    (re.compile(r"\b[\w-]+\.[a-z][a-z0-9]{0,4}\b"), "<path>"),
+    (re.compile(r"\b\w*(?:_\w*|[a-z][A-Z]\w*)\b"), "<ident>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "<num>"),
+    (re.compile(r"[^\w<>\s]+"), " "),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_route_key(user_input: str) -> str:
+    """Cache key for a routing decision: paths/identifiers/literals templated out."""
+    text = user_input
+    for pattern, replacement in _NORMALIZERS:
+        text = pattern.sub(replacement, text)
+    return text.strip().lower()
+
+
+routing_cache = TTLCache(
+    max_entries=settings.cache.routing_max_entries, ttl=settings.cache.routing_ttl
+)
+
+
+class KeywordMatcher:
+    """
+    Single-pass weighted trigger matcher.
+
+    The input is tokenized once by a compiled word regex and every trigger
+    phrase (one or more words) is looked up by hashing the n-grams that start
+    at each token. That is a word-level automaton: whole words only ("return"
+    no longer matches "run", "callback" no longer matches "call") and the cost
+    is O(len(input) * longest_trigger_words), independent of the trigger count.
+    """
+
+    _WORD_RE = re.compile(r"\w+")
+
+    def __init__(self, triggers: Dict[str, float]):
+        self._weights: Dict[Tuple[str, ...], float] = {}
+        for phrase, weight in triggers.items():
+            words = tuple(self._WORD_RE.findall(phrase.lower()))
+            if words:
+                self._weights[words] = float(weight)
+        self._max_words = max((len(w) for w in self._weights), default=0)
+
+    def matches(self, text: str) -> List[Tuple[str, float]]:
+        """All (trigger, weight) hits in input order."""
+        words = self._WORD_RE.findall(text.lower())
+        hits = []
+        for i in range(len(words)):
+            for n in range(1, min(self._max_words, len(words) - i) + 1):
+                weight = self._weights.get(tuple(words[i : i + n]))
+                if weight is not None:
+                    hits.append((" ".join(words[i : i + n]), weight))
+        return hits
+
+    def score(self, text: str) -> float:
+        """Sum of trigger weights; positive leans AGENT, negative leans CHAT."""
+        return sum(weight for _, weight in self.matches(text))
+
+
+keyword_matcher = KeywordMatcher(settings.router.keyword_triggers)
+
+
+def keyword_score(user_input: str) -> float:
+    return keyword_matcher.score(user_input)
+
+
 def _keyword_route(user_input: str) -> str:
-    triggers = ["run", "fetch", "execute", "scan", "list", "analyze", "tool", "call"]
-    return "AGENT" if any(t in user_input.lower() for t in triggers) else "CHAT"
+    if keyword_score(user_input) >= settings.router.keyword_threshold:
+        return "AGENT"
+    return "CHAT"
 
 
-def route_message(llm=None, user_input: str = "", session_id=None) -> str:
-    if not user_input.strip():
+def _constrained(llm):
+    """Bind the router LLM to a tiny, deterministic completion."""
+    return router_prompt | llm.bind(
+        max_tokens=settings.router.llm_max_tokens, temperature=0, stop=["\n"]
+    )
+
+
+def _parse_llm_mode(content: str) -> Optional[str]:
+    # With a 1-2 token budget we may only see "AG"/"CH"
+    text = (content or "").strip().upper()
+    if text.startswith("A"):
+        return "AGENT"
+    if text.startswith("C"):
         return "CHAT"
+    return None
+
+
+def _record_decision(user_input: str, mode: str) -> None:
+    """Append an LLM decision to the log and teach the classifier."""
+    get_classifier().learn(user_input, mode)
+
+    path = settings.router.decision_log
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"text": user_input, "mode": mode}) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write router decision log: {e}")
+
+
+def _local_decision(user_input: str) -> Tuple[RouterDecision, bool]:
+    """Classifier decision and whether it is confident enough to stand alone."""
+    mode, confidence = get_classifier().predict(user_input)
+    decision = RouterDecision(mode=mode, reason=f"classifier ({confidence:.2f})")
+    return decision, confidence >= settings.router.confidence_threshold
+
+
+def _cached(user_input: str) -> Tuple[Optional[str], Optional[RouterDecision]]:
+    """Look up a routing decision; returns (cache_key, decision_or_None)."""
+    if not settings.cache.routing_enabled:
+        return None, None
+    key = normalize_route_key(user_input)
+    return key, routing_cache.get(key)
+
+
+# Reason of the keyword fallback taken because the LLM router failed (for
+# example AdmissionRejected under load); such decisions are not cached, so a
+# busy moment does not pin a route for the whole routing_ttl
+_FALLBACK_AFTER_ERROR = "keyword (router error)"
+
+
+def _remember(key: Optional[str], decision: RouterDecision) -> RouterDecision:
+    if key is not None and decision.reason != _FALLBACK_AFTER_ERROR:
+        routing_cache.put(key, decision)
+    return decision
+
+
+def local_route(user_input: str) -> Optional[RouterDecision]:
+    """
+    Decision reachable without the LLM (cache, confident classifier, or a
+    keyword score of at least speculative_agent_score), else None.
+    """
+    if not user_input.strip():
+        return RouterDecision(mode="CHAT", reason="empty input")
+
+    key, cached = _cached(user_input)
+    if cached is not None:
+        return cached
+
+    decision, confident = _local_decision(user_input)
+    if confident:
+        return _remember(key, decision)
+
+    if keyword_score(user_input) >= settings.router.speculative_agent_score:
+        return RouterDecision(mode="AGENT", reason="keyword (strong)")
+    return None
+
+
+def classify_message(llm=None, user_input: str = "") -> RouterDecision:
+    """Route an input and explain which tier decided it."""
+    if not user_input.strip():
+        return RouterDecision(mode="CHAT", reason="empty input")
+
+    key, cached = _cached(user_input)
+    if cached is not None:
+        return cached
+    return _remember(key, _classify(llm, user_input))
+
+
+async def aclassify_message(llm=None, user_input: str = "") -> RouterDecision:
+    """Async variant of classify_message()."""
+    if not user_input.strip():
+        return RouterDecision(mode="CHAT", reason="empty input")
+
+    key, cached = _cached(user_input)
+    if cached is not None:
+        return cached
+    return _remember(key, await _aclassify(llm, user_input))
+
+
+def _classify(llm, user_input: str) -> RouterDecision:
+    decision, confident = _local_decision(user_input)
+    if confident:
+        return decision
 
     if llm is not None:
         try:
-            chain = router_prompt | llm
-            result = chain.invoke({"user_input": user_input})
-            text = (result.content or "").strip().upper()
+            with schedule(Priority.ROUTER):
+                result = _constrained(llm).invoke({"user_input": user_input})
+            mode = _parse_llm_mode(result.content)
+            if mode:
+                _record_decision(user_input, mode)
+                return RouterDecision(mode=mode, reason="llm")
+        except Exception as ex:
+            logger.warning(f"Routing error: {ex}")
+            return RouterDecision(
+                mode=_keyword_route(user_input), reason=_FALLBACK_AFTER_ERROR
+            )
+
+    return RouterDecision(mode=_keyword_route(user_input), reason="keyword")
 
-            if text.startswith("AGENT"):
-                return "AGENT"
-            if text.startswith("CHAT"):
-                return "CHAT"
-            return _keyword_route(user_input)
 
+async def _aclassify(llm, user_input: str) -> RouterDecision:
+    decision, confident = _local_decision(user_input)
+    if confident:
+        return decision
+
+    if llm is not None:
+        try:
+            async with aschedule(Priority.ROUTER):
+                result = await _constrained(llm).ainvoke({"user_input": user_input})
+            mode = _parse_llm_mode(result.content)
+            if mode:
+                _record_decision(user_input, mode)
+                return RouterDecision(mode=mode, reason="llm")
         except Exception as ex:
-            print(f"Routing error: {ex}")
-            return _keyword_route(user_input)
+            logger.warning(f"Routing error: {ex}")
+            return RouterDecision(
+                mode=_keyword_route(user_input), reason=_FALLBACK_AFTER_ERROR
+            )
+
+    return RouterDecision(mode=_keyword_route(user_input), reason="keyword")
+
+
+def route_message(llm=None, user_input: str = "", session_id=None) -> str:
+    start = time.perf_counter()
+    decision = classify_message(llm=llm, user_input=user_input)
+    logger.debug(
+        f"Routed to {decision.mode} via {decision.reason} "
+        f"in {(time.perf_counter() - start) * 1000:.2f} ms "
+        f"(cache {routing_cache.stats()})"
+    )
+    return decision.mode
+
 
-    return _keyword_route(user_input)
+async def aroute_message(llm=None, user_input: str = "", session_id=None) -> str:
+    """Async variant of route_message()."""
+    start = time.perf_counter()
+    decision = await aclassify_message(llm=llm, user_input=user_input)
+    logger.debug(
+        f"Routed to {decision.mode} via {decision.reason} "
+        f"in {(time.perf_counter() - start) * 1000:.2f} ms "
+        f"(cache {routing_cache.stats()})"
+    )
+    return decision.mode
@@ -0,0 +1,358 @@
+"""
+Priority scheduling and admission control for model requests.
+
+Routing calls, interactive chat and agent tool loops all compete for the
+same CPU-bound model server. RequestScheduler hands out a bounded number of
+model slots (settings.model.max_concurrent) in priority order:
+
+    ROUTER < INTERACTIVE < AGENT < BATCH
+
+(lower runs first; ties are served in arrival order). Each model call takes
+a slot for its own duration only: the runtime wraps chat completions, the
+router wraps its LLM call and SchedulerMiddleware wraps every agent step, so
+a long tool loop re-queues between steps and waiting interactive requests
+go ahead of it.
+
+ROUTER calls generate a token or two, so they get router_reserve slots on
+top of max_concurrent: a router decision never waits for long generations
+(for example a speculative answer) to finish.
+
+Admission control rejects fast instead of letting the queue grow:
+
+- a user already holding per_user slots or queue entries is rejected
+  (sessions without a real user ID - None or the default "Guest" - are
+  not capped per user, since they would all share one budget);
+- when the queue is full, a new request evicts the newest waiter of a
+  strictly lower priority, otherwise it is rejected;
+- a waiter that is not served within queue_timeout is rejected.
+
+Background (BATCH) work is additionally capped at max_concurrent minus
+background_reserve slots, so interactive requests always find one free.
+
+Rejections raise AdmissionRejected.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langgraph.config import get_config
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Scheduling class of a model request (lower is served first)."""
+
+    ROUTER = 0
+    INTERACTIVE = 1
+    AGENT = 2
+    BATCH = 3
+
+
+# User ID of sessions started without one (see AgentRuntime / main --user)
+ANONYMOUS_USER = "Guest"
+
+
+class AdmissionRejected(RuntimeError):
+    """The scheduler refused to queue (or keep queuing) a request."""
+
+
+class _Waiter:
+    """A queued request; woken with a slot or a rejection."""
+
+    def __init__(self, priority: Priority, user: Optional[str], seq: int, loop=None):
+        self.priority = priority
+        self.user = user
+        self.seq = seq
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.error: Optional[AdmissionRejected] = None
+        self._loop = loop
+        self._event = threading.Event() if loop is None else None
+        self._future: Optional[asyncio.Future] = (
+            loop.create_future() if loop is not None else None
+        )
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        if self._event is not None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self._future.done():
+            self._future.set_result(None)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+    async def await_wake(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class RequestScheduler:
+    """Priority queue of model slots with per-user and queue-depth limits."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_queue: int = 32,
+        per_user: int = 2,
+        background_reserve: int = 1,
+        queue_timeout: float = 60.0,
+        router_reserve: int = 1,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.per_user = max(1, per_user)
+        self.background_slots = max(1, self.max_concurrent - background_reserve)
+        self.router_reserve = max(0, router_reserve)
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._heap: List[_Waiter] = []
+        self._running = 0
+        self._running_background = 0
+        self._running_router = 0
+        self._users: Counter = Counter()
+
+        self._admitted: Counter = Counter()
+        self._rejected: Counter = Counter()
+        self._waits: Dict[Priority, Deque[float]] = {
+            p: deque(maxlen=256) for p in Priority
+        }
+
+    @contextmanager
+    def slot(self, priority: Priority, user: Optional[str] = None) -> Iterator[None]:
+        """Hold a model slot for the duration of the block."""
+        waiter = self._enqueue(priority, user)
+        if not waiter.wait(self.queue_timeout):
+            self._expire(waiter)
+        self._check(waiter)
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def aslot(
+        self, priority: Priority, user: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """Async variant of slot(); waiting does not block the event loop."""
+        waiter = self._enqueue(priority, user, asyncio.get_running_loop())
+        try:
+            if not await waiter.await_wake(self.queue_timeout):
+                self._expire(waiter)
+        except asyncio.CancelledError:
+            self._expire(waiter)
+            if waiter.granted:
+                self._release(waiter)
+            raise
+        self._check(waiter)
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = {
+                p.name.lower(): round(sorted(w)[len(w) // 2] * 1000, 1)
+                for p, w in self._waits.items()
+                if w
+            }
+            return {
+                "running": self._running,
+                "queued": len(self._heap),
+                "admitted": {p.name.lower(): n for p, n in self._admitted.items()},
+                "rejected": {p.name.lower(): n for p, n in self._rejected.items()},
+                "queue_wait_ms_p50": waits,
+            }
+
+    def _enqueue(self, priority: Priority, user: Optional[str], loop=None) -> _Waiter:
+        if user in ("", ANONYMOUS_USER):
+            user = None
+        evicted = None
+        with self._lock:
+            if user is not None and self._users[user] >= self.per_user:
+                self._rejected[priority] += 1
+                raise AdmissionRejected(
+                    f"{user} already has {self.per_user} requests in flight"
+                )
+
+            if len(self._heap) >= self.max_queue:
+                victim = max(self._heap) if self._heap else None
+                if victim is None or victim.priority <= priority:
+                    self._rejected[priority] += 1
+                    raise AdmissionRejected(
+                        f"model queue is full ({self.max_queue} waiting)"
+                    )
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._drop(victim, "evicted by a higher-priority request")
+                evicted = victim
+
+            waiter = _Waiter(priority, user, next(self._seq), loop)
+            if user is not None:
+                self._users[user] += 1
+            heapq.heappush(self._heap, waiter)
+            self._dispatch()
+
+        if evicted is not None:
+            evicted.wake()
+        return waiter
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the head of the queue (lock held)."""
+        while self._heap:
+            head = self._heap[0]
+            if head.priority == Priority.ROUTER:
+                # Routers use free regular slots, then their reserve
+                if self._running >= self.max_concurrent + self.router_reserve:
+                    return
+            elif (
+                self._running - self._running_router >= self.max_concurrent
+                or self._running >= self.max_concurrent + self.router_reserve
+            ):
+                return
+            if (
+                head.priority == Priority.BATCH
+                and self._running_background >= self.background_slots
+            ):
+                # Everything behind a BATCH head is BATCH too
+                return
+            heapq.heappop(self._heap)
+            head.granted = True
+            self._running += 1
+            if head.priority == Priority.BATCH:
+                self._running_background += 1
+            elif head.priority == Priority.ROUTER:
+                self._running_router += 1
+            self._admitted[head.priority] += 1
+            self._waits[head.priority].append(time.perf_counter() - head.enqueued)
+            head.wake()
+
+    def _drop(self, waiter: _Waiter, reason: str) -> None:
+        """Reject a queued waiter (lock held)."""
+        waiter.error = AdmissionRejected(reason)
+        self._rejected[waiter.priority] += 1
+        if waiter.user is not None:
+            self._users[waiter.user] -= 1
+        logger.info(f"{waiter.priority.name} request rejected: {reason}")
+
+    def _expire(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted or waiter.error is not None:
+                return
+            self._heap.remove(waiter)
+            heapq.heapify(self._heap)
+            self._drop(waiter, f"not scheduled within {self.queue_timeout:.0f}s")
+
+    @staticmethod
+    def _check(waiter: _Waiter) -> None:
+        if waiter.error is not None:
+            raise waiter.error
+
+    def _release(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._running -= 1
+            if waiter.priority == Priority.BATCH:
+                self._running_background -= 1
+            elif waiter.priority == Priority.ROUTER:
+                self._running_router -= 1
+            if waiter.user is not None:
+                self._users[waiter.user] -= 1
+            self._dispatch()
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[RequestScheduler]:
+    """Shared scheduler, or None when scheduling is disabled."""
+    model_cfg = settings.model
+    if not model_cfg.scheduler:
+        return None
+
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                # A micro-batch is one server pass; let a full batch through
+                max_concurrent = model_cfg.max_concurrent
+                if model_cfg.batching:
+                    max_concurrent = max(max_concurrent, model_cfg.batch_max_size)
+                _scheduler = RequestScheduler(
+                    max_concurrent=max_concurrent,
+                    max_queue=model_cfg.max_queue,
+                    per_user=model_cfg.max_per_user,
+                    background_reserve=model_cfg.background_reserve,
+                    queue_timeout=model_cfg.queue_timeout,
+                    router_reserve=model_cfg.router_reserve,
+                )
+    return _scheduler
+
+
+def schedule(priority: Priority, user: Optional[str] = None):
+    """Context manager holding a model slot (a no-op when disabled)."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return nullcontext()
+    return scheduler.slot(priority, user)
+
+
+def aschedule(priority: Priority, user: Optional[str] = None):
+    """Async variant of schedule()."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return _anull()
+    return scheduler.aslot(priority, user)
+
+
+@asynccontextmanager
+async def _anull() -> AsyncIterator[None]:
+    yield
+
+
+def _step_class() -> tuple:
+    """(user, priority) of the agent run, from its configurable."""
+    try:
+        configurable = get_config().get("configurable", {})
+    except RuntimeError:
+        configurable = {}
+    priority = configurable.get("priority", Priority.AGENT)
+    return configurable.get("user"), Priority(priority)
+
+
+class SchedulerMiddleware(AgentMiddleware):
+    """Takes a model slot for each agent step (model call), not the whole loop."""
+
+    def wrap_model_call(self, request, handler):
+        user, priority = _step_class()
+        with schedule(priority, user):
+            return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        user, priority = _step_class()
+        async with aschedule(priority, user):
+            return await handler(request)
@@ -0,0 +1,264 @@
+"""
+Semantic response cache for chat-only completions.
+
+Sits behind the exact-match ResponseCache: a query that misses there is
+embedded and compared against past queries; if the most similar one (in the
+same cache scope: model, sampling params, system prompt, context) clears
+settings.cache.semantic_threshold, its answer is reused.
+
+Storage is a fixed-capacity ring buffer:
+- <dir>/semantic_cache.f32   np.memmap (capacity x dim) of unit vectors
+- <dir>/semantic_cache.scope np.memmap (capacity,) of int64 scope ids
+- <dir>/semantic_cache.sqlite queries/answers/timestamps by slot
+
+Memory stays bounded because the vectors live in the page cache rather than
+the Python heap, and the oldest slot is overwritten once the buffer is full.
+
+numpy is optional: without it get_semantic_cache() returns None.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Protocol
+
+from config import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(Protocol):
+    dim: int
+
+    def embed(self, text: str) -> "np.ndarray": ...
+
+
+class HashingEmbedder:
+    """Model-free embedder: signed hashing of word unigrams and char trigrams."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, text: str) -> "np.ndarray":
+        vec = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        grams = list(words)
+        for word in words:
+            padded = f" {word} "
+            grams.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+
+class SentenceTransformerEmbedder:
+    """Small local embedding model via sentence-transformers (optional)."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self.dim = int(self._model.get_sentence_embedding_dimension())
+
+    def embed(self, text: str) -> "np.ndarray":
+        vec = self._model.encode(text, normalize_embeddings=True)
+        return np.asarray(vec, dtype=np.float32)
+
+
+def _scope_id(scope: str) -> int:
+    return int(scope[:15], 16)
+
+
+class SemanticCache:
+    """Ring-buffer vector index of past queries with cosine-similarity lookup."""
+
+    # msync the memmaps every this many inserts (and on close)
+    _FLUSH_EVERY = 32
+
+    def __init__(
+        self,
+        directory: str,
+        embedder: Embedder,
+        capacity: int = 20000,
+        threshold: float = 0.92,
+        ttl: float = 0.0,
+    ):
+        self.embedder = embedder
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, "semantic_cache")
+        self._db = sqlite3.connect(f"{base}.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "slot INTEGER PRIMARY KEY, query TEXT, answer TEXT, created REAL)"
+        )
+
+        # A layout change (capacity/dim) invalidates the stored vectors
+        fresh = (
+            self._meta("capacity") != capacity
+            or self._meta("dim") != embedder.dim
+            or not os.path.exists(f"{base}.f32")
+        )
+        mode = "w+" if fresh else "r+"
+        self._vectors = np.memmap(
+            f"{base}.f32", dtype=np.float32, mode=mode, shape=(capacity, embedder.dim)
+        )
+        self._scopes = np.memmap(
+            f"{base}.scope", dtype=np.int64, mode=mode, shape=(capacity,)
+        )
+        if fresh:
+            self._db.execute("DELETE FROM entries")
+            self._set_meta("capacity", capacity)
+            self._set_meta("dim", embedder.dim)
+            self._set_meta("count", 0)
+            self._set_meta("next", 0)
+            self._db.commit()
+
+        self._count = self._meta("count") or 0
+        self._next = self._meta("next") or 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, query: str, scope: str) -> Optional[str]:
+        """Answer of the most similar cached query in scope, if similar enough."""
+        vec = self.embedder.embed(_normalize(query))
+        with self._lock:
+            if not self._count:
+                self.misses += 1
+                return None
+
+            sims = self._vectors[: self._count] @ vec
+            sims[self._scopes[: self._count] != _scope_id(scope)] = -1.0
+            slot = int(np.argmax(sims))
+            similarity = float(sims[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            row = self._db.execute(
+                "SELECT answer, created FROM entries WHERE slot = ?", (slot,)
+            ).fetchone()
+            if row is None or (self.ttl and row[1] + self.ttl < time.time()):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            logger.info(
+                f"Semantic cache hit (similarity {similarity:.3f}); "
+                f"hit rate {self.hits / (self.hits + self.misses):.1%}"
+            )
+            return row[0]
+
+    def add(self, query: str, answer: str, scope: str) -> None:
+        """Insert a query/answer pair, overwriting the oldest slot when full."""
+        vec = self.embedder.embed(_normalize(query))
+        with self._lock:
+            slot = self._next
+            self._vectors[slot] = vec
+            self._scopes[slot] = _scope_id(scope)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (slot, query, answer, created) "
+                "VALUES (?, ?, ?, ?)",
+                (slot, query, answer, time.time()),
+            )
+
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._set_meta("next", self._next)
+            self._set_meta("count", self._count)
+            self._db.commit()
+
+            self._inserts += 1
+            if self._inserts % self._FLUSH_EVERY == 0:
+                self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._db.close()
+
+    def _flush(self) -> None:
+        self._vectors.flush()
+        self._scopes.flush()
+
+    def _meta(self, key: str) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def build_embedder(spec: str, dim: int) -> Embedder:
+    """ "hashing" or "sentence-transformers:<model name>"."""
+    if spec.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbedder(spec.split(":", 1)[1])
+    return HashingEmbedder(dim)
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Shared semantic cache, or None when disabled or numpy is missing."""
+    cache_cfg = settings.cache
+    if not cache_cfg.semantic_enabled or np is None:
+        return None
+    if settings.model.temperature > cache_cfg.response_max_temperature:
+        return None
+
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                try:
+                    _semantic_cache = SemanticCache(
+                        directory=cache_cfg.semantic_dir
+                        or os.path.join(settings.app.session_store, "semantic_cache"),
+                        embedder=build_embedder(
+                            cache_cfg.semantic_embedder, cache_cfg.semantic_dim
+                        ),
+                        capacity=cache_cfg.semantic_capacity,
+                        threshold=cache_cfg.semantic_threshold,
+                        ttl=cache_cfg.response_ttl,
+                    )
+                except (ImportError, OSError, sqlite3.Error) as e:
+                    logger.warning(f"Semantic cache unavailable: {e}")
+                    cache_cfg.semantic_enabled = False
+                    return None
+    return _semantic_cache
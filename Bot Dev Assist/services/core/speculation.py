@@ -0,0 +1,178 @@
+"""
+Speculative CHAT generation that overlaps LLM routing.
+
+When the router has to ask the LLM, the runtime starts streaming the
+chat-only answer at the same time. The chunks are buffered until the route
+is known: CHAT commits the buffer (the routing latency is hidden behind
+generation), AGENT cancels the stream, which closes the HTTP response so
+the server stops generating. A committed stream whose consumer stops
+reading early (commit() closed) is stopped the same way, so it does not
+keep generating or hold its model slot.
+
+SpeculativeStream runs the generation on a worker thread and
+AsyncSpeculativeStream on an asyncio task. The task is cancelled outright,
+but the worker thread can only notice a cancel between chunks: a sync
+stream cancelled during prefill runs until its first chunk arrives before
+the response is closed and its slot freed. Both feed speculation_stats,
+which counts committed/cancelled speculations and the work wasted on the
+cancelled ones.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class SpeculationStats:
+    """Outcome counters for speculative generations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.committed = 0
+        self.cancelled = 0
+        self.wasted_chunks = 0
+        self.wasted_ms = 0.0
+        self.hidden_routing_ms = 0.0
+
+    def record_start(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def record_commit(self, routing_ms: float) -> None:
+        with self._lock:
+            self.committed += 1
+            self.hidden_routing_ms += routing_ms
+
+    def record_cancel(self, chunks: int, elapsed_ms: float) -> None:
+        with self._lock:
+            self.cancelled += 1
+            self.wasted_chunks += chunks
+            self.wasted_ms += elapsed_ms
+        logger.info(
+            f"Speculative CHAT cancelled after {chunks} chunk(s), "
+            f"{elapsed_ms:.0f} ms of generation wasted"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "committed": self.committed,
+                "cancelled": self.cancelled,
+                "wasted_chunks": self.wasted_chunks,
+                "wasted_ms": round(self.wasted_ms, 1),
+                "hidden_routing_ms": round(self.hidden_routing_ms, 1),
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class SpeculativeStream:
+    """Runs a text-chunk iterator on a worker thread until committed or cancelled."""
+
+    def __init__(self, produce: Callable[[], Iterator[str]]):
+        self._produce = produce
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._cancelled = threading.Event()
+        self._chunks = 0
+        self._start = time.perf_counter()
+        speculation_stats.record_start()
+        self._thread = threading.Thread(
+            target=self._run, name="speculative-chat", daemon=True
+        )
+        self._thread.start()
+
+    def commit(self, routing_ms: float = 0.0) -> Iterator[str]:
+        """Yield the buffered chunks, then the rest as they are generated."""
+        speculation_stats.record_commit(routing_ms)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # No-op once the stream is done; on an early close the worker
+            # stops at its next chunk and closes the stream (and its slot)
+            self._cancelled.set()
+
+    def cancel(self) -> None:
+        """
+        Stop generating. The worker closes the stream when the next chunk
+        arrives; a blocking read (e.g. a long prefill) is not interrupted.
+        """
+        self._cancelled.set()
+        speculation_stats.record_cancel(
+            self._chunks, (time.perf_counter() - self._start) * 1000
+        )
+
+    def _run(self) -> None:
+        chunks = self._produce()
+        try:
+            for chunk in chunks:
+                if self._cancelled.is_set():
+                    break
+                self._chunks += 1
+                self._queue.put(chunk)
+        except Exception as e:
+            self._queue.put(e)
+        finally:
+            # Closing the generator closes the underlying HTTP response
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self._queue.put(_DONE)
+
+
+class AsyncSpeculativeStream:
+    """Async variant of SpeculativeStream; cancel() cancels the task outright."""
+
+    def __init__(self, produce: Callable[[], AsyncIterator[str]]):
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._chunks = 0
+        self._start = time.perf_counter()
+        speculation_stats.record_start()
+        self._task = asyncio.create_task(self._run(produce))
+
+    async def commit(self, routing_ms: float = 0.0) -> AsyncIterator[str]:
+        speculation_stats.record_commit(routing_ms)
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # No-op once the stream is done; on an early close this stops it
+            self._task.cancel()
+
+    def cancel(self) -> None:
+        self._task.cancel()
+        speculation_stats.record_cancel(
+            self._chunks, (time.perf_counter() - self._start) * 1000
+        )
+
+    async def _run(self, produce: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in produce():
+                self._chunks += 1
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._queue.put_nowait(e)
+        finally:
+            self._queue.put_nowait(_DONE)
@@ -0,0 +1,193 @@
+"""
+Per-request tool subsetting for the agent.
+
+Every tool schema bound to the agent is part of its prompt prefix, so each
+request pays prefill for all of them. ToolSelector scores the registered
+tools against the user input and returns the few that are relevant;
+ModalLoader.get_agent(tool_names) compiles (and caches) an agent per subset.
+
+Two scoring modes (settings.router.tool_selection_mode):
+
+- "keyword":   IDF-weighted overlap between the input's words and each tool's
+               name and description (name words count double);
+- "embedding": cosine similarity of HashingEmbedder vectors (needs numpy,
+               falls back to "keyword" without it).
+
+A tool is kept when it clears the minimum score and scores at least
+RELATIVE_CUTOFF of the best match. When nothing clears the minimum the full
+tool set is returned, so an unmatched request is never left without the
+tool it needed.
+"""
+
+import logging
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from get in into is it its of on or the "
+    "this to with without you your me my i do does please".split()
+)
+
+# Docstring sections that describe the call rather than the purpose
+_SKIP_SECTIONS = re.compile(r"^\s*(Returns|Raises|Examples?|Yields):", re.M)
+
+
+_SIBILANT_ES = ("ses", "xes", "zes", "ches", "shes")
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping; forms of one word only need to agree."""
+    if len(word) > 5 and word.endswith("ies"):
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            word = word[: -len(suffix)]
+            break
+    else:
+        if len(word) > 4 and word.endswith(_SIBILANT_ES):
+            word = word[:-2]  # classes -> class, matches -> match
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]  # files -> file
+    # file/files, cache/caches, change/changed all end up alike
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def _words(text: str) -> List[str]:
+    return [_stem(w) for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def _tool_text(tool_obj: Any) -> str:
+    description = getattr(tool_obj, "description", "") or ""
+    match = _SKIP_SECTIONS.search(description)
+    return description[: match.start()] if match else description
+
+
+class ToolSelector:
+    """Ranks tools by relevance to a user input."""
+
+    RELATIVE_CUTOFF = 0.3
+
+    # Default minimum score per mode (IDF-weighted hits vs cosine similarity)
+    MIN_SCORE = {"keyword": 0.5, "embedding": 0.15}
+
+    def __init__(
+        self,
+        tool_list: Sequence[Any],
+        max_tools: int = 3,
+        min_score: Optional[float] = None,
+        mode: str = "keyword",
+    ):
+        self.names = [t.name for t in tool_list]
+        self.max_tools = max_tools
+
+        # word -> {tool name: weight}; name words count double
+        self._index: Dict[str, Dict[str, float]] = {}
+        for tool_obj in tool_list:
+            name_words = set(_words(tool_obj.name.replace("_", " ")))
+            for word in name_words | set(_words(_tool_text(tool_obj))):
+                weight = 2.0 if word in name_words else 1.0
+                self._index.setdefault(word, {})[tool_obj.name] = weight
+
+        count = len(self.names)
+        self._idf = {
+            word: math.log(1 + count / len(tools))
+            for word, tools in self._index.items()
+        }
+
+        self._vectors = None
+        if mode == "embedding":
+            self._vectors = self._embed_tools(tool_list)
+        if self._vectors is None:
+            mode = "keyword"
+        self.min_score = self.MIN_SCORE[mode] if min_score is None else min_score
+
+    def scores(self, user_input: str) -> Dict[str, float]:
+        """Relevance score per tool (only tools with a non-zero score)."""
+        if self._vectors is not None:
+            vec = self._embedder.embed(user_input)
+            return {
+                name: float(sim)
+                for name, sim in zip(self.names, self._vectors @ vec)
+                if sim > 0
+            }
+
+        result: Dict[str, float] = {}
+        for word in set(_words(user_input)):
+            for name, weight in self._index.get(word, {}).items():
+                result[name] = result.get(name, 0.0) + weight * self._idf[word]
+        return result
+
+    def select(self, user_input: str) -> List[str]:
+        """Names of the most relevant tools, or every tool if none is relevant."""
+        scores = self.scores(user_input)
+        best = max(scores.values(), default=0.0)
+        if best < self.min_score:
+            return list(self.names)
+
+        cutoff = max(self.min_score, best * self.RELATIVE_CUTOFF)
+        ranked = sorted(
+            (name for name, score in scores.items() if score >= cutoff),
+            key=lambda name: -scores[name],
+        )
+        return sorted(ranked[: self.max_tools])
+
+    def _embed_tools(self, tool_list: Sequence[Any]):
+        from services.core.semantic_cache import HashingEmbedder, np
+
+        if np is None:
+            logger.info("numpy unavailable; tool selection falls back to keywords")
+            return None
+        self._embedder = HashingEmbedder(settings.cache.semantic_dim)
+        return np.stack(
+            [
+                self._embedder.embed(f"{t.name.replace('_', ' ')} {_tool_text(t)}")
+                for t in tool_list
+            ]
+        )
+
+
+_selector: Optional[ToolSelector] = None
+_selector_lock = threading.Lock()
+
+
+def get_tool_selector() -> Optional[ToolSelector]:
+    """Shared selector over the tool registry, or None when disabled."""
+    router_cfg = settings.router
+    if not router_cfg.tool_selection:
+        return None
+
+    global _selector
+    if _selector is None:
+        with _selector_lock:
+            if _selector is None:
+                import tools
+
+                _selector = ToolSelector(
+                    tools.get_all_tools(),
+                    max_tools=router_cfg.tool_selection_max_tools,
+                    min_score=router_cfg.tool_selection_min_score,
+                    mode=router_cfg.tool_selection_mode,
+                )
+    return _selector
+
+
+def select_tools(user_input: str) -> Optional[Set[str]]:
+    """Tool names for this input, or None to use the full agent."""
+    selector = get_tool_selector()
+    if selector is None:
+        return None
+    names = selector.select(user_input)
+    if len(names) == len(selector.names):
+        return None
+    logger.debug(f"Selected tools: {names}")
+    return set(names)
@@ -0,0 +1,115 @@
+"""
+Concurrent session multiplexing over one shared model connection.
+
+Every session gets its own AgentRuntime, but all of them share the LLM and
+compiled agent from ModalLoader (the agent is compiled on first use).
+Requests are admitted through two gates:
+
+- a per-session lock, so a session never has more than one request in flight
+  (turns stay ordered and one chatty user cannot queue many requests);
+- a global semaphore bounding in-flight model requests, so the local model
+  server stays saturated without an unbounded queue building up behind it.
+
+asyncio.Semaphore wakes waiters in FIFO order and each session contributes at
+most one waiter, so slots are handed out round-robin across sessions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+from config import settings
+from services.agent_runtime import AgentRuntime
+
+
+class SessionManager:
+    """Owns AgentRuntime instances and schedules their model requests."""
+
+    def __init__(
+        self,
+        llm: Any = None,
+        agent: Any = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        if llm is None:
+            from services.core.modal_loader import modal_loader
+
+            llm = modal_loader.get_llm()
+
+        self.llm = llm
+        self.agent = agent
+        self.max_in_flight = max_in_flight or settings.app.max_in_flight
+
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._sessions: Dict[str, AgentRuntime] = {}
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._in_flight = 0
+        self._waiting = 0
+
+    def open_session(
+        self, user: str = "Guest", session_id: Optional[str] = None
+    ) -> str:
+        """Create (or reuse) a session and return its id."""
+        session_id = session_id or str(uuid.uuid4())
+        if session_id not in self._sessions:
+            self._sessions[session_id] = AgentRuntime(
+                user=user, agent=self.agent, llm=self.llm, session_id=session_id
+            )
+            self._session_locks[session_id] = asyncio.Lock()
+        return session_id
+
+    def close_session(self, session_id: str) -> None:
+        """Forget a session."""
+        self._sessions.pop(session_id, None)
+        self._session_locks.pop(session_id, None)
+
+    def get_runtime(self, session_id: str) -> AgentRuntime:
+        """Get the runtime for an open session."""
+        runtime = self._sessions.get(session_id)
+        if runtime is None:
+            raise KeyError(f"Unknown session: {session_id}")
+        return runtime
+
+    async def arun(self, session_id: str, user_input: str) -> str:
+        """Run one turn for a session once a model slot is free."""
+        runtime = self.get_runtime(session_id)
+        async with self._session_locks[session_id]:
+            await self._acquire()
+            try:
+                return await runtime.arun(user_input)
+            finally:
+                self._release()
+
+    async def astream(self, session_id: str, user_input: str) -> AsyncIterator[str]:
+        """Stream one turn for a session; the slot is held until the stream ends."""
+        runtime = self.get_runtime(session_id)
+        async with self._session_locks[session_id]:
+            await self._acquire()
+            try:
+                async for chunk in runtime.astream(user_input):
+                    yield chunk
+            finally:
+                self._release()
+
+    def stats(self) -> Dict[str, int]:
+        """Current load snapshot."""
+        return {
+            "sessions": len(self._sessions),
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_in_flight": self.max_in_flight,
+        }
+
+    async def _acquire(self) -> None:
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
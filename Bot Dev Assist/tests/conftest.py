@@ -0,0 +1,40 @@
+"""
+Shared test setup.
+
+The app modules import each other as top-level packages (config, services,
+tools), so the app directory goes on sys.path. Tests run from a temporary
+working directory so the logs/ and data/ directories the services create
+never land in the checkout.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def _import_tools_package() -> None:
+    """
+    tools/__init__.py builds the agent's tool registry and imports every
+    tool module, including ones a checkout may not have. The modules under
+    test only need the package path, so fall back to a bare package.
+    """
+    try:
+        import tools  # noqa: F401
+    except ImportError:
+        package = types.ModuleType("tools")
+        package.__path__ = [os.path.join(APP_DIR, "tools")]
+        sys.modules["tools"] = package
+
+
+_import_tools_package()
+
+
+@pytest.fixture(autouse=True)
+def _run_in_tmp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
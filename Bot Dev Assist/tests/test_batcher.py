@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from services.core.batcher import MicroBatcher
+
+
+def _echo(text: str) -> str:
+    if text == "fail":
+        raise ValueError("bad input")
+    if text.startswith("sleep "):
+        time.sleep(float(text.split()[1]))
+    return f"echo {text}"
+
+
+@pytest.fixture
+def batcher():
+    batcher = MicroBatcher(RunnableLambda(_echo), max_batch_size=4, max_wait_ms=50)
+    yield batcher
+    batcher.close()
+
+
+def test_concurrent_requests_share_a_batch(batcher):
+    futures = [batcher.submit(f"q{i}") for i in range(4)]
+    assert [f.result(5) for f in futures] == [f"echo q{i}" for i in range(4)]
+
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["requests"] == 4
+    assert stats["max_batch_size"] == 4
+
+
+def test_batches_are_capped_at_max_batch_size(batcher):
+    futures = [batcher.submit(f"q{i}") for i in range(10)]
+    assert [f.result(5) for f in futures] == [f"echo q{i}" for i in range(10)]
+    stats = batcher.stats()
+    assert stats["max_batch_size"] == 4
+    assert stats["batches"] >= 3
+
+
+def test_errors_only_fail_their_own_request(batcher):
+    ok = batcher.submit("fine")
+    bad = batcher.submit("fail")
+    assert ok.result(5) == "echo fine"
+    with pytest.raises(ValueError, match="bad input"):
+        bad.result(5)
+
+
+def test_short_replies_do_not_wait_for_the_slowest(batcher):
+    start = time.perf_counter()
+    slow = batcher.submit("sleep 1.0")
+    fast = batcher.submit("sleep 0.05")
+    assert fast.result(5) == "echo sleep 0.05"
+    assert time.perf_counter() - start < 0.8
+    assert not slow.done()
+
+    # A new request is served while the slow batch is still in flight
+    assert batcher.invoke("next") == "echo next"
+    assert not slow.done()
+    assert slow.result(5) == "echo sleep 1.0"
+
+
+def test_ainvoke(batcher):
+    async def run():
+        return await asyncio.gather(*(batcher.ainvoke(f"a{i}") for i in range(3)))
+
+    assert asyncio.run(run()) == ["echo a0", "echo a1", "echo a2"]
+
+
+def test_closed_batcher_refuses_requests(batcher):
+    batcher.invoke("warm")
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
@@ -0,0 +1,77 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from services.core.budget import _PARTIAL_TOOL_CHARS, AgentBudget, partial_answer
+
+
+def _tool_call(name: str, call_id: str, **args) -> dict:
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+def _messages():
+    return [
+        HumanMessage(content="earlier question"),
+        AIMessage(content="", tool_calls=[_tool_call("old_tool", "0")]),
+        ToolMessage(content="old result", tool_call_id="0", name="old_tool"),
+        AIMessage(content="earlier answer"),
+        HumanMessage(content="read the log"),
+        AIMessage(
+            content="Reading the log first.",
+            tool_calls=[_tool_call("read_file", "1", path="app.log")],
+        ),
+        ToolMessage(content="x" * 2000, tool_call_id="1", name="read_file"),
+        AIMessage(content="", tool_calls=[_tool_call("grep", "2", pattern="ERR")]),
+        ToolMessage(content="12: ERROR boom", tool_call_id="2", name="grep"),
+    ]
+
+
+def test_partial_answer_covers_only_the_current_request():
+    answer = partial_answer("step limit (8) reached", _messages())
+
+    lines = answer.splitlines()
+    assert lines[0] == "(Stopped early: step limit (8) reached.)"
+    assert "Reading the log first." in lines
+    assert "- grep: 12: ERROR boom" in lines
+    assert "old result" not in answer and "earlier answer" not in answer
+
+
+def test_partial_answer_truncates_long_tool_results():
+    answer = partial_answer("time limit (1s) reached", _messages())
+    line = next(l for l in answer.splitlines() if l.startswith("- read_file:"))
+    assert line == f"- read_file: {'x' * _PARTIAL_TOOL_CHARS} ..."
+
+
+def test_partial_answer_prefers_the_last_model_text():
+    last = AIMessage(content="Found one error.", tool_calls=[])
+    answer = partial_answer("token limit (10) reached", _messages(), last)
+    assert "Found one error." in answer
+    assert "Reading the log first." not in answer
+
+
+def test_partial_answer_without_results():
+    answer = partial_answer("step limit (1) reached", [HumanMessage(content="hi")])
+    assert answer == "(Stopped early: step limit (1) reached.)"
+
+
+def test_budget_stops_on_repeated_calls():
+    budget = AgentBudget(max_repeats=1)
+    call = _tool_call("read_file", "1", path="a.txt")
+    assert budget.repeated([call]) is None
+    assert "repeated call to read_file" in budget.repeated([dict(call, id="2")])
+
+
+def test_budget_limits():
+    budget = AgentBudget(max_steps=2, max_tokens=1000)
+    assert budget.exhausted() is None
+    budget.record(AIMessage(content="a", usage_metadata=_usage(600)))
+    assert budget.exhausted() is None
+    budget.record(AIMessage(content="b", usage_metadata=_usage(600)))
+    assert budget.exhausted() == "step limit (2) reached"
+    assert budget.recursion_limit == 7
+
+
+def _usage(output_tokens: int) -> dict:
+    return {
+        "input_tokens": 0,
+        "output_tokens": output_tokens,
+        "total_tokens": output_tokens,
+    }
@@ -0,0 +1,170 @@
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config import settings
+from services.core import code_metrics
+from services.core.code_metrics import analyze_files, analyze_source, analyze_tree
+from tools.analyze_code import analyze_code, summarize_file
+
+_SAMPLE = textwrap.dedent("""
+    import os
+    import json
+    from typing import *
+
+
+    class Store:
+        def load(self, path, cache={}):
+            # TODO: stream large files
+            try:
+                with open(path) as f:
+                    return eval(f.read())
+            except:
+                return None
+
+
+    def pick(items):
+        for item in items:
+            if item and os.path.exists(item):
+                return item
+        return None
+    """)
+
+_DEEP = "x = " + "-" * 5000 + "1\n"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.app, "analysis_cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(code_metrics, "_cache", None)
+
+
+def _smells(result):
+    return {(kind, detail) for _, kind, detail in result["smells"]}
+
+
+def test_analyze_source_metrics():
+    result = analyze_source(_SAMPLE)
+
+    functions = {f["name"]: f for f in result["functions"]}
+    assert set(functions) == {"Store.load", "pick"}
+    assert functions["pick"]["complexity"] == 4
+    assert functions["Store.load"]["args"] == 2  # self not counted
+    assert result["classes"] == 1
+    assert result["imports"] == ["json", "os", "typing"]
+    assert result["todos"] == [[9, "TODO: stream large files"]]
+
+    kinds = {kind for kind, _ in _smells(result)}
+    assert {"bare-except", "mutable-default", "eval-exec", "star-import"} <= kinds
+    assert ("unused-import", "json") in _smells(result)
+    assert ("unused-import", "os") not in _smells(result)
+
+
+def test_package_reexports_are_not_unused():
+    result = analyze_source("from .core import run\n", is_package=True)
+    assert not result["smells"]
+
+
+@pytest.mark.parametrize(
+    "source, error",
+    [
+        ("def broken(:\n", "SyntaxError"),
+        (_DEEP, "RecursionError"),
+        ("x = " + "-" * 900 + "1\n", "RecursionError"),
+    ],
+    ids=["syntax", "deep-parse", "deep-visit"],
+)
+def test_unparsable_source_is_an_error_result(source, error):
+    result = analyze_source(source)
+    assert result["error"].startswith(error)
+    assert result["lines"] == 1
+
+
+def _write_tree(root, count):
+    for i in range(count):
+        (root / f"mod{i}.py").write_text(f"def f{i}(a):\n    return a + {i}\n")
+
+
+def test_analyze_files_caches_results(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_tree(src, 3)
+    first = list(analyze_files(str(src), ["mod0.py", "mod1.py", "mod2.py"]))
+    assert [r["path"] for r in first] == ["mod0.py", "mod1.py", "mod2.py"]
+
+    calls = []
+    original = code_metrics.analyze_source
+    code_metrics.analyze_source = lambda *a: calls.append(a) or original(*a)
+    try:
+        second = list(analyze_files(str(src), ["mod0.py", "mod1.py", "mod2.py"]))
+    finally:
+        code_metrics.analyze_source = original
+    assert calls == []
+    assert [r["functions"] for r in second] == [r["functions"] for r in first]
+
+
+def test_one_bad_file_does_not_end_a_pooled_scan(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_tree(src, 12)
+    (src / "deep.py").write_text(_DEEP)
+    (src / "zz_boom.py").write_text("boom = 1\n")
+
+    # Thread pool in place of the process pool, so the patched job applies
+    pool = ThreadPoolExecutor(2)
+    monkeypatch.setattr(code_metrics, "_get_pool", lambda: pool)
+    original = code_metrics._analyze_job
+
+    def job(text, is_package):
+        if text.startswith("boom"):
+            raise RuntimeError("worker failed")
+        return original(text, is_package)
+
+    monkeypatch.setattr(code_metrics, "_analyze_job", job)
+    # The first misses are parsed inline; the bad files go to the pool
+    paths = [f"mod{i}.py" for i in range(12)] + ["deep.py", "zz_boom.py"]
+    try:
+        results = {r["path"]: r for r in analyze_files(str(src), paths)}
+    finally:
+        pool.shutdown()
+
+    assert len(results) == 14
+    assert results["deep.py"]["error"].startswith("RecursionError")
+    assert "worker failed" in results["zz_boom.py"]["error"]
+    assert results["mod11.py"]["functions"][0]["name"] == "f11"
+
+
+def test_analyze_tree_on_the_process_pool(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    _write_tree(src, 12)
+    (src / "deep.py").write_text(_DEEP)
+    try:
+        results = {r["path"]: r for r in analyze_tree(str(src))}
+    finally:
+        code_metrics._reset_pool()
+    assert len(results) == 13
+    assert results["deep.py"]["error"].startswith("RecursionError")
+
+
+def test_analyze_code_tool(tmp_path):
+    path = tmp_path / "store.py"
+    path.write_text(_SAMPLE)
+
+    report = analyze_code.invoke({"file_path": str(path)})
+    assert report.startswith(f"{path}: ")
+    assert "bare-except" in report and "TODOs (1):" in report
+
+    tree_report = analyze_code.invoke({"file_path": str(tmp_path)})
+    assert "1 Python files" in tree_report
+    assert "Store.load" in tree_report or "pick" in tree_report
+
+    assert analyze_code.invoke({"file_path": str(tmp_path / "missing.py")}).startswith(
+        "File not found"
+    )
+
+
+def test_summarize_file_reports_errors():
+    report = summarize_file({"path": "bad.py", "lines": 1, "error": "SyntaxError: x"})
+    assert report == "bad.py: 1 lines\nCould not analyze: SyntaxError: x"
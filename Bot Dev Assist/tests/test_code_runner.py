@@ -0,0 +1,100 @@
+import pytest
+
+from tools.code_runner import CodeRunner
+
+
+@pytest.fixture
+def runner():
+    runner = CodeRunner(workers=1, max_jobs=3, timeout=5.0, output_limit=200)
+    yield runner
+    runner.close()
+
+
+def _worker_pid(runner: CodeRunner):
+    worker = runner._idle.get()
+    runner._idle.put(worker)
+    return worker.proc.pid if worker is not None else None
+
+
+def test_runs_code_and_streams_output(runner):
+    seen = []
+    result = runner.run(
+        "import sys\nprint('hello')\nprint('oops', file=sys.stderr)",
+        on_output=lambda kind, text: seen.append(kind),
+    )
+    assert result.ok
+    assert result.stdout == "hello\n"
+    assert result.stderr == "oops\n"
+    assert seen == ["out", "err"]
+
+
+def test_errors_are_reported(runner):
+    result = runner.run("1 / 0")
+    assert not result.ok
+    assert "ZeroDivisionError" in result.stderr
+    assert 'File "<code>"' in result.stderr
+
+
+def test_output_is_capped(runner):
+    result = runner.run("print('x' * 1000)")
+    assert result.truncated
+    assert len(result.stdout) == 200
+    assert result.format().endswith("[Output truncated]")
+
+
+def test_timeout_kills_and_replaces_the_worker(runner):
+    runner.run("pass")
+    pid = _worker_pid(runner)
+
+    result = runner.run("while True: pass", timeout=0.5)
+    assert result.timed_out and not result.ok
+    assert result.format() == "[Execution timed out]"
+    assert _worker_pid(runner) is None
+
+    assert runner.run("print(2 + 2)").stdout == "4\n"
+    assert _worker_pid(runner) not in (None, pid)
+
+
+def test_worker_is_recycled_after_max_jobs(runner):
+    runner.run("pass")
+    pid = _worker_pid(runner)
+    runner.run("pass")
+    assert _worker_pid(runner) == pid
+    runner.run("pass")
+    assert _worker_pid(runner) is None
+
+
+def test_environment_and_path_are_restored(runner):
+    runner.run("import os, sys\nos.environ['LEAK'] = '1'\nsys.path.append('/leak')")
+    pid = _worker_pid(runner)
+    result = runner.run(
+        "import os, sys\nprint(os.environ.get('LEAK'), '/leak' in sys.path)"
+    )
+    assert result.stdout == "None False\n"
+    assert _worker_pid(runner) == pid
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import json\njson.dumps = lambda *a, **k: 'patched'",
+        "import builtins\nbuiltins.len = lambda x: 0",
+        "import csv",
+        "import threading, time\n"
+        "threading.Thread(target=time.sleep, args=(2,), daemon=True).start()",
+    ],
+)
+def test_jobs_that_change_shared_state_get_a_new_worker(runner, code):
+    runner.run("pass")
+    result = runner.run(code)
+    assert result.ok
+    assert _worker_pid(runner) is None
+    assert runner.run("import json\nprint(json.dumps([len([1])]))").stdout == "[1]\n"
+
+
+def test_closed_runner_refuses_jobs():
+    runner = CodeRunner(workers=1)
+    runner.run("pass")
+    runner.close()
+    with pytest.raises(RuntimeError):
+        runner.run("pass")
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from tools.code_search import CodeIndex, _IgnoreRules, iter_files
+
+
+def _write(root, rel_path: str, text: str = "") -> None:
+    path = os.path.join(str(root), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _rules(root, text: str, rel_dir: str = "") -> _IgnoreRules:
+    _write(root, os.path.join(rel_dir, ".gitignore"), text)
+    rules = _IgnoreRules()
+    rules.load(str(root), rel_dir)
+    return rules
+
+
+def test_anchored_pattern_only_matches_at_its_base(tmp_path):
+    rules = _rules(tmp_path, "/build\n")
+    assert rules.ignored("build", True)
+    assert not rules.ignored("src/build", True)
+
+
+def test_unanchored_pattern_matches_at_any_depth(tmp_path):
+    rules = _rules(tmp_path, "build/\n*.log\n")
+    assert rules.ignored("build", True)
+    assert rules.ignored("src/build", True)
+    assert not rules.ignored("src/build", False)
+    assert rules.ignored("a/b/debug.log", False)
+
+
+def test_star_does_not_cross_directories(tmp_path):
+    rules = _rules(tmp_path, "docs/*.md\n")
+    assert rules.ignored("docs/intro.md", False)
+    assert not rules.ignored("docs/api/intro.md", False)
+
+
+def test_double_star_spans_directories(tmp_path):
+    rules = _rules(tmp_path, "**/gen/*.py\nout/**\n")
+    assert rules.ignored("gen/a.py", False)
+    assert rules.ignored("x/y/gen/a.py", False)
+    assert rules.ignored("out/a/b.txt", False)
+    assert not rules.ignored("out", True)
+
+
+def test_nested_gitignore_is_relative_to_its_directory(tmp_path):
+    rules = _rules(tmp_path, "/tmp\n", rel_dir="pkg")
+    assert rules.ignored("pkg/tmp", True)
+    assert not rules.ignored("tmp", True)
+    assert not rules.ignored("pkg/sub/tmp", True)
+
+
+def test_negation_and_character_classes(tmp_path):
+    rules = _rules(tmp_path, "*.py[co]\n!keep.pyc\n")
+    assert rules.ignored("a.pyc", False)
+    assert rules.ignored("a.pyo", False)
+    assert not rules.ignored("a.py", False)
+    assert not rules.ignored("keep.pyc", False)
+
+
+def test_iter_files_skips_ignored_and_large_files(tmp_path):
+    _write(tmp_path, ".gitignore", "/build\n")
+    _write(tmp_path, "build/out.py", "x = 1\n")
+    _write(tmp_path, "src/build/keep.py", "x = 1\n")
+    _write(tmp_path, ".git/config", "")
+    _write(tmp_path, "big.txt", "x" * 100)
+    files = {path for path, _, _ in iter_files(str(tmp_path), max_bytes=50)}
+    assert files == {".gitignore", "src/build/keep.py"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    root = tmp_path / "project"
+    _write(root, "app/server.py", "def handle_request(req):\n    return req\n")
+    _write(root, "app/util.py", "LIMIT = 10\n\nprint(handle_request(LIMIT))\n")
+    idx = CodeIndex(str(root), str(tmp_path / "index.sqlite"), rescan_seconds=60)
+    yield idx
+    idx.close()
+
+
+def test_search_ranks_definitions_first(index):
+    hits = index.search("handle_request")
+    assert [(h.path, h.line, h.kind) for h in hits] == [
+        ("app/server.py", 1, "def:def"),
+        ("app/util.py", 3, "match"),
+    ]
+    assert hits[0].text.startswith("def handle_request")
+
+
+def test_refresh_reindexes_only_changed_files(index):
+    assert index.refresh(force=True) == {"files": 2, "indexed": 2, "removed": 0}
+    assert index.refresh() == {}
+    assert index.refresh(force=True) == {"files": 2, "indexed": 0, "removed": 0}
+
+    _write(index.root, "app/util.py", "def limit_for(user):\n    pass\n")
+    os.remove(os.path.join(index.root, "app/server.py"))
+    assert index.refresh(force=True) == {"files": 1, "indexed": 1, "removed": 1}
+    assert [h.path for h in index.search("limit_for")] == ["app/util.py"]
+    assert index.search("handle_request") == []
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tools import error_handling
+from tools.error_handling import ToolExecutor
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Tool calls are fake: "sleep" sleeps, "hang" blocks until teardown."""
+    hung = threading.Event()
+
+    def execute(call):
+        if call["name"] == "hang":
+            hung.wait(10)
+        elif call["name"] == "sleep":
+            time.sleep(call["arguments"]["seconds"])
+        return f"{call['name']} done"
+
+    monkeypatch.setattr(ToolExecutor, "execute", staticmethod(execute))
+    monkeypatch.setattr(error_handling, "_pool", None)
+    yield hung
+    hung.set()
+
+
+def _sleep(seconds: float) -> dict:
+    return {"name": "sleep", "arguments": {"seconds": seconds}}
+
+
+def test_results_keep_call_order(release):
+    calls = [_sleep(0.1), {"name": "echo"}, _sleep(0.05)]
+    assert ToolExecutor.execute_many(calls) == [
+        "sleep done",
+        "echo done",
+        "sleep done",
+    ]
+
+
+def test_timeout_counts_from_when_a_call_starts(release, monkeypatch):
+    monkeypatch.setattr(error_handling, "MAX_TOOL_WORKERS", 1)
+    # One worker: the second call starts after 0.3s and ends after 0.6s,
+    # past a deadline counted from submission but within its own timeout
+    results = ToolExecutor.execute_many([_sleep(0.3), _sleep(0.3)], timeout=0.5)
+    assert results == ["sleep done", "sleep done"]
+
+
+def test_hung_call_retires_the_pool(release, monkeypatch):
+    monkeypatch.setattr(error_handling, "MAX_TOOL_WORKERS", 1)
+    pool = error_handling._tool_pool()
+    # The quick call is queued behind the hung one and moves to the new pool
+    results = ToolExecutor.execute_many(
+        [{"name": "hang"}, {"name": "echo"}], timeout=0.2
+    )
+    assert results[0] == "❌ Tool 'hang' timed out after 0.2s"
+    assert results[1] == "echo done"
+    assert error_handling._pool is not pool
+
+    assert ToolExecutor.execute_many([{"name": "echo"}] * 2) == ["echo done"] * 2
+
+
+def test_async_variant(release, monkeypatch):
+    monkeypatch.setattr(error_handling, "MAX_TOOL_WORKERS", 1)
+    results = asyncio.run(
+        ToolExecutor.aexecute_many(
+            [{"name": "hang"}, _sleep(0.05), {"name": "echo"}], timeout=0.2
+        )
+    )
+    assert results == [
+        "❌ Tool 'hang' timed out after 0.2s",
+        "sleep done",
+        "echo done",
+    ]
@@ -0,0 +1,98 @@
+import re
+
+import pytest
+
+from services.core.history import count_tokens
+from tools.file_reader import BinaryFileError, grep, head, read_range, tail
+
+_CURSOR = re.compile(
+    r"\n\[Truncated at byte (\d+) of (\d+)\. Continue with offset=\1\]$"
+)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.log"
+    lines = [
+        f"line {i:04d} {'ERROR' if i % 100 == 0 else 'ok'}" for i in range(1, 1001)
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path), lines
+
+
+def test_read_range_pages_through_the_whole_file(log_file):
+    path, lines = log_file
+    pages, offset = [], 0
+    while True:
+        page = read_range(path, offset=offset, max_tokens=200)
+        match = _CURSOR.search(page)
+        if match is None:
+            pages.append(page)
+            break
+        pages.append(page[: match.start()])
+        assert int(match.group(1)) > offset
+        offset = int(match.group(1))
+    assert "\n".join(pages).splitlines() == lines
+    assert len(pages) > 1
+
+
+def test_read_range_stays_within_budget(log_file):
+    path, _ = log_file
+    page = read_range(path, line=500, max_tokens=100)
+    assert page.startswith("line 0500 ")
+    body = _CURSOR.sub("", page)
+    assert count_tokens(body) <= 100
+
+
+def test_read_range_past_the_end(log_file):
+    path, _ = log_file
+    assert read_range(path, offset=10**9).startswith("[End of file")
+
+
+def test_head_and_tail(log_file):
+    path, lines = log_file
+    assert head(path, count=3, max_tokens=1000).splitlines()[:3] == lines[:3]
+    result = tail(path, count=3, max_tokens=1000)
+    assert result.splitlines()[-3:] == lines[-3:]
+    assert result.startswith("[From byte ")
+
+
+def test_tail_of_a_small_file_has_no_marker(tmp_path):
+    path = tmp_path / "small.txt"
+    path.write_text("a\nb\n", encoding="utf-8")
+    assert tail(str(path), count=10) == "a\nb"
+
+
+def test_grep_numbers_lines_and_resumes_from_offset(log_file):
+    path, _ = log_file
+    result = grep(path, "ERROR", max_tokens=1000)
+    assert result.splitlines()[:2] == ["100: line 0100 ERROR", "200: line 0200 ERROR"]
+
+    offset = len("\n".join(f"line {i:04d} ok" for i in range(1, 451)).encode())
+    resumed = grep(path, "ERROR", offset=offset, max_tokens=1000)
+    assert resumed.splitlines()[0] == "500: line 0500 ERROR"
+
+
+@pytest.mark.parametrize("mode", ["read_range", "head", "tail", "grep"])
+def test_one_huge_line_is_cut_to_budget(tmp_path, mode):
+    path = tmp_path / "minified.js"
+    path.write_text("var a=1;" * 100_000 + "needle" + "var b=2;" * 100_000)
+    if mode == "read_range":
+        result = _CURSOR.sub("", read_range(str(path), max_tokens=50))
+    elif mode == "head":
+        result = _CURSOR.sub("", head(str(path), max_tokens=50))
+    elif mode == "tail":
+        result = re.sub(
+            r"^\[From byte \d+ of \d+\]\n", "", tail(str(path), max_tokens=50)
+        )
+    else:
+        result = grep(str(path), "needle", max_tokens=50)
+        assert "needle" in result
+    assert 0 < count_tokens(result) <= 50
+
+
+def test_binary_files_are_refused(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"\x00\x01\x02" * 100)
+    with pytest.raises(BinaryFileError):
+        read_range(str(path))
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from services.core import history
+from services.core.history import (
+    SUMMARY_PREFIX,
+    ConversationHistory,
+    TokenCounter,
+    truncate_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """chars/4 token counts, whatever tokenizers are installed."""
+    counter = object.__new__(TokenCounter)
+    counter.backend = "estimate"
+    counter._encode = None
+    monkeypatch.setattr(history, "_counter", counter)
+
+
+def _turn(n: int):
+    return (f"question {n} " + "x" * 40, f"answer {n} " + "y" * 40)
+
+
+def _history(budget: int = 60, **kwargs) -> ConversationHistory:
+    h = ConversationHistory(budget=budget, **kwargs)
+    for n in range(4):
+        h.add_turn(*_turn(n))
+    return h
+
+
+def test_window_keeps_the_latest_turns_within_budget():
+    h = _history()
+    messages = h.window("new")
+    assert messages[-1] == {"role": "user", "content": "new"}
+    assert [m["content"] for m in messages[:-1]] == [*_turn(3)]
+    assert h.turns == [_turn(3)]
+
+
+def test_evicted_turns_are_summarized():
+    seen = []
+
+    def summarize(turns, previous):
+        seen.append((list(turns), previous))
+        return "s1"
+
+    h = _history(summarizer=summarize)
+    messages = h.window("new")
+    assert seen == [([_turn(0), _turn(1), _turn(2)], "")]
+    assert messages[0] == {"role": "system", "content": SUMMARY_PREFIX + "s1"}
+    assert h.summary == "s1"
+
+
+def test_failed_summary_keeps_the_turns_for_next_time():
+    calls = []
+
+    def summarize(turns, previous):
+        calls.append(list(turns))
+        if len(calls) == 1:
+            raise RuntimeError("model down")
+        return "summary"
+
+    h = _history(summarizer=summarize)
+    h.window("first")
+    assert h.summary == ""
+
+    h.add_turn(*_turn(4))
+    h.add_turn(*_turn(5))
+    h.window("second")
+    assert calls[1][:3] == [_turn(0), _turn(1), _turn(2)]
+    assert _turn(3) in calls[1]
+    assert h.summary == "summary"
+
+
+def test_async_failed_summary_keeps_the_turns():
+    calls = []
+
+    async def asummarize(turns, previous):
+        calls.append(list(turns))
+        if len(calls) == 1:
+            raise RuntimeError("model down")
+        return "summary"
+
+    h = _history(asummarizer=asummarize)
+    asyncio.run(h.awindow("first"))
+    h.add_turn(*_turn(4))
+    asyncio.run(h.awindow("second"))
+    assert calls[1][:4] == [_turn(0), _turn(1), _turn(2), _turn(3)]
+    assert h.summary == "summary"
+
+
+def test_load_rebuilds_turns_and_summary():
+    h = ConversationHistory(budget=1000)
+    h.load(
+        [
+            {"role": "system", "content": SUMMARY_PREFIX + "earlier"},
+            {"role": "user", "content": "q1"},
+            {"role": "assistant", "content": "", "tool_calls": [{"id": "1"}]},
+            {"role": "tool", "content": "result"},
+            {"role": "assistant", "content": "a1"},
+            {"role": "user", "content": "q2"},
+        ]
+    )
+    assert h.summary == "earlier"
+    assert h.turns == [("q1", "a1")]
+
+
+def test_truncate_tokens_keeps_both_ends():
+    text = "start " + "z" * 400 + " end"
+    cut = truncate_tokens(text, 40)
+    assert cut.startswith("start") and cut.endswith("end")
+    assert history.count_tokens(cut) <= 40
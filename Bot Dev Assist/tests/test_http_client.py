@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.core.http_client import (
+    get_async_http_client,
+    get_http_client,
+    recent_timings,
+    timing_stats,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_client_reuses_connections_and_records_timings(server_url):
+    client = get_http_client()
+    assert client is get_http_client()
+    before = len(recent_timings())
+
+    for _ in range(3):
+        assert client.get(f"{server_url}/health").json() == {"ok": True}
+
+    timings = recent_timings()[before:]
+    assert len(timings) == 3
+    assert all(t["status"] == 200 and t["total_ms"] is not None for t in timings)
+    assert timings[0]["url"].endswith("/health")
+    # Later requests ride the kept-alive connection
+    assert timings[1]["connect_ms"] == 0.0 and timings[2]["connect_ms"] == 0.0
+    assert timing_stats()["requests"] >= 3
+
+
+def test_async_client_works_across_event_loops(server_url):
+    client = get_async_http_client()
+
+    async def fetch_twice():
+        first = await client.get(f"{server_url}/a")
+        second = await client.get(f"{server_url}/b")
+        return first.json(), second.json()
+
+    # Each asyncio.run() is a new loop; the second must not reuse the
+    # first loop's connections
+    assert asyncio.run(fetch_twice()) == ({"ok": True}, {"ok": True})
+    assert asyncio.run(fetch_twice()) == ({"ok": True}, {"ok": True})
+
+
+def test_async_client_on_another_threads_loop(server_url):
+    client = get_async_http_client()
+    results = []
+
+    def run():
+        results.append(asyncio.run(client.get(f"{server_url}/c")).status_code)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(10)
+    assert results == [200]
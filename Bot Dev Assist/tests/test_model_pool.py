@@ -0,0 +1,193 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from services.core.modal_loader import Backend, ModalLoader, ModelPool, PooledChatModel
+
+
+class _StubServer:
+    """OpenAI-compatible endpoint answering with its own name (or a 500)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = 200
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._reply(stub.status, {"object": "list", "data": []})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                stub.requests += 1
+                self._reply(
+                    stub.status,
+                    {
+                        "id": "chatcmpl-1",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": "stub",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": stub.name},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                    },
+                )
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload if status == 200 else {"error": {}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/v1"
+        threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _dead_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+@pytest.fixture
+def servers():
+    started = [_StubServer("a"), _StubServer("b")]
+    yield started
+    for server in started:
+        server.close()
+
+
+def _pool(*urls: str) -> ModelPool:
+    backends = [
+        Backend(url, ModalLoader._chat_model(url, max_retries=0)) for url in urls
+    ]
+    # Long interval: the health thread never probes during a test
+    return ModelPool(backends, eject_seconds=30.0, health_interval=60.0)
+
+
+def _first(pool: ModelPool, backend: Backend) -> None:
+    """Make backend the least busy one, so the next request goes there."""
+    for other in pool.backends:
+        if other is not backend:
+            other.outstanding += 1
+
+
+def _restore(pool: ModelPool, backend: Backend) -> None:
+    for other in pool.backends:
+        if other is not backend:
+            other.outstanding -= 1
+
+
+def test_acquire_prefers_least_outstanding(servers):
+    pool = _pool(servers[0].url, servers[1].url)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+
+    pool.release(first)
+    assert pool.acquire() is first
+    assert pool.acquire(exclude=[first.url, second.url]) is None
+
+
+def test_requests_are_spread_over_backends(servers):
+    llm = PooledChatModel(pool=_pool(servers[0].url, servers[1].url))
+    answers = {llm.invoke("hi").content for _ in range(4)}
+    assert answers == {"a", "b"}
+    assert all(s.requests == 2 for s in servers)
+
+
+def test_fails_over_from_a_dead_backend_and_ejects_it(servers):
+    pool = _pool(_dead_url(), servers[0].url)
+    dead = pool.backends[0]
+    _first(pool, dead)
+    try:
+        assert PooledChatModel(pool=pool).invoke("hi").content == "a"
+    finally:
+        _restore(pool, dead)
+
+    assert dead.failures == 1 and not dead.healthy
+    assert all(b.outstanding == 0 for b in pool.backends)
+    # The ejected backend is skipped while another one is healthy
+    assert pool.acquire() is pool.backends[1]
+
+
+def test_fails_over_on_server_error(servers):
+    servers[0].status = 500
+    pool = _pool(servers[0].url, servers[1].url)
+    broken = pool.backends[0]
+    _first(pool, broken)
+    try:
+        assert PooledChatModel(pool=pool).invoke("hi").content == "b"
+    finally:
+        _restore(pool, broken)
+    assert servers[0].requests == 1
+    assert not broken.healthy
+
+
+def test_async_generate_fails_over(servers):
+    pool = _pool(_dead_url(), servers[1].url)
+    dead = pool.backends[0]
+    _first(pool, dead)
+    try:
+        result = asyncio.run(PooledChatModel(pool=pool).ainvoke("hi"))
+    finally:
+        _restore(pool, dead)
+    assert result.content == "b"
+    assert not dead.healthy
+
+
+def test_raises_when_every_backend_fails(servers):
+    servers[0].status = 500
+    pool = _pool(_dead_url(), servers[0].url)
+    with pytest.raises((openai.APIConnectionError, openai.InternalServerError)):
+        PooledChatModel(pool=pool).invoke("hi")
+    assert not any(b.healthy for b in pool.backends)
+
+
+def test_probe_readmits_a_recovered_backend(servers):
+    servers[0].status = 500
+    pool = _pool(servers[0].url, servers[1].url)
+    backend = pool.backends[0]
+    pool.release(pool.acquire(exclude=[servers[1].url]), RuntimeError("boom"))
+    assert not backend.healthy
+
+    assert pool.probe(backend) is False
+    assert not backend.healthy
+
+    servers[0].status = 200
+    assert pool.probe(backend) is True
+    assert backend.healthy
+    assert pool.check_all() is True
+
+
+def test_all_ejected_still_serves_the_one_due_back_first(servers):
+    pool = _pool(servers[0].url, servers[1].url)
+    first, second = pool.backends
+    pool.release(pool.acquire(exclude=[second.url]), RuntimeError("down"))
+    pool.release(pool.acquire(exclude=[first.url]), RuntimeError("down"))
+    assert pool.acquire() is first
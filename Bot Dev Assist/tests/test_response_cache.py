@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.core import response_cache
+from services.core.response_cache import MemoryBackend, ResponseCache, SQLiteBackend
+
+
+@pytest.fixture
+def disk(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"), max_entries=2, ttl=60.0)
+    yield backend
+    backend._conn.close()
+
+
+def _accessed(backend: SQLiteBackend, key: str) -> float:
+    return backend._conn.execute(
+        "SELECT accessed FROM responses WHERE key = ?", (key,)
+    ).fetchone()[0]
+
+
+def _set_accessed(backend: SQLiteBackend, key: str, when: float) -> None:
+    backend._conn.execute(
+        "UPDATE responses SET accessed = ? WHERE key = ?", (when, key)
+    )
+    backend._conn.commit()
+
+
+def test_disk_round_trip_and_expiry(disk, monkeypatch):
+    disk.put("k", "v")
+    assert disk.get("k") == "v"
+    assert disk.get("missing") is None
+
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert disk.get("k") is None
+    assert disk._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_recent_hits_do_not_write(disk):
+    disk.put("k", "v")
+    before = _accessed(disk, "k")
+
+    writes = []
+    disk._conn.set_trace_callback(writes.append)
+    assert disk.get("k") == "v"
+    assert not [s for s in writes if s.startswith(("UPDATE", "COMMIT"))]
+    assert _accessed(disk, "k") == before
+
+
+def test_stale_access_time_is_refreshed(disk):
+    disk.put("k", "v")
+    _set_accessed(disk, "k", 0.0)
+    assert disk.get("k") == "v"
+    assert _accessed(disk, "k") > 0.0
+
+
+def test_trim_keeps_the_most_recently_used(disk, monkeypatch):
+    monkeypatch.setattr(SQLiteBackend, "_EVICT_EVERY", 3)
+    disk.put("a", "1")
+    disk.put("b", "2")
+    _set_accessed(disk, "a", 1.0)
+    _set_accessed(disk, "b", 0.0)
+    disk.get("b")  # stale, so the hit counts as a use
+    disk.put("c", "3")
+    keys = {k for (k,) in disk._conn.execute("SELECT key FROM responses")}
+    assert keys == {"b", "c"}
+
+
+def test_disk_hit_is_promoted_to_memory(disk):
+    memory = MemoryBackend(max_entries=10, ttl=60.0)
+    cache = ResponseCache([memory, disk])
+    disk.put("k", "v")
+    assert cache.get("k") == "v"
+    assert memory.get("k") == "v"
+    assert cache.get("k") == "v"
+    assert cache.get("other") is None
+    assert cache.stats() == {
+        "hits": {"memory": 1, "disk": 1},
+        "misses": 1,
+        "hit_rate": 0.667,
+    }
+
+
+def test_async_chat_looks_up_the_cache_off_the_event_loop(monkeypatch):
+    from services.agent_runtime import AgentRuntime
+
+    threads = []
+
+    def lookup(self, user_input):
+        threads.append(threading.current_thread())
+        return "cached answer"
+
+    monkeypatch.setattr(AgentRuntime, "_cache_lookup", lookup)
+    runtime = AgentRuntime(llm=object(), use_response_cache=True)
+    runtime._batcher = None
+
+    assert asyncio.run(runtime._arun_llm_only("hi")) == "cached answer"
+    assert threads and threads[0] is not threading.main_thread()
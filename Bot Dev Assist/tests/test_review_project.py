@@ -0,0 +1,110 @@
+import pytest
+
+from config import settings
+from services.core import code_metrics
+from services.core.history import count_tokens
+from tools.review_project import ProjectRollup, review_project
+
+
+def _function(name, line, complexity, length=5):
+    return {
+        "name": name,
+        "line": line,
+        "length": length,
+        "complexity": complexity,
+        "args": 1,
+        "depth": 1,
+    }
+
+
+def _result(path, functions, smells=()):
+    return {
+        "path": path,
+        "lines": 100,
+        "code_lines": 80,
+        "classes": 1,
+        "imports": [],
+        "todos": [],
+        "functions": functions,
+        "smells": list(smells),
+    }
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.app, "analysis_cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(code_metrics, "_cache", None)
+
+
+def test_rollup_aggregates_modules_and_keeps_top_hotspots():
+    rollup = ProjectRollup(top_n=2)
+    rollup.add(
+        _result("pkg/a.py", [_function("easy", 1, 1), _function("hard", 10, 15)])
+    )
+    rollup.add(
+        _result(
+            "pkg/b.py",
+            [_function("mid", 1, 8)],
+            smells=[[2, "bare-except", "except:"]],
+        )
+    )
+    rollup.add(_result("tools/c.py", [_function("tiny", 1, 2)]))
+    rollup.add({"path": "bad.py", "lines": 3, "error": "SyntaxError: x"})
+
+    assert (rollup.files, rollup.lines, rollup.functions) == (4, 303, 4)
+    assert [s["name"] for s in rollup.hotspots] == ["hard", "mid"]
+    assert rollup.hotspots[1]["smells"] == ["bare-except"]
+    assert rollup.modules["pkg"].files == 2
+    assert rollup.modules["pkg"].worst == (15, "a.py hard")
+    assert rollup.errors == ["bad.py: SyntaxError: x"]
+
+
+def test_report_fits_the_budget_most_important_first(tmp_path):
+    rollup = ProjectRollup(top_n=5)
+    for i in range(40):
+        rollup.add(_result(f"m{i}/f.py", [_function(f"fn{i}", 1, i)]))
+
+    small = rollup.report(str(tmp_path), max_tokens=120)
+    assert count_tokens(small) <= 120
+    assert small.startswith(f"Project review of {tmp_path}: 40 Python files")
+    assert "Hot spots:" in small
+
+    large = rollup.report(str(tmp_path), max_tokens=4000)
+    assert "Modules (most issues first):" in large
+    assert large.index("Hot spots:") < large.index("Modules")
+
+
+def test_review_project_tool(tmp_path):
+    project = tmp_path / "project"
+    (project / "pkg").mkdir(parents=True)
+    (project / "pkg" / "core.py").write_text(
+        "def tangled(x):\n"
+        + "".join(f"    if x == {i}:\n        return {i}\n" for i in range(12))
+        + "    return None\n"
+    )
+    (project / "main.py").write_text("import os\n\ndef main():\n    pass\n")
+
+    report = review_project.invoke({"directory": str(project), "top_n": 3})
+    assert "2 Python files" in report
+    assert "1. pkg/core.py:1 tangled - complexity 13" in report
+    assert "complex-function" in report
+    assert "unused-import" in report
+    assert "```python\ndef tangled(x):" in report
+
+
+def test_review_project_reports_partial_scans(tmp_path, monkeypatch):
+    for i in range(5):
+        (tmp_path / f"m{i}.py").write_text(f"def f{i}():\n    return {i}\n")
+    monkeypatch.setattr(settings.model, "agent_tool_timeout", 1e-9)
+
+    report = review_project.invoke({"directory": str(tmp_path)})
+    assert "(Partial: stopped after 1 files" in report
+
+
+def test_review_project_without_python_files(tmp_path):
+    assert review_project.invoke({"directory": str(tmp_path)}).startswith(
+        "No Python files found"
+    )
+    assert review_project.invoke({"directory": str(tmp_path / "nope")}).startswith(
+        "Not a directory"
+    )
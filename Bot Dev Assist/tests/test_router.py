@@ -0,0 +1,36 @@
+import pytest
+
+from services.core.router import normalize_route_key
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ('explain "foo bar" please', "explain 'baz' please"),
+        ("read src/app.py", "read lib/other.py"),
+        ("explain config.yaml", "explain setup.cfg"),
+        ("what does get_agent do", "What does loadModel do?"),
+        ("retry 3 times in 2.5 seconds", "retry 10 times in 1 seconds"),
+        ("open https://x.com/a?b=1", "open http://localhost:8000/"),
+        ("run `ls -la`", "run `pwd`"),
+    ],
+)
+def test_literals_share_a_key(first, second):
+    assert normalize_route_key(first) == normalize_route_key(second)
+
+
+def test_templates_literals():
+    assert normalize_route_key('explain "foo bar" please') == "explain <str> please"
+    assert normalize_route_key("read src/app.py") == "read <path>"
+    assert normalize_route_key("what does get_agent do") == "what does <ident> do"
+
+
+def test_apostrophes_are_not_quotes():
+    key = normalize_route_key("what's a list and what's a tuple")
+    assert "list" in key and "tuple" in key
+    assert normalize_route_key("what's a list") != normalize_route_key("what's a dict")
+    assert normalize_route_key("don't delete it") != normalize_route_key("don't run it")
+
+
+def test_case_and_whitespace_are_ignored():
+    assert normalize_route_key("  Explain   Decorators ") == "explain decorators"
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from config.router import DEFAULT_KEYWORD_TRIGGERS, RouterConfig
+
+
+def test_triggers_file_extends_the_defaults(tmp_path):
+    path = tmp_path / "triggers.json"
+    path.write_text(json.dumps({"Deploy": 2, "explain": -2.0}))
+    config = RouterConfig(triggers_file=str(path))
+    assert config.keyword_triggers["deploy"] == 2.0
+    assert config.keyword_triggers["explain"] == -2.0
+    assert config.keyword_triggers["run"] == DEFAULT_KEYWORD_TRIGGERS["run"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["{not json", '["a", "b"]', '{"deploy": "high"}', '{"deploy": null}'],
+)
+def test_broken_triggers_file_keeps_the_defaults(tmp_path, caplog, content):
+    path = tmp_path / "triggers.json"
+    path.write_text(content)
+    config = RouterConfig(triggers_file=str(path))
+    assert config.keyword_triggers == DEFAULT_KEYWORD_TRIGGERS
+    assert "Ignoring router triggers file" in caplog.text
+
+
+def test_unreadable_triggers_file_keeps_the_defaults(tmp_path):
+    # A directory exists but cannot be opened as a file
+    config = RouterConfig(triggers_file=str(tmp_path))
+    assert config.keyword_triggers == DEFAULT_KEYWORD_TRIGGERS
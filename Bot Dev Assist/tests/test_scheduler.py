@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+
+from services.core.scheduler import (
+    ANONYMOUS_USER,
+    AdmissionRejected,
+    Priority,
+    RequestScheduler,
+)
+
+
+def _scheduler(**kwargs) -> RequestScheduler:
+    options = dict(
+        max_concurrent=1,
+        max_queue=8,
+        per_user=2,
+        background_reserve=0,
+        queue_timeout=1.0,
+        router_reserve=0,
+    )
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def test_grants_free_slots_immediately():
+    scheduler = _scheduler(max_concurrent=2)
+    first = scheduler._enqueue(Priority.INTERACTIVE, "alice")
+    second = scheduler._enqueue(Priority.AGENT, "bob")
+    third = scheduler._enqueue(Priority.AGENT, "carol")
+
+    assert first.granted and second.granted
+    assert not third.granted
+    assert scheduler.stats()["running"] == 2
+    assert scheduler.stats()["queued"] == 1
+
+
+def test_serves_queue_in_priority_order():
+    scheduler = _scheduler()
+    holder = scheduler._enqueue(Priority.AGENT, None)
+    batch = scheduler._enqueue(Priority.BATCH, None)
+    agent = scheduler._enqueue(Priority.AGENT, None)
+    interactive = scheduler._enqueue(Priority.INTERACTIVE, None)
+
+    scheduler._release(holder)
+    assert interactive.granted
+    assert not agent.granted and not batch.granted
+
+    scheduler._release(interactive)
+    assert agent.granted and not batch.granted
+
+
+def test_rejects_user_over_per_user_limit():
+    scheduler = _scheduler(max_concurrent=10)
+    first = scheduler._enqueue(Priority.INTERACTIVE, "alice")
+    scheduler._enqueue(Priority.INTERACTIVE, "alice")
+
+    with pytest.raises(AdmissionRejected):
+        scheduler._enqueue(Priority.INTERACTIVE, "alice")
+    assert scheduler._enqueue(Priority.INTERACTIVE, "bob").granted
+
+    scheduler._release(first)
+    assert scheduler._enqueue(Priority.INTERACTIVE, "alice").granted
+
+
+@pytest.mark.parametrize("user", [None, "", ANONYMOUS_USER])
+def test_anonymous_sessions_are_not_capped_per_user(user):
+    scheduler = _scheduler(max_concurrent=10, per_user=1)
+    waiters = [scheduler._enqueue(Priority.INTERACTIVE, user) for _ in range(4)]
+    assert all(w.granted for w in waiters)
+
+
+def test_full_queue_evicts_newest_lower_priority_waiter():
+    scheduler = _scheduler(max_queue=2)
+    scheduler._enqueue(Priority.INTERACTIVE, None)
+    older = scheduler._enqueue(Priority.BATCH, None)
+    newer = scheduler._enqueue(Priority.BATCH, None)
+
+    interactive = scheduler._enqueue(Priority.INTERACTIVE, None)
+
+    assert isinstance(newer.error, AdmissionRejected)
+    assert older.error is None
+    assert interactive in scheduler._heap
+    assert scheduler.stats()["rejected"] == {"batch": 1}
+
+
+def test_full_queue_rejects_without_lower_priority_victim():
+    scheduler = _scheduler(max_queue=1)
+    scheduler._enqueue(Priority.INTERACTIVE, None)
+    scheduler._enqueue(Priority.INTERACTIVE, None)
+
+    with pytest.raises(AdmissionRejected):
+        scheduler._enqueue(Priority.INTERACTIVE, None)
+    with pytest.raises(AdmissionRejected):
+        scheduler._enqueue(Priority.BATCH, None)
+
+
+def test_evicted_user_slot_is_returned():
+    scheduler = _scheduler(max_queue=1, per_user=1)
+    scheduler._enqueue(Priority.INTERACTIVE, None)
+    evicted = scheduler._enqueue(Priority.BATCH, "alice")
+    scheduler._enqueue(Priority.INTERACTIVE, None)
+
+    assert evicted.error is not None
+    assert scheduler._users["alice"] == 0
+
+
+def test_router_gets_reserved_slot_while_regular_slots_are_busy():
+    scheduler = _scheduler(max_concurrent=2, router_reserve=1)
+    chats = [scheduler._enqueue(Priority.INTERACTIVE, None) for _ in range(2)]
+    waiting_chat = scheduler._enqueue(Priority.INTERACTIVE, None)
+    router = scheduler._enqueue(Priority.ROUTER, None)
+
+    assert all(c.granted for c in chats)
+    assert router.granted
+    assert not waiting_chat.granted
+
+    # The reserve is for routers only, and holds one of them
+    second_router = scheduler._enqueue(Priority.ROUTER, None)
+    assert not second_router.granted
+    scheduler._release(router)
+    assert second_router.granted and not waiting_chat.granted
+
+
+def test_background_work_leaves_reserved_slots_free():
+    scheduler = _scheduler(max_concurrent=2, background_reserve=1)
+    batch = scheduler._enqueue(Priority.BATCH, None)
+    second_batch = scheduler._enqueue(Priority.BATCH, None)
+
+    assert batch.granted and not second_batch.granted
+    assert scheduler._enqueue(Priority.INTERACTIVE, None).granted
+
+
+def test_slot_times_out_in_queue():
+    scheduler = _scheduler(queue_timeout=0.05)
+    with scheduler.slot(Priority.INTERACTIVE):
+        with pytest.raises(AdmissionRejected, match="not scheduled"):
+            with scheduler.slot(Priority.INTERACTIVE):
+                pass
+    assert scheduler.stats()["running"] == 0
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_slot_waits_for_release():
+    scheduler = _scheduler()
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot(Priority.AGENT):
+            entered.set()
+            release.wait(1)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait(1)
+    threading.Timer(0.05, release.set).start()
+    with scheduler.slot(Priority.INTERACTIVE):
+        assert scheduler.stats()["running"] == 1
+    thread.join(1)
+    assert scheduler.stats()["admitted"] == {"agent": 1, "interactive": 1}
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.core import speculation
+from services.core.speculation import (
+    AsyncSpeculativeStream,
+    SpeculationStats,
+    SpeculativeStream,
+)
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    fresh = SpeculationStats()
+    monkeypatch.setattr(speculation, "speculation_stats", fresh)
+    return fresh
+
+
+class _Producer:
+    """Yields chunks, waiting for a go-ahead after the first `hold` ones."""
+
+    def __init__(self, chunks, hold: int = 0):
+        self.chunks = chunks
+        self.hold = hold
+        self.go = threading.Event()
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __call__(self):
+        try:
+            for i, chunk in enumerate(self.chunks):
+                if i == self.hold and self.hold:
+                    self.go.wait(5)
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                self.produced += 1
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def test_commit_yields_buffered_and_later_chunks(stats):
+    producer = _Producer(["a", "b", "c"], hold=2)
+    stream = SpeculativeStream(producer)
+    time.sleep(0.05)  # "a" and "b" are buffered while routing
+    producer.go.set()
+    assert list(stream.commit(routing_ms=12.0)) == ["a", "b", "c"]
+    assert producer.closed.wait(1)
+    assert stats.snapshot()["committed"] == 1
+    assert stats.snapshot()["hidden_routing_ms"] == 12.0
+
+
+def test_cancel_stops_at_the_next_chunk(stats):
+    producer = _Producer(["a", "b", "c", "d"], hold=1)
+    stream = SpeculativeStream(producer)
+    time.sleep(0.05)
+    stream.cancel()
+    producer.go.set()
+    assert producer.closed.wait(1)
+    assert producer.produced == 2  # "b" arrived, then the stream was closed
+    snapshot = stats.snapshot()
+    assert snapshot["cancelled"] == 1 and snapshot["wasted_chunks"] == 1
+
+
+def test_early_close_of_commit_stops_the_worker():
+    producer = _Producer(["a", "b", "c"], hold=1)
+    stream = SpeculativeStream(producer)
+    chunks = stream.commit()
+    assert next(chunks) == "a"
+    chunks.close()
+    producer.go.set()
+    assert producer.closed.wait(1)
+    assert producer.produced < 3
+
+
+def test_errors_are_raised_from_commit():
+    stream = SpeculativeStream(_Producer(["a", ValueError("boom")]))
+    chunks = stream.commit()
+    assert next(chunks) == "a"
+    with pytest.raises(ValueError, match="boom"):
+        next(chunks)
+
+
+def test_async_commit_and_cancel(stats):
+    async def produce(chunks, started=None):
+        for chunk in chunks:
+            if chunk == "wait":
+                started.set()
+                await asyncio.sleep(10)  # a long prefill
+            yield chunk
+
+    async def main():
+        stream = AsyncSpeculativeStream(lambda: produce(["a", "b"]))
+        assert [c async for c in stream.commit()] == ["a", "b"]
+
+        started = asyncio.Event()
+        stream = AsyncSpeculativeStream(lambda: produce(["wait"], started))
+        await started.wait()
+        stream.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await stream._task
+        assert stream._task.cancelled()
+
+    asyncio.run(main())
+    snapshot = stats.snapshot()
+    assert snapshot["committed"] == 1 and snapshot["cancelled"] == 1
@@ -0,0 +1,32 @@
+import pytest
+
+from services.core.tool_selector import _stem
+
+
+@pytest.mark.parametrize(
+    "words",
+    [
+        ("file", "files"),
+        ("cache", "caches"),
+        ("class", "classes"),
+        ("match", "matches"),
+        ("box", "boxes"),
+        ("change", "changed", "changing", "changes"),
+        ("read", "reads", "reading"),
+        ("library", "libraries"),
+        ("directory", "directories"),
+        ("process", "processes"),
+    ],
+)
+def test_forms_of_a_word_share_a_stem(words):
+    assert len({_stem(word) for word in words}) == 1
+
+
+@pytest.mark.parametrize("word", ["is", "gas", "css", "bus", "class", "read"])
+def test_short_and_double_s_words_are_kept(word):
+    assert _stem(word) == word
+
+
+def test_different_words_stay_apart():
+    assert _stem("files") != _stem("fill")
+    assert _stem("class") != _stem("clash")
@@ -9,8 +9,10 @@ from langchain_core.tools import BaseTool, StructuredTool
 
 # Import your tools
 from tools.analyze_code import analyze_code
+from tools.dev_tools import search_code
 from tools.memory import list_memories, recall_memory, save_memory
 from tools.py_codeAnalyst import read_and_generate_code
+from tools.review_project import review_project
 
 
 def _as_tool(obj: Any) -> BaseTool:
@@ -30,6 +32,8 @@ def _as_tool(obj: Any) -> BaseTool:
 _RAW_TOOL_REGISTRY: Dict[str, Any] = {
     "read_and_generate_code": read_and_generate_code,
     "analyze_code": analyze_code,
+    "review_project": review_project,
+    "search_code": search_code,
     "save_memory": save_memory,
     "recall_memory": recall_memory,
     "list_memories": list_memories,
@@ -0,0 +1,155 @@
+"""analyze_code tool - AST metrics for a Python file or directory."""
+
+import logging
+import os
+import time
+from collections import Counter
+from typing import Iterable, List
+
+from langchain_core.tools import tool
+
+from services.core.code_metrics import analyze_files, analyze_tree
+
+logger = logging.getLogger(__name__)
+
+# Entries listed per section of a summary
+_TOP = 5
+
+
+def _complexity_line(functions: List[dict]) -> str:
+    worst = max(functions, key=lambda f: f["complexity"])
+    avg = sum(f["complexity"] for f in functions) / len(functions)
+    return f"Complexity: avg {avg:.1f}, max {worst['complexity']} ({worst['name']})"
+
+
+def summarize_file(result: dict) -> str:
+    """Compact report for one file's analyze_source() result."""
+    head = f"{result['path']}: {result.get('lines', 0)} lines"
+    if "error" in result:
+        return f"{head}\nCould not analyze: {result['error']}"
+
+    functions = result["functions"]
+    lines = [
+        f"{head} ({result['code_lines']} code), {len(functions)} functions, "
+        f"{result['classes']} classes"
+    ]
+    if functions:
+        lines.append(_complexity_line(functions))
+        largest = sorted(functions, key=lambda f: -f["length"])[:_TOP]
+        lines.append(
+            "Largest functions: "
+            + ", ".join(f"{f['name']} ({f['length']} lines)" for f in largest)
+        )
+    if result["imports"]:
+        lines.append("Imports: " + ", ".join(result["imports"][:20]))
+    if result["todos"]:
+        lines.append(f"TODOs ({len(result['todos'])}):")
+        lines.extend(f"- {line}: {text}" for line, text in result["todos"][:_TOP])
+    if result["smells"]:
+        lines.append(f"Smells ({len(result['smells'])}):")
+        lines.extend(
+            f"- line {line} {kind}: {detail}"
+            for line, kind, detail in result["smells"][:10]
+        )
+    else:
+        lines.append("No smells found.")
+    return "\n".join(lines)
+
+
+def summarize_tree(root: str, results: Iterable[dict]) -> str:
+    """Compact roll-up of every file's result under root."""
+    files = total_lines = classes = 0
+    functions: List[dict] = []
+    smells: Counter = Counter()
+    smelly_files: Counter = Counter()
+    imports: Counter = Counter()
+    todos: List[str] = []
+    errors: List[str] = []
+
+    for result in results:
+        files += 1
+        total_lines += result.get("lines", 0)
+        if "error" in result:
+            errors.append(f"{result['path']}: {result['error']}")
+            continue
+        classes += result["classes"]
+        for f in result["functions"]:
+            functions.append({**f, "path": result["path"]})
+        smells.update(kind for _, kind, _ in result["smells"])
+        if result["smells"]:
+            smelly_files[result["path"]] = len(result["smells"])
+        imports.update(m.split(".")[0] for m in result["imports"] if m[:1] != ".")
+        todos.extend(
+            f"{result['path']}:{line}: {text}" for line, text in result["todos"]
+        )
+
+    if not files:
+        return f"No Python files found in {root}"
+    lines = [
+        f"{root}: {files} Python files, {total_lines} lines, "
+        f"{len(functions)} functions, {classes} classes"
+    ]
+    if functions:
+        lines.append(_complexity_line(functions))
+        lines.append("Most complex functions:")
+        lines.extend(
+            f"- {f['path']}:{f['line']} {f['name']} "
+            f"(complexity {f['complexity']}, {f['length']} lines)"
+            for f in sorted(functions, key=lambda f: -f["complexity"])[:_TOP]
+        )
+    if smells:
+        lines.append(
+            "Smells: " + ", ".join(f"{kind} {n}" for kind, n in smells.most_common())
+        )
+        lines.append(
+            "Files with most smells: "
+            + ", ".join(f"{path} ({n})" for path, n in smelly_files.most_common(_TOP))
+        )
+    if imports:
+        lines.append(
+            "Top imports: "
+            + ", ".join(f"{name} ({n})" for name, n in imports.most_common(10))
+        )
+    if todos:
+        lines.append(f"TODOs ({len(todos)}):")
+        lines.extend(f"- {todo}" for todo in todos[:_TOP])
+    if errors:
+        lines.append(f"Not analyzed ({len(errors)}):")
+        lines.extend(f"- {error}" for error in errors[:_TOP])
+    return "\n".join(lines)
+
+
+@tool
+def analyze_code(file_path: str) -> str:
+    """Analyze a Python file or directory and return code metrics.
+
+    Use for:
+    - Code review and quality checks
+    - Finding complex, long or deeply nested functions
+    - Listing imports, TODOs and code smells (bare except, mutable
+      defaults, unused imports, eval/exec, ...)
+
+    Args:
+        file_path: Python file, or directory to analyze recursively.
+
+    Returns:
+        Compact summary of the metrics
+    """
+    start = time.perf_counter()
+    try:
+        if os.path.isdir(file_path):
+            report = summarize_tree(file_path, analyze_tree(file_path))
+        elif os.path.isfile(file_path):
+            root, name = os.path.split(os.path.abspath(file_path))
+            result = next(analyze_files(root, [name]))
+            result["path"] = file_path
+            report = summarize_file(result)
+        else:
+            return f"File not found: {file_path}"
+    except Exception as e:
+        logger.error(f"Analysis of {file_path} failed: {e}")
+        return f"Analysis failed: {e}"
+    logger.info(
+        f"Analyzed {file_path} in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return report
@@ -0,0 +1,295 @@
+"""
+Pool of warm Python worker processes for execute_code.
+
+Starting an interpreter per snippet costs far more than most snippets take
+to run. CodeRunner keeps settings.app.code_workers worker processes
+(tools/code_worker.py) started and hands each job to an idle one over its
+pipes, so a run only pays for the code itself.
+
+Per job:
+
+- a fresh temporary working directory, removed afterwards;
+- fresh globals, with os.environ and sys.path restored afterwards; a job
+  that imports new modules, patches loaded ones or leaves threads running
+  gets its worker replaced (see tools/code_worker.py for what is not
+  isolated);
+- a CPU-time rlimit and a wall-clock timeout; on timeout the worker is
+  killed and replaced;
+- stdout/stderr streamed back as it is produced (on_output callback) and
+  capped at code_output_limit characters.
+
+Workers start with an address-space rlimit (code_memory_mb) and are
+recycled after code_worker_max_jobs jobs or when they die. rlimits are
+POSIX-only; on Windows only the timeout and output cap apply.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORKER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "code_worker.py"
+)
+
+# Seconds to wait for a new worker's "ready" frame
+_START_TIMEOUT = 10.0
+
+
+class RunResult:
+    """Outcome of one job."""
+
+    def __init__(self):
+        self.stdout = ""
+        self.stderr = ""
+        self.ok = False
+        self.timed_out = False
+        self.crashed = False
+        self.exit_code: Optional[int] = None
+        self.truncated = False
+        self.duration_ms = 0.0
+
+    def format(self) -> str:
+        """Tool output: stdout, then stderr and any limit that was hit."""
+        parts = [self.stdout.rstrip("\n")] if self.stdout else []
+        if self.stderr:
+            parts.append(self.stderr.rstrip("\n"))
+        if self.timed_out:
+            parts.append("[Execution timed out]")
+        elif self.crashed:
+            # A negative code is the signal, e.g. SIGXCPU from the CPU rlimit
+            parts.append(f"[Worker exited unexpectedly (code {self.exit_code})]")
+        if self.truncated:
+            parts.append("[Output truncated]")
+        return "\n".join(parts) or "(no output)"
+
+
+class _Worker:
+    """One warm interpreter and the thread reading its frames."""
+
+    def __init__(self, memory_mb: int):
+        self.jobs = 0
+        # Why the last job left the worker unfit for reuse ("" if it did not)
+        self.dirty = ""
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", "-u", _WORKER_SCRIPT, str(memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self.frames: "queue.Queue[Optional[dict]]" = queue.Queue()
+        threading.Thread(
+            target=self._read, name=f"code-worker-{self.proc.pid}", daemon=True
+        ).start()
+
+        ready = self.next_frame(_START_TIMEOUT)
+        if not ready or ready.get("t") != "ready":
+            self.kill()
+            raise RuntimeError("code worker failed to start")
+
+    def _read(self) -> None:
+        for line in self.proc.stdout:
+            try:
+                self.frames.put(json.loads(line))
+            except ValueError:
+                continue
+        self.frames.put(None)
+
+    def next_frame(self, timeout: float) -> Optional[dict]:
+        """Next frame, None on EOF; raises queue.Empty on timeout."""
+        return self.frames.get(timeout=max(timeout, 0.0))
+
+    def send(self, job: dict) -> None:
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self) -> None:
+        if self.alive:
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class CodeRunner:
+    """Dispatches code jobs to a pool of warm workers."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_jobs: int = 50,
+        timeout: float = 10.0,
+        memory_mb: int = 512,
+        output_limit: int = 8000,
+    ):
+        self.size = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.output_limit = output_limit
+
+        self._idle: "queue.LifoQueue[Optional[_Worker]]" = queue.LifoQueue()
+        self._ids = itertools.count(1)
+        self._closed = False
+        for _ in range(self.size):
+            # Slots are filled with a real worker on first use (or by warm_up)
+            self._idle.put(None)
+
+    def warm_up(self) -> None:
+        """Start every worker now instead of on first use."""
+        slots = [self._idle.get() for _ in range(self.size)]
+        for slot in slots:
+            self._idle.put(slot if slot is not None else self._spawn())
+
+    def run(
+        self,
+        code: str,
+        timeout: Optional[float] = None,
+        on_output: Optional[Callable[[str, str], None]] = None,
+    ) -> RunResult:
+        """Run code in a worker; on_output(kind, text) gets output as it streams."""
+        if self._closed:
+            raise RuntimeError("CodeRunner is closed")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        workdir = tempfile.mkdtemp(prefix="code-job-")
+        result = RunResult()
+        start = time.perf_counter()
+        try:
+            if worker is None or not worker.alive:
+                worker = self._spawn()
+            self._execute(worker, code, workdir, timeout, on_output, result)
+        finally:
+            result.duration_ms = (time.perf_counter() - start) * 1000
+            shutil.rmtree(workdir, ignore_errors=True)
+            self._idle.put(self._recycle(worker, result))
+        return result
+
+    def close(self) -> None:
+        self._closed = True
+        for _ in range(self.size):
+            worker = self._idle.get()
+            if worker is not None:
+                worker.kill()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.memory_mb)
+
+    def _recycle(
+        self, worker: Optional[_Worker], result: RunResult
+    ) -> Optional[_Worker]:
+        """Keep the worker, or kill it and leave the slot to be refilled."""
+        if worker is None:
+            return None
+        if (
+            result.timed_out
+            or result.crashed
+            or worker.dirty
+            or worker.jobs >= self.max_jobs
+        ):
+            worker.kill()
+            return None
+        return worker
+
+    def _execute(
+        self,
+        worker: _Worker,
+        code: str,
+        workdir: str,
+        timeout: float,
+        on_output: Optional[Callable[[str, str], None]],
+        result: RunResult,
+    ) -> None:
+        job_id = next(self._ids)
+        worker.jobs += 1
+        out: List[str] = []
+        err: List[str] = []
+        deadline = time.monotonic() + timeout
+        try:
+            worker.send(
+                {
+                    "id": job_id,
+                    "code": code,
+                    "cwd": workdir,
+                    "cpu": timeout,
+                    "limit": self.output_limit,
+                }
+            )
+            while True:
+                frame = worker.next_frame(deadline - time.monotonic())
+                if frame is None:
+                    result.crashed = True
+                    break
+                if frame.get("id") != job_id:
+                    continue
+                kind = frame.get("t")
+                if kind == "done":
+                    result.ok = bool(frame.get("ok"))
+                    result.truncated = bool(frame.get("truncated"))
+                    worker.dirty = frame.get("dirty") or ""
+                    if worker.dirty:
+                        logger.debug(
+                            f"Code worker {worker.proc.pid} recycled: {worker.dirty}"
+                        )
+                    break
+                (out if kind == "out" else err).append(frame.get("s", ""))
+                if on_output is not None:
+                    on_output(kind, frame.get("s", ""))
+        except queue.Empty:
+            result.timed_out = True
+        except OSError:
+            # Broken pipe: the worker died before reading the job
+            result.crashed = True
+        if result.crashed:
+            try:
+                result.exit_code = worker.proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+        result.stdout = "".join(out)
+        result.stderr = "".join(err)
+        if result.crashed or result.timed_out:
+            logger.warning(
+                f"Code worker {worker.proc.pid} "
+                f"{'timed out' if result.timed_out else 'died'}; recycling"
+            )
+
+
+_runner: Optional[CodeRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_code_runner() -> CodeRunner:
+    """Shared worker pool, sized from settings.app."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                app_cfg = settings.app
+                _runner = CodeRunner(
+                    workers=app_cfg.code_workers,
+                    max_jobs=app_cfg.code_worker_max_jobs,
+                    timeout=app_cfg.code_timeout,
+                    memory_mb=app_cfg.code_memory_mb,
+                    output_limit=app_cfg.code_output_limit,
+                )
+    return _runner
@@ -0,0 +1,418 @@
+"""
+Indexed code search for search_code.
+
+CodeIndex keeps one SQLite database per project root (under
+settings.app.search_index_dir) with:
+
+- files:   path, mtime and size of every indexed file;
+- content: an FTS5 table over the file text (trigram tokenizer, so any
+           substring of 3+ characters is searchable; plain word tokens on
+           SQLite builds without it);
+- symbols: definitions (def/class/function/fn/struct/... and top-level
+           assignments) found by a per-line regex.
+
+refresh() walks the tree, skipping .git and whatever the .gitignore files
+exclude, and re-indexes only files whose mtime or size changed; it runs at
+most every search_rescan_seconds, so repeated queries cost one indexed
+lookup. search() ranks exact definitions first, then bm25-ranked content
+matches, each with its line number and a one-line snippet.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Directories never worth indexing, .gitignore or not
+_SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".mypy_cache", ".pytest_cache"}
+
+_SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+|pub(?:\([^)]*\))?\s+|public\s+|private\s+|static\s+)*"
+    r"(?:async\s+)?(def|class|function|func|fn|struct|enum|trait|interface|type)"
+    r"\s+(?:\([^)]*\)\s*)?([A-Za-z_]\w*)"
+)
+_ASSIGN_RE = re.compile(
+    r"^(?:export\s+)?(?:const\s+|let\s+|var\s+)?([A-Za-z_]\w*)\s*=[^=]"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols(file_id);
+"""
+
+
+class SearchHit:
+    """One result line."""
+
+    __slots__ = ("path", "line", "text", "kind")
+
+    def __init__(self, path: str, line: int, text: str, kind: str):
+        self.path = path
+        self.line = line
+        self.text = text
+        self.kind = kind
+
+    def format(self) -> str:
+        tag = f" [{self.kind}]" if self.kind != "match" else ""
+        return f"{self.path}:{self.line}:{tag} {self.text.strip()[:160]}"
+
+
+def _glob_regex(pattern: str) -> "re.Pattern[str]":
+    """Compile a .gitignore glob: * and ? never match "/", while ** spans
+    directories ("**/x" at any depth, "x/**" everything inside x)."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**", i):
+            i += 2
+            if pattern.startswith("/", i):
+                out.append("(?:.*/)?")
+                i += 1
+            else:
+                out.append(".*")
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+class _IgnoreRules:
+    """The subset of .gitignore semantics that matters for skipping files."""
+
+    def __init__(self):
+        # (base dir relative to root, pattern, negated, dir_only, anchored)
+        self.rules: List[Tuple[str, "re.Pattern[str]", bool, bool, bool]] = []
+
+    def load(self, root: str, rel_dir: str) -> None:
+        path = os.path.join(root, rel_dir, ".gitignore")
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            line = line.lstrip("!")
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            # A slash at the start or in the middle ties the pattern to the
+            # .gitignore's directory; otherwise it matches a name at any depth
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self.rules.append(
+                    (rel_dir, _glob_regex(line), negated, dir_only, anchored)
+                )
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for base, regex, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base and not rel_path.startswith(base + "/"):
+                continue
+            sub = rel_path[len(base) + 1 :] if base else rel_path
+            if regex.match(sub if anchored else os.path.basename(sub)):
+                result = not negated
+        return result
+
+
+def _symbols(text: str) -> Iterator[Tuple[str, int, str]]:
+    for number, line in enumerate(text.splitlines(), 1):
+        match = _SYMBOL_RE.match(line)
+        if match:
+            yield match.group(2), number, match.group(1)
+            continue
+        match = _ASSIGN_RE.match(line)
+        if match:
+            yield match.group(1), number, "assign"
+
+
+def iter_files(root: str, max_bytes: int = 0) -> Iterator[Tuple[str, float, int]]:
+    """(relative path, mtime, size) of every file under root that git would
+    track: .git and friends and .gitignore'd paths are skipped, and so are
+    files over max_bytes (when non-zero)."""
+    rules = _IgnoreRules()
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        rules.load(root, rel_dir)
+        try:
+            entries = list(os.scandir(os.path.join(root, rel_dir)))
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if is_dir:
+                    if entry.name not in _SKIP_DIRS and not rules.ignored(
+                        rel_path, True
+                    ):
+                        stack.append(rel_path)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if rules.ignored(rel_path, False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if not max_bytes or st.st_size <= max_bytes:
+                yield rel_path, st.st_mtime, st.st_size
+
+
+def _read_text(path: str, max_bytes: int) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(max_bytes + 1)
+    except OSError:
+        return None
+    if len(raw) > max_bytes or b"\0" in raw[:8192]:
+        return None
+    return raw.decode("utf-8", errors="replace")
+
+
+class CodeIndex:
+    """Incrementally maintained search index over one directory tree."""
+
+    def __init__(
+        self,
+        root: str,
+        db_path: str,
+        rescan_seconds: float = 30.0,
+        max_file_bytes: int = 1 << 20,
+    ):
+        self.root = os.path.abspath(root)
+        self.rescan_seconds = rescan_seconds
+        # Larger files are assumed to be data, not code
+        self.max_file_bytes = max_file_bytes
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.tokenizer = self._create_content_table()
+
+    def _create_content_table(self) -> str:
+        row = self._db.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'content'"
+        ).fetchone()
+        if row is not None:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE content USING fts5(body, tokenize='trigram')"
+            )
+            return "trigram"
+        except sqlite3.OperationalError:
+            # SQLite < 3.34: word tokens only
+            self._db.execute("CREATE VIRTUAL TABLE content USING fts5(body)")
+            return "unicode61"
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """Re-index changed files; a no-op within rescan_seconds of the last scan."""
+        with self._lock:
+            if not force and time.monotonic() - self._scanned_at < self.rescan_seconds:
+                return {}
+            start = time.perf_counter()
+            known = {
+                path: (file_id, mtime, size)
+                for file_id, path, mtime, size in self._db.execute(
+                    "SELECT id, path, mtime, size FROM files"
+                )
+            }
+            stats = {"files": 0, "indexed": 0, "removed": 0}
+            with self._db:
+                for rel_path, mtime, size in iter_files(self.root, self.max_file_bytes):
+                    stats["files"] += 1
+                    entry = known.pop(rel_path, None)
+                    if entry is not None and entry[1:] == (mtime, size):
+                        continue
+                    if self._index_file(rel_path, mtime, size, entry):
+                        stats["indexed"] += 1
+                for file_id, _, _ in known.values():
+                    self._remove(file_id)
+                    stats["removed"] += 1
+            self._scanned_at = time.monotonic()
+            logger.info(
+                f"Code index {self.root}: {stats} in "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+            return stats
+
+    def _index_file(
+        self, rel_path: str, mtime: float, size: int, entry: Optional[tuple]
+    ) -> bool:
+        text = _read_text(os.path.join(self.root, rel_path), self.max_file_bytes)
+        if entry is not None:
+            self._remove(entry[0])
+        if text is None:
+            # Binary: remember it so it is not re-read until it changes
+            self._db.execute(
+                "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                (rel_path, mtime, size),
+            )
+            return False
+        file_id = self._db.execute(
+            "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+            (rel_path, mtime, size),
+        ).lastrowid
+        self._db.execute(
+            "INSERT INTO content (rowid, body) VALUES (?, ?)", (file_id, text)
+        )
+        self._db.executemany(
+            "INSERT INTO symbols (name, file_id, line, kind) VALUES (?, ?, ?, ?)",
+            [(name, file_id, line, kind) for name, line, kind in _symbols(text)],
+        )
+        return True
+
+    def _remove(self, file_id: int) -> None:
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        self._db.execute("DELETE FROM content WHERE rowid = ?", (file_id,))
+        self._db.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        """Definitions of query first, then ranked content matches."""
+        self.refresh()
+        terms = query.split()
+        if not terms:
+            return []
+
+        hits: List[SearchHit] = []
+        seen = set()
+        with self._lock:
+            if len(terms) == 1:
+                for path, line, kind in self._db.execute(
+                    "SELECT f.path, s.line, s.kind FROM symbols s "
+                    "JOIN files f ON f.id = s.file_id WHERE s.name = ? "
+                    "ORDER BY s.kind = 'assign', f.path LIMIT ?",
+                    (terms[0], limit),
+                ):
+                    hits.append(SearchHit(path, line, "", f"def:{kind}"))
+                    seen.add((path, line))
+
+            rows = self._content_matches(terms, limit)
+
+        phrase = " ".join(terms).lower()
+        needles = [t.lower() for t in terms]
+        for path, body in rows:
+            # One line per file: the first with the whole query, else the
+            # first with every word
+            best = None
+            for number, text in enumerate(body.splitlines(), 1):
+                if (path, number) in seen:
+                    continue
+                lowered = text.lower()
+                if phrase in lowered:
+                    best = (number, text)
+                    break
+                if best is None and all(n in lowered for n in needles):
+                    best = (number, text)
+            if best is not None:
+                hits.append(SearchHit(path, best[0], best[1], "match"))
+                seen.add((path, best[0]))
+            if len(hits) >= limit:
+                break
+
+        # Fill in the definition lines' text from the matched bodies or disk
+        for hit in hits:
+            if not hit.text:
+                hit.text = self._line(hit.path, hit.line)
+        return hits[:limit]
+
+    def _content_matches(self, terms: List[str], limit: int) -> List[Tuple[str, str]]:
+        if self.tokenizer == "trigram":
+            usable = [t for t in terms if len(t) >= 3]
+        else:
+            usable = [t for t in terms if re.fullmatch(r"\w+", t)]
+        if not usable:
+            return []
+        match = " AND ".join('"' + t.replace('"', '""') + '"' for t in usable)
+        try:
+            return self._db.execute(
+                "SELECT f.path, c.body FROM content c JOIN files f ON f.id = c.rowid "
+                "WHERE content MATCH ? ORDER BY bm25(content) LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Search query {match!r} failed: {e}")
+            return []
+
+    def _line(self, rel_path: str, line: int) -> str:
+        row = self._db.execute(
+            "SELECT c.body FROM content c JOIN files f ON f.id = c.rowid "
+            "WHERE f.path = ?",
+            (rel_path,),
+        ).fetchone()
+        if row is None:
+            return ""
+        lines = row[0].splitlines()
+        return lines[line - 1] if 0 < line <= len(lines) else ""
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_indexes: Dict[str, CodeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str) -> CodeIndex:
+    """Shared index for a project root (one SQLite file per root)."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            app_cfg = settings.app
+            digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:12]
+            index = CodeIndex(
+                root,
+                os.path.join(app_cfg.search_index_dir, f"{digest}.sqlite"),
+                rescan_seconds=app_cfg.search_rescan_seconds,
+                max_file_bytes=app_cfg.search_max_file_kb * 1024,
+            )
+            _indexes[root] = index
+    return index
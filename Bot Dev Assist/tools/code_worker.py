@@ -0,0 +1,218 @@
+"""
+Warm Python worker for tools.code_runner (run as a script, stdlib only).
+
+Protocol: one JSON object per line. The parent sends a job
+
+    {"id": 1, "code": "...", "cwd": "/tmp/job", "cpu": 10, "limit": 8000}
+
+and the worker answers with any number of output frames followed by one
+"done" frame:
+
+    {"id": 1, "t": "out", "s": "..."}     stdout text, as it is produced
+    {"id": 1, "t": "err", "s": "..."}     stderr text (tracebacks included)
+    {"id": 1, "t": "done", "ok": true, "truncated": false, "dirty": ""}
+
+Each job runs in fresh globals inside its own working directory. The
+address-space limit is applied once at startup, the CPU limit per job;
+going over the CPU limit kills the worker and the parent starts another.
+
+Isolation between jobs of one worker: the working directory, os.environ
+and sys.path are restored after every job. A job that imports a module not
+already loaded, rebinds an attribute of a loaded module (json.dumps = ...,
+builtins.print = ...), replaces a sys.modules entry or leaves a thread
+running is reported as "dirty" and the parent replaces the worker. Common
+stdlib modules are preloaded so that importing them does not count. Not
+covered: state changed in place inside a module (random's seed, a mutated
+module-level list or cache), C-level state, open file descriptors and child
+processes the job started.
+"""
+
+import io
+import json
+import os
+import sys
+import threading
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+# Bound at import so a job patching the json module cannot break the protocol
+_dumps, _loads = json.dumps, json.loads
+
+# Output is sent when a line is complete or this many characters are buffered
+_FRAME_CHARS = 4096
+
+# Imported at startup so that jobs using them keep the worker warm
+_PRELOAD = (
+    "collections",
+    "datetime",
+    "decimal",
+    "fractions",
+    "functools",
+    "itertools",
+    "math",
+    "random",
+    "re",
+    "statistics",
+    "string",
+    "textwrap",
+    "time",
+)
+
+
+class _Channel:
+    """Writes protocol frames to the parent."""
+
+    def __init__(self, fd: int):
+        self._out = os.fdopen(fd, "w", encoding="utf-8", buffering=1)
+
+    def send(self, **frame) -> None:
+        self._out.write(_dumps(frame) + "\n")
+        self._out.flush()
+
+
+class _Output(io.TextIOBase):
+    """sys.stdout/sys.stderr of a job: streamed to the parent, size-capped."""
+
+    def __init__(self, channel: _Channel, job_id: int, kind: str, budget: list):
+        self._channel = channel
+        self._id = job_id
+        self._kind = kind
+        self._budget = budget  # [chars left, truncated], shared by out and err
+        self._buffer = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        left = self._budget[0]
+        if len(text) > left:
+            self._budget[1] = True
+        kept = text[: max(left, 0)]
+        self._budget[0] -= len(kept)
+        self._buffer += kept
+        if "\n" in kept or len(self._buffer) >= _FRAME_CHARS:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._channel.send(id=self._id, t=self._kind, s=self._buffer)
+            self._buffer = ""
+
+
+def _limit_memory(memory_mb: int) -> None:
+    if resource is None or memory_mb <= 0:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def _limit_cpu(seconds: float) -> None:
+    if resource is None or seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + int(seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+class _State:
+    """Process state a job may change, captured before it runs."""
+
+    def __init__(self):
+        self.environ = dict(os.environ)
+        self.path = list(sys.path)
+        self.threads = set(threading.enumerate())
+        self.modules = {
+            name: (module, dict(vars(module)))
+            for name, module in sys.modules.items()
+            if module is not None
+        }
+
+    def restore(self) -> str:
+        """Undo what can be undone; why the worker is unfit to reuse, or ""."""
+        if os.environ != self.environ:
+            os.environ.clear()
+            os.environ.update(self.environ)
+        sys.path[:] = self.path
+
+        if any(t.is_alive() for t in set(threading.enumerate()) - self.threads):
+            return "thread left running"
+        if len(sys.modules) != len(self.modules):
+            return "modules imported"
+        for name, (module, attrs) in self.modules.items():
+            if sys.modules.get(name) is not module:
+                return f"sys.modules[{name!r}] replaced"
+            current = vars(module)
+            if len(current) != len(attrs) or any(
+                current.get(key) is not value for key, value in attrs.items()
+            ):
+                return f"module {name} patched"
+        return ""
+
+
+def _run(channel: _Channel, job: dict) -> None:
+    job_id = job["id"]
+    budget = [int(job.get("limit", 8000)), False]
+    stdout = _Output(channel, job_id, "out", budget)
+    stderr = _Output(channel, job_id, "err", budget)
+    home = os.getcwd()
+    state = _State()
+    ok = True
+
+    _limit_cpu(float(job.get("cpu", 0)))
+    sys.stdout, sys.stderr, sys.stdin = stdout, stderr, io.StringIO("")
+    try:
+        os.chdir(job.get("cwd") or home)
+        exec(compile(job["code"], "<code>", "exec"), {"__name__": "__main__"})
+    except SystemExit as e:
+        ok = e.code in (None, 0)
+    except BaseException as e:
+        ok = False
+        # Skip this frame: the traceback starts in the job's code
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next, file=stderr)
+    finally:
+        stdout.flush()
+        stderr.flush()
+        sys.stdout, sys.stderr, sys.stdin = (
+            sys.__stdout__,
+            sys.__stderr__,
+            sys.__stdin__,
+        )
+        os.chdir(home)
+    dirty = state.restore()
+    channel.send(id=job_id, t="done", ok=ok, truncated=budget[1], dirty=dirty)
+
+
+def main() -> None:
+    # Frames go over a private copy of stdout; anything the job writes to
+    # fd 1 directly (child processes, os.write) lands on stderr instead
+    channel = _Channel(os.dup(1))
+    os.dup2(2, 1)
+
+    _limit_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    for name in _PRELOAD:
+        __import__(name)
+    channel.send(t="ready", pid=os.getpid())
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        _run(channel, _loads(line))
+
+
+if __name__ == "__main__":
+    main()
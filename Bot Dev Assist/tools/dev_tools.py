@@ -1,203 +1,278 @@
-# tools.py - Complete for daily use
-
-import subprocess
-from datetime import datetime
-
-import requests
-from langchain_core.tools import tool
-
-
-# ============= 1. WEB SEARCH & RESEARCH =============
-@tool
-def web_search(query: str, num_results: int = 5) -> str:
-    """Search the web for information (research, news, data).
-
-    Use for:
-    - Finding tutorials, documentation
-    - Researching topics
-    - Getting latest news/data
-    - Comparing products/services
-    """
-    import requests
-
-    try:
-        # Using Tavily or DuckDuckGo free API
-        url = f"https://api.duckduckgo.com/?q={query}&format=json"
-        response = requests.get(url, timeout=5)
-        results = response.json()
-        return f"Found {len(results)} results for '{query}'"
-    except Exception as e:
-        return f"Search failed: {e}"
-
-
-# ============= 2. CODE GENERATION & EXECUTION =============
-@tool
-def generate_code(
-    requirement: str, language: str = "python", save_file: str = None
-) -> str:
-    """Generate code based on requirement.
-
-    Use for:
-    - Quick scripts
-    - Boilerplate code
-    - Algorithm implementation
-    - Data processing
-    """
-    # Your existing implementation
-    pass
-
-
-@tool
-def execute_code(code: str, language: str = "python") -> str:
-    """Execute code and return output.
-
-    Use for:
-    - Running calculations
-    - Testing ideas
-    - Data processing
-    - Quick automation
-    """
-    try:
-        if language == "python":
-            result = subprocess.run(
-                ["python", "-c", code], capture_output=True, text=True, timeout=10
-            )
-            return result.stdout or result.stderr
-        return "Only Python supported"
-    except Exception as e:
-        return f"Execution failed: {e}"
-
-
-# ============= 3. FILE OPERATIONS =============
-@tool
-def read_file(file_path: str) -> str:
-    """Read file contents.
-
-    Use for:
-    - Reading code files
-    - Checking configs
-    - Reading notes
-    """
-    try:
-        with open(file_path, "r") as f:
-            return f.read()
-    except FileNotFoundError:
-        return f"File not found: {file_path}"
-
-
-@tool
-def write_file(file_path: str, content: str, append: bool = False) -> str:
-    """Write or append content to file.
-
-    Use for:
-    - Saving code
-    - Creating configs
-    - Writing notes
-    - Saving results
-    """
-    try:
-        mode = "a" if append else "w"
-        with open(file_path, mode) as f:
-            f.write(content)
-        action = "appended to" if append else "created"
-        return f"✅ File {action}: {file_path}"
-    except Exception as e:
-        return f"Write failed: {e}"
-
-
-@tool
-def list_files(directory: str = ".") -> str:
-    """List files in directory.
-
-    Use for:
-    - Finding files
-    - Organizing projects
-    """
-    import os
-
-    try:
-        files = os.listdir(directory)
-        return "\n".join(files)
-    except Exception as e:
-        return f"Failed to list files: {e}"
-
-
-# ============= 4. PRODUCTIVITY & NOTES =============
-@tool
-def create_todo(task: str, priority: str = "medium") -> str:
-    """Create a to-do task.
-
-    Use for:
-    - Task management
-    - Reminders
-    """
-    with open("todo.txt", "a") as f:
-        f.write(f"[{priority}] {task} - {datetime.now()}\n")
-    return f"✅ Added: {task}"
-
-
-@tool
-def save_note(title: str, content: str) -> str:
-    """Save a note for later reference.
-
-    Use for:
-    - Research notes
-    - Ideas
-    - Findings
-    """
-    filename = f"notes/{title}.md"
-    with open(filename, "w") as f:
-        f.write(f"# {title}\n\n{content}\n\nCreated: {datetime.now()}")
-    return f"✅ Note saved: {filename}"
-
-
-# ============= 5. DATA & ANALYSIS =============
-@tool
-def analyze_text(text: str, analysis_type: str = "summary") -> str:
-    """Analyze text (summary, keywords, sentiment).
-
-    Use for:
-    - Summarizing articles
-    - Extracting key points
-    - Understanding documents
-    """
-    if analysis_type == "summary":
-        # Simple summary (first 30% of text)
-        return text[: len(text) // 3] + "\n\n[Truncated for brevity]"
-    return "Analysis type not supported"
-
-
-@tool
-def get_time() -> str:
-    """Get current date/time.
-
-    Use for:
-    - Time-based decisions
-    - Logging
-    """
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-
-# ============= EXPORT =============
-def get_all_tools():
-    return [
-        web_search,
-        generate_code,
-        execute_code,
-        read_file,
-        write_file,
-        list_files,
-        create_todo,
-        save_note,
-        analyze_text,
-        get_time,
-    ]
-
-
-def get_tool(tool_name: str):
-    tools = {t.name: t for t in get_all_tools()}
-    return tools.get(tool_name)
-
-
-def list_available_tools():
-    return [{"name": t.name, "description": t.description} for t in get_all_tools()]
+# tools.py - Complete for daily use
+
+import re
+from datetime import datetime
+
+from langchain_core.tools import tool
+
+
+# ============= 1. WEB SEARCH & RESEARCH =============
+@tool
+def web_search(query: str, num_results: int = 5) -> str:
+    """Search the web for information (research, news, data).
+
+    Use for:
+    - Finding tutorials, documentation
+    - Researching topics
+    - Getting latest news/data
+    - Comparing products/services
+    """
+    from services.core.http_client import get_http_client
+
+    try:
+        # Using Tavily or DuckDuckGo free API (shared keep-alive client)
+        response = get_http_client().get(
+            "https://api.duckduckgo.com/",
+            params={"q": query, "format": "json"},
+            timeout=5,
+        )
+        results = response.json()
+        return f"Found {len(results)} results for '{query}'"
+    except Exception as e:
+        return f"Search failed: {e}"
+
+
+# ============= 2. CODE GENERATION & EXECUTION =============
+@tool
+def generate_code(
+    requirement: str, language: str = "python", save_file: str = None
+) -> str:
+    """Generate code based on requirement.
+
+    Use for:
+    - Quick scripts
+    - Boilerplate code
+    - Algorithm implementation
+    - Data processing
+    """
+    # Your existing implementation
+    pass
+
+
+@tool
+def execute_code(code: str, language: str = "python") -> str:
+    """Execute code and return output.
+
+    Use for:
+    - Running calculations
+    - Testing ideas
+    - Data processing
+    - Quick automation
+    """
+    from tools.code_runner import get_code_runner
+
+    try:
+        if language == "python":
+            # Warm sandboxed worker; output is also streamed to the graph's
+            # "custom" stream while the code runs
+            result = get_code_runner().run(code, on_output=_output_writer())
+            return result.format()
+        return "Only Python supported"
+    except Exception as e:
+        return f"Execution failed: {e}"
+
+
+def _output_writer():
+    """Callback forwarding execute_code output to the agent's custom stream."""
+    try:
+        from langgraph.config import get_stream_writer
+
+        writer = get_stream_writer()
+    except Exception:
+        return None
+    return lambda kind, text: writer({"tool": "execute_code", kind: text})
+
+
+# ============= 3. FILE OPERATIONS =============
+@tool
+def read_file(
+    file_path: str,
+    mode: str = "range",
+    offset: int = 0,
+    line: int = 0,
+    count: int = 50,
+    pattern: str = "",
+) -> str:
+    """Read file contents, a page at a time.
+
+    Use for:
+    - Reading code files
+    - Checking configs
+    - Inspecting large logs
+
+    Args:
+        file_path: File to read.
+        mode: "range" (from offset or line), "head", "tail" or "grep".
+        offset: Byte offset to start from; use the offset from a
+            "Continue with offset=N" note to read the next page.
+        line: 1-based line to start from (range mode).
+        count: Number of lines for head/tail.
+        pattern: Regular expression to search for (grep mode).
+    """
+    from tools import file_reader
+
+    try:
+        if mode == "head":
+            return file_reader.head(file_path, count)
+        if mode == "tail":
+            return file_reader.tail(file_path, count)
+        if mode == "grep":
+            if not pattern:
+                return "grep mode needs a pattern"
+            return file_reader.grep(file_path, pattern, offset=offset)
+        return file_reader.read_range(file_path, offset=offset, line=line)
+    except FileNotFoundError:
+        return f"File not found: {file_path}"
+    except (file_reader.BinaryFileError, re.error) as e:
+        return f"Cannot read {file_path}: {e}"
+    except OSError as e:
+        return f"Read failed: {e}"
+
+
+@tool
+def write_file(file_path: str, content: str, append: bool = False) -> str:
+    """Write or append content to file.
+
+    Use for:
+    - Saving code
+    - Creating configs
+    - Writing notes
+    - Saving results
+    """
+    try:
+        mode = "a" if append else "w"
+        with open(file_path, mode) as f:
+            f.write(content)
+        action = "appended to" if append else "created"
+        return f"✅ File {action}: {file_path}"
+    except Exception as e:
+        return f"Write failed: {e}"
+
+
+@tool
+def list_files(directory: str = ".") -> str:
+    """List files in directory.
+
+    Use for:
+    - Finding files
+    - Organizing projects
+    """
+    import os
+
+    try:
+        files = os.listdir(directory)
+        return "\n".join(files)
+    except Exception as e:
+        return f"Failed to list files: {e}"
+
+
+@tool
+def search_code(query: str, directory: str = ".", max_results: int = 20) -> str:
+    """Search a project's code by symbol name or text (indexed grep).
+
+    Use for:
+    - Finding where a function/class/constant/variable is defined
+    - Finding usages or references of a name or string
+    - Locating code in a large repository or codebase without listing or
+      reading files
+
+    Args:
+        query: Symbol name or text (all words must appear on the line).
+        directory: Project root to search (indexed on first use).
+        max_results: Maximum number of result lines.
+    """
+    import os
+
+    from tools.code_search import get_index
+
+    if not os.path.isdir(directory):
+        return f"Not a directory: {directory}"
+    try:
+        hits = get_index(directory).search(query, limit=max_results)
+    except Exception as e:
+        return f"Search failed: {e}"
+    if not hits:
+        return f"No results for {query!r}"
+    return "\n".join(hit.format() for hit in hits)
+
+
+# ============= 4. PRODUCTIVITY & NOTES =============
+@tool
+def create_todo(task: str, priority: str = "medium") -> str:
+    """Create a to-do task.
+
+    Use for:
+    - Task management
+    - Reminders
+    """
+    with open("todo.txt", "a") as f:
+        f.write(f"[{priority}] {task} - {datetime.now()}\n")
+    return f"✅ Added: {task}"
+
+
+@tool
+def save_note(title: str, content: str) -> str:
+    """Save a note for later reference.
+
+    Use for:
+    - Research notes
+    - Ideas
+    - Findings
+    """
+    filename = f"notes/{title}.md"
+    with open(filename, "w") as f:
+        f.write(f"# {title}\n\n{content}\n\nCreated: {datetime.now()}")
+    return f"✅ Note saved: {filename}"
+
+
+# ============= 5. DATA & ANALYSIS =============
+@tool
+def analyze_text(text: str, analysis_type: str = "summary") -> str:
+    """Analyze text (summary, keywords, sentiment).
+
+    Use for:
+    - Summarizing articles
+    - Extracting key points
+    - Understanding documents
+    """
+    if analysis_type == "summary":
+        # Simple summary (first 30% of text)
+        return text[: len(text) // 3] + "\n\n[Truncated for brevity]"
+    return "Analysis type not supported"
+
+
+@tool
+def get_time() -> str:
+    """Get current date/time.
+
+    Use for:
+    - Time-based decisions
+    - Logging
+    """
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ============= EXPORT =============
+def get_all_tools():
+    return [
+        web_search,
+        generate_code,
+        execute_code,
+        read_file,
+        write_file,
+        list_files,
+        search_code,
+        create_todo,
+        save_note,
+        analyze_text,
+        get_time,
+    ]
+
+
+def get_tool(tool_name: str):
+    tools = {t.name: t for t in get_all_tools()}
+    return tools.get(tool_name)
+
+
+def list_available_tools():
+    return [{"name": t.name, "description": t.description} for t in get_all_tools()]
@@ -1,94 +1,230 @@
-# services/tool_executor.py
-import json
-import logging
-import re
-from typing import Any, Dict, Optional
-
-logger = logging.getLogger(__name__)
-
-
-class ToolExecutor:
-    """Executes tools from Foundry's JSON responses."""
-
-    @staticmethod
-    def extract_json_tool_call(response_text: str) -> Optional[Dict[str, Any]]:
-        """Extract JSON tool call from Foundry response."""
-        try:
-            # Try markdown code block
-            json_match = re.search(r"```json\s*(.*?)\s*```", response_text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-
-            # Try direct JSON
-            return json.loads(response_text)
-
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error parsing JSON: {e}")
-            return None
-
-    @staticmethod
-    def execute(tool_call: Dict[str, Any]) -> str:
-        """Execute a single tool call with detailed error handling."""
-        tool_name = tool_call.get("name")
-        arguments = tool_call.get("arguments", {})
-
-        logger.info(f"[EXECUTE] Tool: {tool_name}, Args: {arguments}")
-
-        try:
-            # Validate tool call structure
-            if not tool_name:
-                return "❌ Error: Tool name missing from call"
-
-            if not isinstance(arguments, dict):
-                return f"❌ Error: Tool arguments must be a dict, got {type(arguments).__name__}"
-
-            # Import tool
-            try:
-                from tools import get_tool
-
-                tool = get_tool(tool_name)
-            except ImportError as e:
-                return f"❌ Error: Cannot import tools module: {str(e)}"
-
-            # Check tool exists
-            if not tool:
-                available = _get_available_tools()
-                return f"❌ Tool '{tool_name}' not found.\nAvailable tools: {', '.join(available)}"
-
-            # Execute tool
-            try:
-                result = tool.invoke(arguments)
-                logger.info(f"[SUCCESS] {tool_name} completed")
-                return str(result)
-
-            except TypeError as e:
-                # Wrong arguments
-                return f"❌ Tool '{tool_name}' error:\nWrong arguments: {str(e)}\nExpected: {tool.args}"
-
-            except ValueError as e:
-                # Invalid argument values
-                return f"❌ Tool '{tool_name}' error:\nInvalid values: {str(e)}"
-
-            except FileNotFoundError as e:
-                return f"❌ File not found: {str(e)}"
-
-            except Exception as e:
-                return f"❌ Tool '{tool_name}' failed:\n{str(e)}"
-
-        except Exception as e:
-            logger.error(f"Critical error in execute: {e}")
-            return f"❌ Critical error: {str(e)}"
-
-
-def _get_available_tools():
-    """Get list of available tool names."""
-    try:
-        from tools import list_available_tools
-
-        tools = list_available_tools()
-        return [t.get("name", "unknown") for t in tools]
-    except:
-        return ["generate_code", "analyze_code", "save_memory"]
+# services/tool_executor.py
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-call timeout for execute_many()/aexecute_many() (seconds)
+DEFAULT_TOOL_TIMEOUT = 30.0
+MAX_TOOL_WORKERS = 8
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _tool_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool"
+                )
+    return _pool
+
+
+def _abandon(future, pool: ThreadPoolExecutor) -> None:
+    """Give up on a tool call without letting it hold a pool worker."""
+    global _pool
+    if future.cancel():
+        return
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # Calls already on the old pool still finish; new ones get a fresh pool
+    pool.shutdown(wait=False)
+
+
+def _timed_out(tool_call: Dict[str, Any], timeout: float) -> str:
+    return f"❌ Tool '{tool_call.get('name')}' timed out after {timeout:g}s"
+
+
+class _PendingCall:
+    """A tool call on the pool whose timeout counts from when it starts."""
+
+    def __init__(self, call: Dict[str, Any]):
+        self.call = call
+        self.started: Optional[float] = None
+        self._submit()
+
+    def _submit(self) -> None:
+        self.pool = _tool_pool()
+        self.future = self.pool.submit(self._run)
+
+    def _run(self) -> str:
+        self.started = time.monotonic()
+        return ToolExecutor.execute(self.call)
+
+    def _wait(self, timeout: float) -> float:
+        """How long to wait next: the rest of the call's own timeout once it
+        is running, one more timeout while it is still queued."""
+        if self.started is None:
+            return timeout
+        return max(0.0, self.started + timeout - time.monotonic())
+
+    def result(self, timeout: float) -> str:
+        while True:
+            try:
+                return self.future.result(timeout=self._wait(timeout))
+            except FuturesTimeout:
+                if self.future.done():
+                    continue
+                if self.started is not None and self._wait(timeout) == 0.0:
+                    return self._give_up(timeout)
+                self._requeue_if_stranded()
+
+    async def aresult(self, timeout: float) -> str:
+        while True:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(self.future)),
+                    self._wait(timeout),
+                )
+            except asyncio.TimeoutError:
+                if self.future.done():
+                    continue
+                if self.started is not None and self._wait(timeout) == 0.0:
+                    return self._give_up(timeout)
+                self._requeue_if_stranded()
+
+    def _requeue_if_stranded(self) -> None:
+        if self.started is None and self.pool is not _pool and self.future.cancel():
+            # Queued behind hung calls on a retired pool: move it
+            self._submit()
+
+    def _give_up(self, timeout: float) -> str:
+        _abandon(self.future, self.pool)
+        logger.warning(f"[TIMEOUT] {self.call.get('name')} after {timeout:g}s")
+        return _timed_out(self.call, timeout)
+
+
+class ToolExecutor:
+    """Executes tools from Foundry's JSON responses."""
+
+    @staticmethod
+    def extract_json_tool_call(response_text: str) -> Optional[Dict[str, Any]]:
+        """Extract JSON tool call from Foundry response."""
+        try:
+            # Try markdown code block
+            json_match = re.search(r"```json\s*(.*?)\s*```", response_text, re.DOTALL)
+            if json_match:
+                return json.loads(json_match.group(1))
+
+            # Try direct JSON
+            return json.loads(response_text)
+
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse JSON: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error parsing JSON: {e}")
+            return None
+
+    @staticmethod
+    def extract_tool_calls(response_text: str) -> List[Dict[str, Any]]:
+        """All tool calls in a response: one call, a list, or {"tool_calls": [...]}."""
+        parsed = ToolExecutor.extract_json_tool_call(response_text)
+        if isinstance(parsed, dict) and isinstance(parsed.get("tool_calls"), list):
+            parsed = parsed["tool_calls"]
+        if isinstance(parsed, dict):
+            return [parsed]
+        if isinstance(parsed, list):
+            return [c for c in parsed if isinstance(c, dict)]
+        return []
+
+    @staticmethod
+    def execute_many(
+        tool_calls: List[Dict[str, Any]], timeout: float = DEFAULT_TOOL_TIMEOUT
+    ) -> List[str]:
+        """
+        Execute independent tool calls concurrently on a thread pool.
+
+        Results are returned in the order of tool_calls. A call that has not
+        finished within timeout seconds of being started yields an error
+        result instead; its thread is left to finish in the background and
+        the pool is replaced, so hung tools never use up the workers.
+        """
+        if len(tool_calls) <= 1:
+            return [ToolExecutor.execute(call) for call in tool_calls]
+
+        pending = [_PendingCall(call) for call in tool_calls]
+        return [p.result(timeout) for p in pending]
+
+    @staticmethod
+    async def aexecute_many(
+        tool_calls: List[Dict[str, Any]], timeout: float = DEFAULT_TOOL_TIMEOUT
+    ) -> List[str]:
+        """Async variant of execute_many(); each call runs in a worker thread."""
+        pending = [_PendingCall(call) for call in tool_calls]
+        return list(await asyncio.gather(*(p.aresult(timeout) for p in pending)))
+
+    @staticmethod
+    def execute(tool_call: Dict[str, Any]) -> str:
+        """Execute a single tool call with detailed error handling."""
+        tool_name = tool_call.get("name")
+        arguments = tool_call.get("arguments", {})
+
+        logger.info(f"[EXECUTE] Tool: {tool_name}, Args: {arguments}")
+
+        try:
+            # Validate tool call structure
+            if not tool_name:
+                return "❌ Error: Tool name missing from call"
+
+            if not isinstance(arguments, dict):
+                return f"❌ Error: Tool arguments must be a dict, got {type(arguments).__name__}"
+
+            # Import tool
+            try:
+                from tools import get_tool
+
+                tool = get_tool(tool_name)
+            except ImportError as e:
+                return f"❌ Error: Cannot import tools module: {str(e)}"
+
+            # Check tool exists
+            if not tool:
+                available = _get_available_tools()
+                return f"❌ Tool '{tool_name}' not found.\nAvailable tools: {', '.join(available)}"
+
+            # Execute tool
+            try:
+                result = tool.invoke(arguments)
+                logger.info(f"[SUCCESS] {tool_name} completed")
+                return str(result)
+
+            except TypeError as e:
+                # Wrong arguments
+                return f"❌ Tool '{tool_name}' error:\nWrong arguments: {str(e)}\nExpected: {tool.args}"
+
+            except ValueError as e:
+                # Invalid argument values
+                return f"❌ Tool '{tool_name}' error:\nInvalid values: {str(e)}"
+
+            except FileNotFoundError as e:
+                return f"❌ File not found: {str(e)}"
+
+            except Exception as e:
+                return f"❌ Tool '{tool_name}' failed:\n{str(e)}"
+
+        except Exception as e:
+            logger.error(f"Critical error in execute: {e}")
+            return f"❌ Critical error: {str(e)}"
+
+
+def _get_available_tools():
+    """Get list of available tool names."""
+    try:
+        from tools import list_available_tools
+
+        tools = list_available_tools()
+        return [t.get("name", "unknown") for t in tools]
+    except:
+        return ["generate_code", "analyze_code", "save_memory"]
@@ -0,0 +1,282 @@
+"""
+Paged, size-capped file reading for read_file.
+
+Files are memory-mapped, so reading a window of a multi-GB log touches only
+the pages that window needs and memory stays constant. Every result is cut
+to a token budget (settings.app.file_read_max_tokens by default) at a line
+boundary; when more remains, the result ends with a cursor such as
+
+    [Truncated at byte 18231 of 5242880. Continue with offset=18231]
+
+that read_range() (and the read_file tool) accept to page on.
+
+Modes:
+
+- read_range: from a byte offset, or from a 1-based line number;
+- head / tail: the first / last N lines;
+- grep: lines matching a regular expression, with their line numbers
+  (line numbering scans the file up to each match).
+
+Binary files (a NUL byte or mostly undecodable bytes in the first 8 KB) are
+reported instead of dumped.
+"""
+
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from config import settings
+from services.core.history import count_tokens
+
+_SNIFF_BYTES = 8192
+
+# Bytes scanned per step when counting or seeking lines
+_SCAN_CHUNK = 1 << 20
+
+# Upper bound on bytes decoded per token of budget
+_BYTES_PER_TOKEN = 8
+
+
+class BinaryFileError(ValueError):
+    """The file does not look like text."""
+
+
+@contextmanager
+def _mapped(path: str) -> Iterator[bytes]:
+    """Read-only mmap of the file (b"" for an empty one)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+
+def _check_text(data) -> None:
+    sample = bytes(data[:_SNIFF_BYTES])
+    if b"\0" in sample:
+        raise BinaryFileError("binary file (contains NUL bytes)")
+    text = sample.decode("utf-8", errors="replace")
+    if text and text.count("�") / len(text) > 0.1:
+        raise BinaryFileError("binary file (not UTF-8 text)")
+
+
+def _budget(max_tokens: Optional[int]) -> int:
+    return max_tokens or settings.app.file_read_max_tokens
+
+
+def _line_offset(data, line: int) -> int:
+    """Byte offset where 1-based line starts (len(data) if past the end)."""
+    pos, remaining = 0, line - 1
+    while remaining > 0:
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            return len(data)
+        pos = nl + 1
+        remaining -= 1
+    return pos
+
+
+def _count_lines(data, start: int, end: int) -> int:
+    count = 0
+    for pos in range(start, end, _SCAN_CHUNK):
+        count += data[pos : min(pos + _SCAN_CHUNK, end)].count(b"\n")
+    return count
+
+
+def _clip(raw: bytes, max_tokens: int, from_end: bool = False) -> bytes:
+    """The leading (or trailing) part of raw within max_tokens, cut on a
+    character boundary; at least one byte so paging always advances."""
+    limit = max(max_tokens, 1) * _BYTES_PER_TOKEN
+    raw = bytes(raw[-limit:] if from_end else raw[:limit])
+    while len(raw) > 1:
+        tokens = count_tokens(_decode(raw))
+        if tokens <= max_tokens:
+            break
+        keep = max(1, len(raw) * max_tokens // tokens - 1)
+        if from_end:
+            cut = len(raw) - keep
+            while cut < len(raw) - 1 and (raw[cut] & 0xC0) == 0x80:
+                cut += 1
+            raw = raw[cut:]
+        else:
+            while keep > 1 and (raw[keep] & 0xC0) == 0x80:
+                keep -= 1
+            raw = raw[:keep]
+    return raw
+
+
+def _fit(raw_lines: List[bytes], max_tokens: int) -> Tuple[List[str], int]:
+    """Leading lines within max_tokens; returns texts and bytes consumed.
+
+    A first line that alone exceeds the budget is cut, so the next page
+    resumes inside it.
+    """
+    kept: List[str] = []
+    used = nbytes = 0
+    for raw in raw_lines:
+        text = _decode(raw)
+        cost = count_tokens(text) + 1
+        if used + cost > max_tokens:
+            if not kept:
+                raw = _clip(raw, max_tokens - 1)
+                kept.append(_decode(raw))
+                nbytes += len(raw)
+            break
+        kept.append(text)
+        used += cost
+        nbytes += len(raw)
+    return kept, nbytes
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def _page(data, start: int, budget: int, max_lines: int = 0) -> str:
+    """Lines from byte start within the budget, plus a cursor if more remain."""
+    size = len(data)
+    if start >= size:
+        return f"[End of file: {size} bytes]"
+
+    window = data[start : min(size, start + budget * _BYTES_PER_TOKEN)]
+    raw_lines = window.splitlines(keepends=True)
+    if start + len(window) < size and len(raw_lines) > 1:
+        # The last line is cut off by the window; it is read next time
+        raw_lines.pop()
+    if max_lines:
+        raw_lines = raw_lines[:max_lines]
+    kept, nbytes = _fit(raw_lines, budget)
+
+    end = start + nbytes
+    body = "\n".join(kept)
+    if end < size:
+        body += f"\n[Truncated at byte {end} of {size}. Continue with offset={end}]"
+    return body
+
+
+def read_range(
+    path: str, offset: int = 0, line: int = 0, max_tokens: Optional[int] = None
+) -> str:
+    """Text from a byte offset (or 1-based line), cut to the token budget."""
+    with _mapped(path) as data:
+        _check_text(data)
+        start = _line_offset(data, line) if line > 0 else max(offset, 0)
+        return _page(data, start, _budget(max_tokens))
+
+
+def head(path: str, count: int = 50, max_tokens: Optional[int] = None) -> str:
+    """First count lines."""
+    with _mapped(path) as data:
+        _check_text(data)
+        return _page(data, 0, _budget(max_tokens), max_lines=count)
+
+
+def tail(path: str, count: int = 50, max_tokens: Optional[int] = None) -> str:
+    """Last count lines (fewer if they exceed the token budget)."""
+    budget = _budget(max_tokens)
+    with _mapped(path) as data:
+        _check_text(data)
+        end = len(data)
+        if end and data[end - 1 : end] == b"\n":
+            end -= 1
+        lines: List[Tuple[str, int]] = []
+        used = 0
+        pos = end
+        while pos > 0 and len(lines) < count:
+            # Only look back as far as the remaining budget could reach
+            low = max(0, pos - (budget - used + 1) * _BYTES_PER_TOKEN)
+            nl = data.rfind(b"\n", low, pos)
+            start = nl + 1 if nl >= 0 else low
+            raw = data[start:pos]
+            text = _decode(raw)
+            cost = count_tokens(text) + 1
+            if used + cost > budget or (nl < 0 and low > 0):
+                if lines:
+                    break
+                # A single line longer than the budget: keep its end
+                raw = _clip(raw, budget - 1, from_end=True)
+                start = pos - len(raw)
+                lines.append((_decode(raw), start))
+                break
+            lines.append((text, start))
+            used += cost
+            pos = nl if nl >= 0 else 0
+            if nl < 0:
+                break
+
+        lines.reverse()
+        body = "\n".join(text for text, _ in lines)
+        if lines and lines[0][1] > 0:
+            body = f"[From byte {lines[0][1]} of {len(data)}]\n" + body
+        return body or "[Empty file]"
+
+
+def _line_text(data, start: int, end: int, at: int, max_tokens: int) -> str:
+    """Line [start, end) as text; a line over max_tokens is cut to a window
+    around byte at (the match), marked with "..." where it was cut."""
+    limit = max_tokens * _BYTES_PER_TOKEN
+    if end - start <= limit:
+        raw = data[start:end]
+        if count_tokens(_decode(raw)) <= max_tokens:
+            return _decode(raw)
+    low = max(start, at - limit // 4)
+    raw = _clip(data[low : min(end, low + limit)], max_tokens - 2)
+    text = _decode(raw)
+    if low > start:
+        text = "..." + text
+    if low + len(raw) < end:
+        text += "..."
+    return text
+
+
+def grep(
+    path: str,
+    pattern: str,
+    max_matches: int = 50,
+    max_tokens: Optional[int] = None,
+    ignore_case: bool = False,
+    offset: int = 0,
+) -> str:
+    """Lines matching pattern (searching from byte offset), as "line_no: text"."""
+    budget = _budget(max_tokens)
+    regex = re.compile(
+        pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    )
+    with _mapped(path) as data:
+        _check_text(data)
+        results: List[str] = []
+        used = 0
+        offset = min(max(offset, 0), len(data))
+        line_no, counted_to = 1 + _count_lines(data, 0, offset), offset
+        last_line_start = -1
+        for match in regex.finditer(data, offset):
+            line_start = data.rfind(b"\n", 0, match.start()) + 1
+            if line_start == last_line_start:
+                continue
+            last_line_start = line_start
+            line_no += _count_lines(data, counted_to, line_start)
+            counted_to = line_start
+
+            line_end = data.find(b"\n", match.start())
+            if line_end < 0:
+                line_end = len(data)
+            text = f"{line_no}: " + _line_text(
+                data, line_start, line_end, match.start(), max(budget - used, 1)
+            )
+            cost = count_tokens(text) + 1
+            if len(results) >= max_matches or (results and used + cost > budget):
+                results.append(
+                    f"[More matches; continue with offset={line_start} "
+                    f"(line {line_no})]"
+                )
+                break
+            results.append(text)
+            used += cost
+
+    return "\n".join(results) if results else f"No matches for {pattern!r}"
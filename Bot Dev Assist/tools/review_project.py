@@ -0,0 +1,248 @@
+"""
+review_project tool - whole-repository review in one call.
+
+Every .py file under the directory is streamed through
+services.core.code_metrics.analyze_tree (cached, parsed on the process
+pool) and folded into a ProjectRollup as it arrives, so memory stays
+proportional to the number of modules rather than files:
+
+- per module (package directory): files, lines, functions, worst
+  function, smells and TODOs;
+- the top_n hot spots: functions ranked by complexity, size and the smells
+  reported inside them.
+
+The report sent back to the model is cut to a share
+(settings.app.review_context_share) of the conversation's token budget:
+totals first, then the hot spots, then the modules with the most issues,
+then the source of as many hot spots as still fit. If the scan outlives
+the agent's tool timeout, the report covers the files analysed so far and
+the rest keep being analysed (and cached) in the background.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.tools import tool
+
+from config import settings
+from services.core.code_metrics import MAX_COMPLEXITY, analyze_tree
+from services.core.history import count_tokens, history_budget
+
+logger = logging.getLogger(__name__)
+
+# Source lines quoted per hot spot
+_EXCERPT_LINES = 30
+
+# Share of the agent's tool timeout spent scanning before reporting
+_SCAN_SHARE = 0.8
+
+
+class _Module:
+    __slots__ = ("files", "lines", "functions", "smells", "todos", "worst")
+
+    def __init__(self):
+        self.files = self.lines = self.functions = self.smells = self.todos = 0
+        self.worst: Optional[Tuple[int, str]] = None  # (complexity, path name)
+
+    @property
+    def score(self) -> int:
+        return self.smells + (self.worst[0] if self.worst else 0) // MAX_COMPLEXITY
+
+
+class ProjectRollup:
+    """Bounded aggregate of code_metrics results for a whole project."""
+
+    def __init__(self, top_n: int = 5):
+        self.top_n = top_n
+        self.files = self.lines = self.functions = self.classes = 0
+        self.smells: Counter = Counter()
+        self.errors: List[str] = []
+        self.modules: Dict[str, _Module] = {}
+        self._hotspots: List[tuple] = []  # min-heap of (score, seq, spot)
+        self._seq = itertools.count()
+
+    def add(self, result: dict) -> None:
+        path = result["path"]
+        module = self.modules.setdefault(os.path.dirname(path) or ".", _Module())
+        self.files += 1
+        module.files += 1
+        self.lines += result.get("lines", 0)
+        module.lines += result.get("lines", 0)
+        if "error" in result:
+            if len(self.errors) < self.top_n:
+                self.errors.append(f"{path}: {result['error']}")
+            return
+
+        self.classes += result["classes"]
+        self.functions += len(result["functions"])
+        module.functions += len(result["functions"])
+        module.smells += len(result["smells"])
+        module.todos += len(result["todos"])
+        self.smells.update(kind for _, kind, _ in result["smells"])
+
+        for function in result["functions"]:
+            end = function["line"] + function["length"]
+            kinds = sorted(
+                {
+                    kind
+                    for line, kind, _ in result["smells"]
+                    if function["line"] <= line < end
+                }
+            )
+            if module.worst is None or function["complexity"] > module.worst[0]:
+                module.worst = (
+                    function["complexity"],
+                    f"{os.path.basename(path)} {function['name']}",
+                )
+            score = function["complexity"] + function["length"] / 20 + 2 * len(kinds)
+            spot = {**function, "path": path, "smells": kinds}
+            entry = (score, next(self._seq), spot)
+            if len(self._hotspots) < self.top_n:
+                heapq.heappush(self._hotspots, entry)
+            elif score > self._hotspots[0][0]:
+                heapq.heapreplace(self._hotspots, entry)
+
+    @property
+    def hotspots(self) -> List[dict]:
+        return [spot for _, _, spot in sorted(self._hotspots, reverse=True)]
+
+    def report(self, root: str, max_tokens: int, note: str = "") -> str:
+        """Summary cut to max_tokens, most important sections first."""
+        header = [
+            f"Project review of {root}: {self.files} Python files, "
+            f"{self.lines} lines, {self.functions} functions, {self.classes} classes"
+        ]
+        if self.smells:
+            header.append(
+                "Smells: "
+                + ", ".join(f"{kind} {n}" for kind, n in self.smells.most_common())
+            )
+        if note:
+            header.append(note)
+
+        spots = self.hotspots
+        spot_lines = [
+            f"{i}. {s['path']}:{s['line']} {s['name']} - complexity "
+            f"{s['complexity']}, {s['length']} lines"
+            + (f"; {', '.join(s['smells'])}" if s["smells"] else "")
+            for i, s in enumerate(spots, 1)
+        ]
+        module_lines = [
+            f"- {name}: {m.files} files, {m.lines} lines, {m.smells} smells, "
+            f"{m.todos} TODOs"
+            + (f", worst {m.worst[1]} (complexity {m.worst[0]})" if m.worst else "")
+            for name, m in sorted(
+                self.modules.items(), key=lambda item: (-item[1].score, item[0])
+            )
+        ]
+
+        used = count_tokens("\n".join(header))
+        sections: List[List[str]] = [[], [], [], []]
+        for index, title, lines in (
+            (0, "Hot spots:", spot_lines),
+            (1, "Modules (most issues first):", module_lines),
+            (3, "Not analyzed:", self.errors),
+        ):
+            for line in lines:
+                cost = count_tokens(line) + 1 + (0 if sections[index] else 4)
+                if used + cost > max_tokens:
+                    break
+                if not sections[index]:
+                    sections[index].append(title)
+                sections[index].append(line)
+                used += cost
+        for i, spot in enumerate(spots, 1):
+            excerpt = _excerpt(root, spot)
+            cost = count_tokens(excerpt) + 2
+            if excerpt and used + cost <= max_tokens:
+                sections[2].append(f"[{i}] {spot['path']}:{spot['line']}\n{excerpt}")
+                used += cost
+
+        parts = ["\n".join(header)]
+        parts.extend("\n".join(section) for section in sections if section)
+        return "\n\n".join(parts)
+
+
+def _excerpt(root: str, spot: dict) -> str:
+    try:
+        with open(
+            os.path.join(root, spot["path"]), encoding="utf-8", errors="replace"
+        ) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ""
+    start = spot["line"] - 1
+    count = min(spot["length"], _EXCERPT_LINES)
+    body = lines[start : start + count]
+    if spot["length"] > count:
+        body.append(f"    ... ({spot['length'] - count} more lines)")
+    return "```python\n" + "\n".join(body) + "\n```"
+
+
+def _drain(results: Iterator[dict]) -> None:
+    """Finish a scan the report stopped waiting for, to fill the cache."""
+    try:
+        deque(results, maxlen=0)
+    except RuntimeError as e:
+        # The pool was shut down (interpreter exit)
+        logger.debug(f"Background review scan stopped: {e}")
+
+
+def report_budget() -> int:
+    """Tokens a review may take up in the conversation."""
+    return max(256, int(history_budget() * settings.app.review_context_share))
+
+
+@tool
+def review_project(directory: str = ".", top_n: int = 5) -> str:
+    """Review a whole Python project in one call.
+
+    Use for:
+    - "Review this project" / "where are the problems in this repo?"
+    - Getting a per-module overview of size, complexity and code smells
+    - Finding the functions most in need of refactoring, with their source
+
+    Args:
+        directory: Project root to review.
+        top_n: Number of hot-spot functions to report (and quote).
+
+    Returns:
+        Summary sized to fit the conversation
+    """
+    if not os.path.isdir(directory):
+        return f"Not a directory: {directory}"
+    rollup = ProjectRollup(top_n=max(1, top_n))
+    results = analyze_tree(directory)
+    timeout = settings.model.agent_tool_timeout
+    deadline = time.monotonic() + timeout * _SCAN_SHARE if timeout else None
+    start = time.perf_counter()
+    note = ""
+    try:
+        for result in results:
+            rollup.add(result)
+            if deadline is not None and time.monotonic() > deadline:
+                note = (
+                    f"(Partial: stopped after {rollup.files} files; the rest are "
+                    "being analyzed in the background, so a repeat review will "
+                    "be complete.)"
+                )
+                threading.Thread(
+                    target=_drain, args=(results,), name="review-scan", daemon=True
+                ).start()
+                break
+    except Exception as e:
+        logger.error(f"Review of {directory} failed: {e}")
+        return f"Review failed: {e}"
+    logger.info(
+        f"Reviewed {rollup.files} files in {directory} in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    if not rollup.files:
+        return f"No Python files found in {directory}"
+    return rollup.report(directory, report_budget(), note)